@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+import asyncio
+import io
+import json
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export, write_synthetic_export
+
+import click
+
+from enpass2onepassword.migration import map_entries, migrate
+from enpass2onepassword.ratelimit import WriteLimiter
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[round(p / 100 * (len(ordered) - 1))]
+
+
+@click.group()
+def benchmark():
+    """Measures enpass2onepassword offline, with synthetic Enpass exports and a simulated 1Password."""
+
+
+@benchmark.command()
+@click.option(
+    "--items",
+    "sizes",
+    type=click.INT,
+    multiple=True,
+    default=(100, 1000),
+    show_default=True,
+    help="The number of items in the synthetic Enpass export. Can be given multiple times.",
+)
+@click.option("--concurrency", type=click.INT, default=1, show_default=True)
+@click.option(
+    "--service-accounts",
+    type=click.INT,
+    default=1,
+    show_default=True,
+    help="The number of service account tokens that the items are spread across.",
+)
+@click.option(
+    "--latency-ms",
+    type=click.FLOAT,
+    default=50.0,
+    show_default=True,
+    help="How long the simulated 1Password takes to answer a request.",
+)
+@click.option(
+    "--latency-jitter-ms",
+    type=click.FLOAT,
+    default=0.0,
+    show_default=True,
+    help="A random delay of up to this many milliseconds is added to every answer.",
+)
+@click.option(
+    "--error-rate",
+    type=click.FLOAT,
+    default=0.0,
+    show_default=True,
+    help="The share of requests that fail with a (retryable) network error.",
+)
+@click.option(
+    "--server-rate-limit",
+    type=click.INT,
+    default=None,
+    help="The number of writes per '--server-rate-window' that the simulated 1Password accepts.",
+)
+@click.option(
+    "--server-rate-window",
+    type=click.FLOAT,
+    default=3600.0,
+    show_default=True,
+    help="The window of '--server-rate-limit', in seconds.",
+)
+@click.option(
+    "--session-validity",
+    type=click.FLOAT,
+    default=None,
+    help="The number of seconds after which the simulated 1Password expires a session.",
+)
+@click.option(
+    "--op-client-validity",
+    "client_validity_s",
+    type=click.INT,
+    default=30 * 60,
+    show_default=True,
+)
+@click.option(
+    "--op-rate-limit-hourly",
+    "rate_limit_h",
+    type=click.INT,
+    default=1_000_000,
+    show_default=True,
+)
+@click.option(
+    "--op-rate-limit-daily",
+    "rate_limit_d",
+    type=click.INT,
+    default=1_000_000,
+    show_default=True,
+)
+@click.option("--max-retries", type=click.INT, default=5, show_default=True)
+@click.option(
+    "--stream",
+    "streaming",
+    is_flag=True,
+    help="Create the items while the export is still being read.",
+)
+@click.option("--seed", type=click.INT, default=0, show_default=True)
+def upload(sizes, **options):
+    """Migrates synthetic Enpass exports to a simulated 1Password and reports the throughput."""
+    click.echo(
+        f"{'items':>8} {'items/s':>10} {'create p50':>11} {'create p99':>11} "
+        f"{'limiter wait':>13} {'auths':>6}"
+    )
+    for size in sizes:
+        result = asyncio.run(measure_upload(size, **options))
+        click.echo(
+            f"{size:>8} {result['items_per_s']:>10.1f} "
+            f"{result['create_p50_s'] * 1000:>9.1f}ms {result['create_p99_s'] * 1000:>9.1f}ms "
+            f"{result['limiter_wait_s']:>12.2f}s {result['authentications']:>6}"
+        )
+
+
+async def measure_upload(
+    size,
+    concurrency=1,
+    service_accounts=1,
+    latency_ms=50.0,
+    latency_jitter_ms=0.0,
+    error_rate=0.0,
+    server_rate_limit=None,
+    server_rate_window=3600.0,
+    session_validity=None,
+    client_validity_s=30 * 60,
+    rate_limit_h=1_000_000,
+    rate_limit_d=1_000_000,
+    max_retries=5,
+    streaming=False,
+    seed=0,
+):
+    export = io.BytesIO(json.dumps(synthetic_export(size, seed)).encode())
+    server = MockOnePassword(
+        latency_s=latency_ms / 1000,
+        latency_jitter_s=latency_jitter_ms / 1000,
+        rate_limit=server_rate_limit,
+        rate_limit_window_s=server_rate_window,
+        session_validity_s=session_validity,
+        error_rate=error_rate,
+        seed=seed,
+    )
+    limiter = WriteLimiter(rate_limit_h, rate_limit_d, "benchmark")
+
+    started = time.monotonic()
+    await migrate(
+        export,
+        "benchmark",
+        "benchmark",
+        "Enpass",
+        False,
+        True,
+        True,
+        0,
+        True,
+        rate_limit_h,
+        rate_limit_d,
+        client_validity_s,
+        concurrency=concurrency,
+        max_retries=max_retries,
+        streaming=streaming,
+        additional_op_sa_tokens=[
+            f"benchmark-{i}" for i in range(2, service_accounts + 1)
+        ],
+        client_factory=server.authenticate,
+        limiter=limiter,
+    )
+    elapsed_s = time.monotonic() - started
+
+    return {
+        "items": len(server.created()),
+        "elapsed_s": elapsed_s,
+        "items_per_s": len(server.created()) / elapsed_s,
+        "create_p50_s": percentile(server.create_latencies, 50),
+        "create_p99_s": percentile(server.create_latencies, 99),
+        "limiter_wait_s": limiter.waited_s,
+        "authentications": server.authentications,
+    }
+
+
+@benchmark.command()
+@click.option(
+    "--items",
+    "sizes",
+    type=click.INT,
+    multiple=True,
+    default=(1_000, 10_000, 100_000),
+    show_default=True,
+    help="The number of items in the synthetic Enpass export. Can be given multiple times.",
+)
+@click.option(
+    "--max-us-per-item",
+    type=click.FLOAT,
+    default=None,
+    help="Fail when mapping takes longer than this many microseconds per item.",
+)
+@click.option(
+    "--max-kib-per-item",
+    type=click.FLOAT,
+    default=None,
+    help="Fail when mapping needs more than this many KiB of memory per item at its peak.",
+)
+@click.option(
+    "--map-workers",
+    type=click.INT,
+    default=1,
+    show_default=True,
+    help="The number of processes that map the items.",
+)
+@click.option("--seed", type=click.INT, default=0, show_default=True)
+def mapping(sizes, max_us_per_item, max_kib_per_item, map_workers, seed):
+    """Maps synthetic Enpass exports to 1Password items and reports the time and memory it takes."""
+    click.echo(f"{'items':>8} {'total':>9} {'per item':>11} {'peak memory':>14}")
+    failed = False
+    for size in sizes:
+        result = asyncio.run(measure_mapping(size, seed, map_workers))
+        us_per_item = result["elapsed_s"] / size * 1_000_000
+        kib_per_item = result["peak_bytes"] / size / 1024
+        click.echo(
+            f"{size:>8} {result['elapsed_s']:>8.2f}s {us_per_item:>9.1f}us "
+            f"{kib_per_item:>8.2f}KiB/item"
+        )
+
+        if max_us_per_item is not None and us_per_item > max_us_per_item:
+            click.secho(
+                f"Mapping is slower than {max_us_per_item}us per item.", fg="red"
+            )
+            failed = True
+        if max_kib_per_item is not None and kib_per_item > max_kib_per_item:
+            click.secho(
+                f"Mapping needs more than {max_kib_per_item}KiB per item.", fg="red"
+            )
+            failed = True
+
+    if failed:
+        raise click.exceptions.Exit(1)
+
+
+async def measure_mapping(size, seed=0, map_workers=1):
+    export = synthetic_export(size, seed, hidden_share=0.05)
+    numbered_ep_items = list(enumerate(export["items"]))
+
+    started = time.perf_counter()
+    await map_entries(export["folders"], numbered_ep_items, "benchmark", map_workers)
+    elapsed_s = time.perf_counter() - started
+
+    # tracing the allocations slows the mapping down, therefore it runs a second time
+    tracemalloc.start()
+    try:
+        await map_entries(
+            export["folders"], numbered_ep_items, "benchmark", map_workers
+        )
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"elapsed_s": elapsed_s, "peak_bytes": peak_bytes}
+
+
+# the dependencies that enpass2onepassword must not import before it has all its arguments
+HEAVY_MODULES = ("onepassword", "aiostream", "pyrate_limiter", "wakepy", "pydantic")
+
+
+@benchmark.command()
+@click.option("--runs", type=click.INT, default=10, show_default=True)
+@click.option(
+    "--max-ms",
+    type=click.FLOAT,
+    default=None,
+    help="Fail when 'enpass2onepassword --help' takes longer than this many milliseconds.",
+)
+def import_time(runs, max_ms):
+    """Measures how long 'enpass2onepassword --help' takes and which heavy dependencies it imports."""
+    results = [measure_startup() for _ in range(runs)]
+    elapsed_ms = statistics.median(result["elapsed_s"] for result in results) * 1000
+    imports_ms = statistics.median(result["imports_s"] for result in results) * 1000
+    click.echo(f"{'runs':>8} {'--help':>10} {'imports':>10}")
+    click.echo(f"{runs:>8} {elapsed_ms:>8.1f}ms {imports_ms:>8.1f}ms")
+
+    failed = False
+    heavy_modules = sorted(
+        set().union(*(result["heavy_modules"] for result in results))
+    )
+    if heavy_modules:
+        click.secho(
+            f"'--help' imports {', '.join(heavy_modules)}, which should only be imported when migrating.",
+            fg="red",
+        )
+        failed = True
+    if max_ms is not None and elapsed_ms > max_ms:
+        click.secho(f"'--help' is slower than {max_ms}ms.", fg="red")
+        failed = True
+
+    if failed:
+        raise click.exceptions.Exit(1)
+
+
+def measure_startup():
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "enpass2onepassword", "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed_s = time.perf_counter() - started
+
+    # the lines look like "import time:  self [us] | cumulative | imported package",
+    # and nested imports are indented
+    imports_s = 0.0
+    heavy_modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if not name.startswith("  "):
+            imports_s += int(cumulative) / 1_000_000
+        if name.strip().split(".")[0] in HEAVY_MODULES:
+            heavy_modules.add(name.strip().split(".")[0])
+
+    return {
+        "elapsed_s": elapsed_s,
+        "imports_s": imports_s,
+        "heavy_modules": heavy_modules,
+    }
+
+
+@benchmark.command()
+@click.argument("output", type=click.File("w", encoding="utf-8"))
+@click.option("--items", "size", type=click.INT, default=1000, show_default=True)
+@click.option(
+    "--hidden-share",
+    type=click.FLOAT,
+    default=0.05,
+    show_default=True,
+    help="The share of items that are trashed or archived.",
+)
+@click.option("--seed", type=click.INT, default=0, show_default=True)
+def generate(output, size, hidden_share, seed):
+    """Writes a synthetic Enpass export with items of all categories and field types."""
+    write_synthetic_export(output, size, seed, hidden_share)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,4 +1,11 @@
-from importlib.metadata import version
-
 __distribution_name__ = "enpass2onepassword"
-__version__ = version(__distribution_name__)
+
+
+def __getattr__(name):
+    # looking up the version imports importlib.metadata, which is slow to import
+    if name == "__version__":
+        from importlib.metadata import version
+
+        return version(__distribution_name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
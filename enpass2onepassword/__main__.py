@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
-import asyncio
-
 import click
 
-from enpass2onepassword import __distribution_name__, __version__
-from enpass2onepassword.migration import migrate
+from enpass2onepassword import __distribution_name__
+from enpass2onepassword.priority import parse_priority
+from enpass2onepassword.routing import read_vault_map
+
+# The migration pulls in the 1Password SDK, aiostream, pyrate-limiter and wakepy.
+# They are only imported once all arguments are known,
+# so that '--help', usage errors and the prompts are not held up by them.
 
 
 # noinspection PyUnusedLocal
@@ -23,12 +26,71 @@ def is_zero_or_positive(ctx, param, value):
     raise click.BadParameter("It must be zero or a positive integer")
 
 
+# noinspection PyUnusedLocal
+def parse_priorities(ctx, param, value):
+    return tuple(parse_priority(spec) for spec in value)
+
+
+class ApiOption(click.Option):
+    """An option that is only needed, and therefore only prompted for, when the entries are sent to 1Password."""
+
+    def offline(self, ctx):
+        return ctx.params.get("onepux_path") is not None
+
+    def prompt_for_value(self, ctx):
+        if self.offline(ctx):
+            return None
+        return super().prompt_for_value(ctx)
+
+    def process_value(self, ctx, value):
+        if value is None and self.offline(ctx):
+            return value
+        return super().process_value(ctx, value)
+
+
+# noinspection PyUnusedLocal
+def parse_jobs(ctx, param, value):
+    jobs = []
+    for spec in value:
+        path, separator, vault = spec.rpartition("=")
+        if not separator or not path or not vault:
+            raise click.BadParameter(
+                f"'{spec}' must be the path of an Enpass export and the name of a vault, like 'work.json=Work'"
+            )
+        jobs.append((click.File("rb").convert(path, param, ctx), vault))
+    return tuple(jobs)
+
+
+# noinspection PyUnusedLocal
+def is_sqlite_file(ctx, param, value):
+    if value is None or value.endswith(".sqlite"):
+        return value
+
+    raise click.BadParameter("It must be the path of a file ending in '.sqlite'")
+
+
 @click.command()
+@click.option(
+    "--1pux",
+    "onepux_path",
+    type=click.Path(dir_okay=False, writable=True),
+    is_eager=True,
+    help="""
+         Write the entries into a 1Password Unencrypted Export (1PUX) file at this path,
+         instead of creating them through the 1Password API.
+         There are no rate limits, so even large Enpass exports are converted within minutes.
+         Import the file in the 1Password desktop app with 'File › Import › 1Password'.
+         No service account is needed then, and '--op-vault' and '--vault-map' name the vaults in the file.
+         
+         The file contains all secrets unencrypted, so delete it right after the import!
+         """,
+)
 @click.option(
     "--op-sa-name",
     "-n",
     "--sa",
     "sa_name",
+    cls=ApiOption,
     prompt=True,
     type=click.STRING,
     envvar="OP_SERVICE_ACCOUNT_NAME",
@@ -47,6 +109,7 @@ def is_zero_or_positive(ctx, param, value):
     "-t",
     "--token",
     "sa_token",
+    cls=ApiOption,
     prompt=True,
     hide_input=True,
     type=click.STRING,
@@ -58,6 +121,23 @@ def is_zero_or_positive(ctx, param, value):
          Can also be supplied as environment variable 'OP_SERVICE_ACCOUNT_TOKEN'.
          """,
 )
+@click.option(
+    "--additional-op-sa-token",
+    "additional_sa_tokens",
+    multiple=True,
+    type=click.STRING,
+    envvar="OP_SERVICE_ACCOUNT_ADDITIONAL_TOKENS",
+    help="""
+         The token of another 1Password service account of the same 1Password account.
+         Can be given multiple times.
+         Every service account has an hourly rate limit of its own, so the entries are created faster
+         when they are spread across several service accounts. They all share the daily rate limit, though.
+         All of the service accounts need write permissions to the 1Password vault.
+         
+         Can also be supplied as environment variable 'OP_SERVICE_ACCOUNT_ADDITIONAL_TOKENS',
+         separated by spaces.
+         """,
+)
 @click.option(
     "--op-vault",
     "-o",
@@ -78,6 +158,33 @@ def is_zero_or_positive(ctx, param, value):
          Can also be supplied as environment variable 'OP_VAULT'.
          """,
 )
+@click.option(
+    "--job",
+    "jobs",
+    multiple=True,
+    type=click.STRING,
+    callback=parse_jobs,
+    help="""
+         Another Enpass export and the 1Password vault that it goes to, like 'work.json=Work'.
+         Can be given multiple times.
+         All of the exports, including ENPASS_JSON_EXPORT for '--op-vault', are migrated at the same time.
+         They share the connection to 1Password and the rate limits, and they take turns with their entries.
+         Every export has its own journal, next to it.
+         """,
+)
+@click.option(
+    "--vault-map",
+    "vault_map_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="""
+         A JSON file that puts the entries of some Enpass folders into other 1Password vaults,
+         for example '{"Work": "Company", "Family": "Shared"}'.
+         The Enpass folders can be given by their name or by their UUID.
+         Entries of the other folders go to the vault '--op-vault'.
+         Every vault is filled in parallel, with '--concurrency' entries at the same time,
+         but all of them count against the same rate limits.
+         """,
+)
 @click.option(
     "--ignore-non-empty-vault",
     "ignore_non_empty",
@@ -88,6 +195,16 @@ def is_zero_or_positive(ctx, param, value):
          If you use this, you should definitely make a sound backup of the vault before the import!
          """,
 )
+@click.option(
+    "--skip-existing",
+    "skip_existing",
+    is_flag=True,
+    help="""
+         Skip all Enpass entries that already exist in the 1Password vault, instead of creating them again.
+         An entry exists if the title, the first website and the username match.
+         The vault may contain items when this flag is used.
+         """,
+)
 @click.option(
     "--no-confirm",
     "no_confirm",
@@ -130,6 +247,167 @@ def is_zero_or_positive(ctx, param, value):
          This can be helpful to recover a failed import.
          """,
 )
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         A file in which this tool notes every 1Password entry right after it has been created.
+         It is used by '--resume' to continue an interrupted import.
+         
+         Defaults to the path of the Enpass export with '.journal' appended.
+         """,
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="""
+         Continue an interrupted import.
+         All Enpass entries that have already been created according to the journal are skipped.
+         Unlike with '--skip', the 1Password vault may already contain items.
+         """,
+)
+@click.option(
+    "--sync",
+    "manifest_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         Keep the 1Password vaults in sync with newer Enpass exports, using this manifest file.
+         The manifest notes the 1Password entry of every Enpass entry, together with a hash of its content.
+         The first run creates all entries, except for those in the journal of an earlier migration,
+         which are updated once, and those that '--skip-existing' finds in the vaults.
+         Every later run, with a newer export and the same manifest,
+         only creates the new Enpass entries and updates the changed ones, so it only uses as many write
+         requests as there are changes. The attachments of changed entries are not updated.
+         
+         The vaults may contain items then. The manifest takes the place of the journal.
+         """,
+)
+@click.option(
+    "--archive-deleted",
+    "archive_deleted",
+    is_flag=True,
+    help="""
+         With '--sync', archive the 1Password entries of the Enpass entries that were deleted,
+         trashed or archived since the last sync.
+         """,
+)
+@click.option(
+    "--dead-letters",
+    "dead_letters_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         Go on when an Enpass entry cannot be converted or created, instead of stopping the whole import.
+         Such entries are set aside in this file, together with the reason, and all other entries are still created.
+         Use '--retry-dead-letters' later to try only the entries in this file again.
+         """,
+)
+@click.option(
+    "--retry-dead-letters",
+    "retry_dead_letters",
+    is_flag=True,
+    help="""
+         Only import the Enpass entries that were set aside in the file of '--dead-letters', from the same Enpass export.
+         The entries that are created are removed from the file, and the others stay in it.
+         """,
+)
+@click.option(
+    "--index",
+    "index_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         A file in which this tool notes where every entry is in the Enpass export.
+         It is written once the whole export has been read, and later runs, for example with '--skip' or '--resume',
+         only read the entries they need from the export instead of all of them.
+         It is built again when the export changes.
+         """,
+)
+@click.option(
+    "--concurrency",
+    type=click.INT,
+    callback=is_positive,
+    default=1,
+    show_default=True,
+    help="""
+         The number of 1Password entries that are created at the same time.
+         All of them still count against the same rate limits.
+         
+         A higher value helps when the rate limit is not the bottleneck, for example with Business accounts.
+         Then most of the time is spent waiting for the 1Password server to respond.
+         """,
+)
+@click.option(
+    "--map-workers",
+    type=click.INT,
+    callback=is_positive,
+    default=1,
+    show_default=True,
+    help="""
+         The number of processes that convert the Enpass entries to 1Password entries.
+         Large Enpass exports are converted faster with one process per CPU core.
+         """,
+)
+@click.option(
+    "--stream",
+    "streaming",
+    is_flag=True,
+    help="""
+         Create the 1Password entries while the Enpass export is still being read and converted.
+         The first entry is created right away and the memory use stays low, even for huge exports.
+         The number of entries is then only known at the end, so it is not shown before the confirmation.
+         """,
+)
+@click.option(
+    "--priority",
+    "priorities",
+    multiple=True,
+    type=click.STRING,
+    callback=parse_priorities,
+    help="""
+         Create some Enpass entries before all others, so that they are in 1Password
+         before the rate limits slow the import down. Can be given multiple times, the first one comes first.
+         
+         Use 'favorite' for the favorites of Enpass,
+         'category:<category>' for the entries of a 1Password category, for example 'category:login',
+         and 'folder:<folder>' for the entries of an Enpass folder, by its name or its UUID.
+         
+         Otherwise, the entries are created in the order of the Enpass export.
+         Cannot be combined with '--stream'.
+         """,
+)
+@click.option(
+    "--verify",
+    is_flag=True,
+    help="""
+         Compare the 1Password vaults with the Enpass export instead of importing anything, for example after an import.
+         Every entry is read back from 1Password, and the title, category, notes, fields, websites, tags and attachments
+         are compared with what would be created from the Enpass export.
+         Reading does not count against the write rate limits.
+         
+         The entries that are missing, extra or different are listed, and the tool exits with 1 if there are any.
+         Entries are paired up by the journal, or else by their title, first website and username.
+         """,
+)
+@click.option(
+    "--verify-report",
+    "verify_report_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         A file to which '--verify' writes the missing, extra and different entries as JSON.
+         It names the parts of an entry that differ, but not their values.
+         """,
+)
+@click.option(
+    "--read-concurrency",
+    "read_concurrency",
+    type=click.INT,
+    callback=is_positive,
+    default=16,
+    show_default=True,
+    help="""
+         The number of 1Password entries that '--verify' reads at the same time.
+         """,
+)
 @click.option(
     "--op-rate-limit-hourly",
     "rate_limit_h",
@@ -139,6 +417,7 @@ def is_zero_or_positive(ctx, param, value):
     show_default=True,
     help="""
          1Password enforces a write request rate limit per 1Password Service Account.
+         With '--additional-op-sa-token', it applies to each of the service accounts.
          The hourly rate limit as of 2025-01-01 is 100 requests per hour for private, family and team accounts
          and 1'000 requests per hour for Business accounts.
          
@@ -162,6 +441,36 @@ def is_zero_or_positive(ctx, param, value):
          See https://developer.1password.com/docs/service-accounts/rate-limits/ for more info.
          """,
 )
+@click.option(
+    "--rate-limit-state",
+    "rate_limit_state",
+    type=click.Path(dir_okay=False, writable=True),
+    callback=is_sqlite_file,
+    show_default="in the user's application directory",
+    help="""
+         A file in which this tool records its write requests to 1Password.
+         When the tool is restarted, it therefore knows how much of the hourly and daily rate limits have already
+         been used, and it waits accordingly before it sends the first request.
+         
+         The file must end in '.sqlite'. Delete it to start over with the full rate limits.
+         """,
+)
+@click.option(
+    "--max-retries",
+    "max_retries",
+    type=click.INT,
+    callback=is_zero_or_positive,
+    default=5,
+    show_default=True,
+    help="""
+         How often the creation of a 1Password entry is retried,
+         when the 1Password server rejected it due to its rate limits or when it failed temporarily,
+         for example due to a network error.
+         The waiting time before every retry doubles, and all other entries wait as well
+         when the 1Password server rejected an entry due to its rate limits.
+         Entries that are invalid are never retried.
+         """,
+)
 @click.option(
     "--op-client-validity",
     "client_validity_s",
@@ -174,10 +483,33 @@ def is_zero_or_positive(ctx, param, value):
          This authentication is only valid for a certain amount of time.
          With this parameter, you can adjust the time after which a this tool re-authenticates with the
          1Password server.
+         It does so in the background shortly before this time is up, so that creating entries does not pause.
          
          The value is in seconds.
          """,
 )
+@click.option(
+    "--metrics-json",
+    "metrics_json_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         A file to which this tool writes statistics about the import when it ends, as JSON:
+         how long every phase took, how long creating the 1Password entries and waiting for the
+         rate limits took, how often requests were retried, and how many entries were created per second.
+         
+         This helps to tune '--concurrency' and the rate limits.
+         """,
+)
+@click.option(
+    "--prometheus-textfile",
+    "prometheus_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="""
+         A file to which this tool writes the same statistics as '--metrics-json' while the import runs,
+         in the text format of Prometheus. It is updated every 15 seconds.
+         Point the textfile collector of the Prometheus node exporter to its directory to watch the import.
+         """,
+)
 @click.argument(
     "enpass_json_export",
     default="export.json",
@@ -198,9 +530,82 @@ def main(
     rate_limit_h,
     rate_limit_d,
     client_validity_s,
+    journal_path,
+    resume,
+    concurrency,
+    skip_existing,
+    rate_limit_state,
+    max_retries,
+    map_workers,
+    streaming,
+    additional_sa_tokens,
+    vault_map_path,
+    metrics_json_path,
+    prometheus_path,
+    priorities,
+    index_path,
+    onepux_path,
+    verify,
+    verify_report_path,
+    read_concurrency,
+    manifest_path,
+    archive_deleted,
+    jobs,
+    dead_letters_path,
+    retry_dead_letters,
 ):
-    """Adds items from an Enpass JSON export to a 1Password vault through the 1Password API."""
+    """Adds items from an Enpass JSON export to a 1Password vault through the 1Password API, or to a 1PUX file."""
+    if jobs and (
+        journal_path
+        or skip
+        or index_path
+        or vault_map_path
+        or manifest_path
+        or onepux_path
+        or verify
+        or dead_letters_path
+    ):
+        raise click.UsageError(
+            "'--journal', '--skip', '--index', '--vault-map', '--sync', '--1pux', '--verify' and '--dead-letters' "
+            "only work with a single Enpass export, so they cannot be combined with '--job'."
+        )
+    if not journal_path and enpass_json_export.name != "<stdin>":
+        journal_path = f"{enpass_json_export.name}.journal"
+    if resume and not journal_path:
+        raise click.UsageError("Use '--journal' to tell where the journal is.")
+    if priorities and streaming:
+        raise click.UsageError(
+            "'--priority' sorts all entries before the first one is created, "
+            "so it cannot be combined with '--stream'."
+        )
+    if archive_deleted and not manifest_path:
+        raise click.UsageError("'--archive-deleted' only works with '--sync'.")
+    if manifest_path and (streaming or resume or skip or onepux_path):
+        raise click.UsageError(
+            "'--sync' compares the whole Enpass export with the manifest, "
+            "so it cannot be combined with '--stream', '--resume', '--skip' or '--1pux'."
+        )
+    if retry_dead_letters and not dead_letters_path:
+        raise click.UsageError(
+            "Use '--dead-letters' to tell where the entries that were set aside are."
+        )
+    if dead_letters_path and (onepux_path or verify or manifest_path):
+        raise click.UsageError(
+            "'--dead-letters' cannot be combined with '--1pux', '--verify' or '--sync'."
+        )
+    if verify and onepux_path:
+        raise click.UsageError(
+            "'--verify' compares the vaults of 1Password, so it cannot be combined with '--1pux'."
+        )
+    if not rate_limit_state and not (onepux_path or verify):
+        # only resolved once it is used, because it imports the rate limiter
+        from enpass2onepassword.ratelimit import default_state_path
+
+        rate_limit_state = default_state_path()
+
     if not silent:
+        from enpass2onepassword import __version__
+
         click.echo(
             f"{click.style(__distribution_name__, bold=True)} version {click.style(__version__, fg='cyan')}. "
             f"(c) by {click.style('Christian Mäder', bold=True)}. "
@@ -211,22 +616,116 @@ def main(
             f"Reading file '{click.style(enpass_json_export.name, fg='green')}'…"
         )
 
-    asyncio.run(
-        migrate(
-            enpass_json_export,
-            sa_name,
-            sa_token,
-            op_vault,
-            ignore_non_empty,
-            no_confirm,
-            silent,
-            skip,
-            no_wakelock,
-            rate_limit_h,
-            rate_limit_d,
-            client_validity_s,
-        )
-    )
+    import asyncio
+
+    from enpass2onepassword.metrics import Metrics, exporting
+    from enpass2onepassword.migration import Job, migrate, migrate_jobs
+    from enpass2onepassword.onepux import export_1pux
+    from enpass2onepassword.verify import verify as verify_vaults
+
+    vault_map = read_vault_map(vault_map_path) if vault_map_path else None
+
+    async def run():
+        metrics = Metrics()
+        async with exporting(metrics, metrics_json_path, prometheus_path):
+            if onepux_path:
+                await export_1pux(
+                    enpass_json_export,
+                    onepux_path,
+                    op_vault,
+                    silent,
+                    skip,
+                    map_workers,
+                    vault_map,
+                    metrics=metrics,
+                )
+                return
+
+            if verify:
+                return await verify_vaults(
+                    enpass_json_export,
+                    sa_name,
+                    sa_token,
+                    op_vault,
+                    silent,
+                    client_validity_s,
+                    vault_map,
+                    # the manifest of '--sync' pairs the entries up like the journal
+                    manifest_path or journal_path,
+                    read_concurrency,
+                    max_retries,
+                    map_workers,
+                    verify_report_path,
+                    metrics=metrics,
+                )
+
+            if jobs:
+                await migrate_jobs(
+                    [
+                        Job(enpass_json_export, op_vault, journal_path),
+                        *(
+                            Job(ep_file, vault, f"{ep_file.name}.journal")
+                            for ep_file, vault in jobs
+                        ),
+                    ],
+                    sa_name,
+                    sa_token,
+                    no_wakelock,
+                    rate_limit_h,
+                    rate_limit_d,
+                    client_validity_s,
+                    additional_sa_tokens,
+                    rate_limit_state,
+                    ignore_non_empty=ignore_non_empty,
+                    no_confirm=no_confirm,
+                    silent=silent,
+                    skip=0,
+                    concurrency=concurrency,
+                    resume=resume,
+                    skip_existing=skip_existing,
+                    max_retries=max_retries,
+                    map_workers=map_workers,
+                    streaming=streaming,
+                    priorities=priorities,
+                    metrics=metrics,
+                )
+                return
+
+            await migrate(
+                enpass_json_export,
+                sa_name,
+                sa_token,
+                op_vault,
+                ignore_non_empty,
+                no_confirm,
+                silent,
+                skip,
+                no_wakelock,
+                rate_limit_h,
+                rate_limit_d,
+                client_validity_s,
+                concurrency,
+                journal_path,
+                resume,
+                skip_existing,
+                rate_limit_state,
+                max_retries,
+                map_workers,
+                streaming,
+                additional_sa_tokens,
+                vault_map,
+                priorities,
+                index_path,
+                manifest_path,
+                archive_deleted,
+                dead_letters_path,
+                retry_dead_letters,
+                metrics=metrics,
+            )
+
+    report = asyncio.run(run())
+    if report and not report.ok():
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import base64
+import binascii
+import os
+from typing import NamedTuple, Optional
+
+# the base64 text of an attachment may be wrapped into lines
+_whitespace = str.maketrans("", "", " \t\n\r")
+
+
+class Attachment(NamedTuple):
+    """A file that is attached to an Enpass item."""
+
+    name: str
+    path: Optional[str] = None
+    """The decoded content on disk, when the export was read with an `AttachmentSpool`."""
+    data: Optional[str] = None
+    """The content as base64, otherwise."""
+
+    def read(self):
+        if self.path is None:
+            return base64.b64decode(self.data)
+
+        with open(self.path, "rb") as attachment_file:
+            return attachment_file.read()
+
+    def discard(self):
+        """Frees the disk space once the attachment has been uploaded."""
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def map_attachments(ep_item):
+    """Returns the attachments of the Enpass item in the order in which Enpass shows them."""
+    ep_attachments = ep_item.get("attachments") or ()
+    return tuple(
+        Attachment(
+            ep_attachment.get("name") or f"attachment {number}",
+            ep_attachment.get("file"),
+            ep_attachment.get("data"),
+        )
+        for number, ep_attachment in enumerate(
+            sorted(ep_attachments, key=lambda a: a.get("order", 0)), start=1
+        )
+    )
+
+
+class Base64File:
+    """Decodes base64 text, that arrives piece by piece, into a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.pending = ""
+        self.size = 0
+
+    def write(self, text):
+        text = self.pending + text.translate(_whitespace)
+        # only whole groups of four characters can be decoded
+        usable = len(text) - len(text) % 4
+        self.pending = text[usable:]
+        if usable:
+            data = binascii.a2b_base64(text[:usable])
+            self.file.write(data)
+            self.size += len(data)
+
+    def close(self):
+        self.file.close()
+        if self.pending:
+            raise ValueError(f"The attachment '{self.path}' is not valid base64")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AttachmentSpool:
+    """
+    Keeps the decoded attachments of the Enpass export in a directory until they are uploaded.
+
+    The items only carry the paths of their attachments,
+    so that the memory usage does not depend on the size of the attachments.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.count = 0
+
+    def open(self):
+        self.count += 1
+        return Base64File(os.path.join(self.directory, f"{self.count:08d}"))
+
+    def store(self, ep_item):
+        """Moves the base64 content of attachments that have already been decoded with the item to files."""
+        for ep_attachment in ep_item.get("attachments") or ():
+            if isinstance(ep_attachment, dict) and "data" in ep_attachment:
+                with self.open() as attachment_file:
+                    attachment_file.write(ep_attachment.pop("data"))
+                ep_attachment["file"] = attachment_file.path
+                ep_attachment["size"] = attachment_file.size
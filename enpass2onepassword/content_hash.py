@@ -0,0 +1,53 @@
+import hashlib
+from collections import Counter
+
+
+def digest(*parts):
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=8).hexdigest()
+
+
+def normalize_text(value):
+    return (value or "").replace("\r\n", "\n").strip()
+
+
+def content_digests(op_item, files=()):
+    """
+    Returns the hashes of the title, category, notes, fields, websites, tags and files of an item, by their name.
+
+    It takes the parameters with which an item is created as well as the item that is read back from 1Password.
+    `files` are the names and sizes of the files of the item.
+    Parts that an item can have several of are counted, so that a duplicate is a difference, too.
+    """
+    category = getattr(op_item.category, "value", op_item.category)
+    parts = Counter(
+        [
+            ("title", digest(normalize_text(op_item.title))),
+            ("category", digest(str(category))),
+            ("notes", digest(normalize_text(op_item.notes))),
+        ]
+    )
+    for field in op_item.fields or []:
+        field_type = getattr(field.field_type, "value", field.field_type)
+        parts[
+            (
+                f"field '{field.title}'",
+                digest(
+                    field.section_id or "",
+                    str(field_type),
+                    normalize_text(field.value),
+                ),
+            )
+        ] += 1
+    for website in op_item.websites or []:
+        parts[
+            ("websites", digest(normalize_text(website.url), website.label or ""))
+        ] += 1
+    for tag in op_item.tags or []:
+        parts[("tags", digest(normalize_text(tag)))] += 1
+    for name, size in files:
+        parts[(f"file '{name}'", digest(str(size)))] += 1
+    return parts
+
+
+def differing_parts(expected, actual):
+    return sorted({name for name, _ in (expected - actual) + (actual - expected)})
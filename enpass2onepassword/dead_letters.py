@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+import click
+
+from enpass2onepassword.journal import write_atomically
+
+
+def read_dead_letters(dead_letters_path):
+    """
+    Returns the Enpass items that were set aside and have not been created since, by their uuid.
+
+    Like in the journal, the last record of an uuid counts, and a line that was only partially written is ignored.
+    """
+    records = {}
+    if not dead_letters_path or not os.path.exists(dead_letters_path):
+        return records
+
+    with open(dead_letters_path, mode="r", encoding="utf-8") as dead_letters_file:
+        for line in dead_letters_file:
+            try:
+                record = json.loads(line)
+                ep_uuid = record["uuid"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if record.get("resolved"):
+                records.pop(ep_uuid, None)
+            else:
+                records[ep_uuid] = record
+
+    return records
+
+
+class DeadLetters:
+    """
+    The Enpass items that could not be mapped or created, together with the reason, so that the migration goes on.
+
+    Every item is noted right away, like in the journal.
+    An item that is created in a later run is noted as resolved,
+    and the file is compacted to the items that are still set aside once the run is done.
+    """
+
+    def __init__(self, dead_letters_path):
+        self.dead_letters_path = dead_letters_path
+        self.pending = read_dead_letters(dead_letters_path)
+        self.added = 0
+        self.dead_letters_file = None
+
+    def __enter__(self):
+        try:
+            self.dead_letters_file = open(
+                self.dead_letters_path, mode="a", encoding="utf-8"
+            )
+        except OSError as e:
+            click.echo(
+                f"Unable to open the dead letters '{self.dead_letters_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+            raise click.Abort()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.dead_letters_file.close()
+        self.dead_letters_file = None
+        try:
+            write_atomically(
+                self.dead_letters_path,
+                "".join(json.dumps(record) + "\n" for record in self.pending.values()),
+            )
+        except OSError as e:
+            click.echo(
+                f"Unable to compact the dead letters '{self.dead_letters_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+
+        if self.added:
+            click.secho(
+                f"{self.added} Enpass entries could not be created and were set aside in "
+                f"'{self.dead_letters_path}'. Use '--retry-dead-letters' to try them again.",
+                fg="yellow",
+                err=True,
+            )
+
+    def put(self, number, ep_uuid, title, stage, reason):
+        """Sets an item aside. The `stage` is either 'map' or 'upload'."""
+        record = {
+            "uuid": ep_uuid,
+            "number": number,
+            "title": title,
+            "stage": stage,
+            "reason": reason,
+            "at": int(time.time()),
+        }
+        self.write(record)
+        self.pending[ep_uuid] = record
+        self.added += 1
+
+    def resolve(self, ep_uuid):
+        """Notes that an item, that was set aside before, has been created now."""
+        if self.pending.pop(ep_uuid, None) is not None:
+            self.write({"uuid": ep_uuid, "resolved": True})
+
+    def write(self, record):
+        self.dead_letters_file.write(json.dumps(record) + "\n")
+        self.dead_letters_file.flush()
+        os.fsync(self.dead_letters_file.fileno())
@@ -0,0 +1,128 @@
+import json
+import os
+from typing import NamedTuple
+
+import click
+
+from enpass2onepassword.streaming import CHUNK_SIZE, ExportReader, raise_load_error
+
+INDEX_VERSION = 1
+
+
+class IndexEntry(NamedTuple):
+    """Where an item is in the Enpass export, and what is needed to decide whether to read it."""
+
+    offset: int
+    length: int
+    uuid: str
+    category: str
+    hidden: bool
+    """Whether the item is trashed or archived, and is therefore never migrated."""
+    folders: list
+
+
+def export_stamp(ep_file):
+    """Returns the size and the modification time of the export, or None when it is not a file that can be indexed."""
+    try:
+        if not ep_file.seekable() or not isinstance(ep_file.read(0), bytes):
+            return None
+        stat = os.fstat(ep_file.fileno())
+    except (AttributeError, OSError):
+        return None
+
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class IndexBuilder:
+    """Collects the offsets of the items while the export is read, and writes the index once all are known."""
+
+    def __init__(self, index_path, stamp):
+        self.index_path = index_path
+        self.stamp = stamp
+        self.entries = []
+
+    def add(self, offset, length, ep_item):
+        self.entries.append(
+            IndexEntry(
+                offset,
+                length,
+                ep_item.get("uuid"),
+                ep_item.get("category"),
+                ep_item.get("trashed", 0) != 0 or ep_item.get("archived", 0) != 0,
+                ep_item.get("folders", []),
+            )
+        )
+
+    def write(self, ep_folders):
+        header = {"version": INDEX_VERSION, **self.stamp, "folders": ep_folders}
+        temporary_path = f"{self.index_path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as index_file:
+                index_file.write(json.dumps(header) + "\n")
+                # a single line, so that the entries are decoded in one go
+                json.dump(self.entries, index_file)
+            os.replace(temporary_path, self.index_path)
+        except OSError as e:
+            click.echo(
+                f"Unable to write the index '{self.index_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+
+
+class ExportIndex:
+    """The folders of an Enpass export and the offsets of its items, as noted by a previous run."""
+
+    def __init__(self, folders, entries):
+        self.folders = folders
+        self.entries = entries
+
+    async def items(self, ep_file, wanted, spool=None, chunk_size=CHUNK_SIZE):
+        """
+        Yields the number and the Enpass item of every item that is `wanted` and not hidden.
+
+        `wanted` is called with the number and the uuid of every item, in the order of the export.
+        Only the items that are yielded are read from the export.
+        """
+        try:
+            for number, entry in enumerate(self.entries):
+                if not wanted(number, entry.uuid) or entry.hidden:
+                    continue
+
+                ep_file.seek(entry.offset)
+                # one more byte for the separator after the item, so that the item is decoded at once
+                reader = ExportReader(ep_file, min(entry.length + 1, chunk_size), spool)
+                yield number, reader.item() if spool else reader.value()
+        except ValueError as e:
+            raise_load_error(e)
+
+
+def read_index(index_path, stamp):
+    """Returns the index, or None if there is none yet or if it belongs to another version of the export."""
+    try:
+        with open(index_path, encoding="utf-8") as index_file:
+            header = json.loads(index_file.readline())
+            if header != {
+                "version": INDEX_VERSION,
+                **stamp,
+                "folders": header.get("folders"),
+            }:
+                click.secho(
+                    f"The index '{index_path}' belongs to another version of the Enpass export "
+                    "and is built again.",
+                    fg="yellow",
+                    err=True,
+                )
+                return None
+
+            entries = [IndexEntry(*entry) for entry in json.load(index_file)]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        click.secho(
+            f"The index '{index_path}' cannot be read and is built again: {e}",
+            fg="yellow",
+            err=True,
+        )
+        return None
+
+    return ExportIndex(header["folders"], entries)
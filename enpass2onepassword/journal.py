@@ -0,0 +1,80 @@
+import json
+import os
+
+import click
+
+
+def read_journal(journal_path, vault_ids=None):
+    """
+    Returns a mapping of the Enpass uuids in the journal to the ids of the 1Password items created for them.
+
+    With `vault_ids`, only the items that were created in one of these vaults count,
+    so that a journal of a migration into another vault is not taken for this one.
+    A line that was only partially written, because the previous run was interrupted, is ignored.
+    """
+    created = {}
+    if not journal_path or not os.path.exists(journal_path):
+        return created
+
+    with open(journal_path, mode="r", encoding="utf-8") as journal_file:
+        for line in journal_file:
+            try:
+                record = json.loads(line)
+                ep_uuid, op_id = record["uuid"], record["id"]
+                vault_id = record.get("vault_id")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if vault_ids is None or vault_id in vault_ids:
+                created[ep_uuid] = op_id
+
+    return created
+
+
+def write_atomically(path, text):
+    """
+    Replaces the file as a whole, so that nobody ever reads half of it.
+
+    The new content is on disk before it replaces the old one, so that a crash does not leave an empty file behind.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as temporary_file:
+        temporary_file.write(text)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
+
+
+class Journal:
+    """
+    Append-only record of the 1Password items that have been created for Enpass items.
+
+    Every record is flushed to disk before the next item is created,
+    so that an interrupted migration can be resumed exactly where it stopped.
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.journal_file = None
+
+    def __enter__(self):
+        try:
+            self.journal_file = open(self.journal_path, mode="a", encoding="utf-8")
+        except OSError as e:
+            click.echo(
+                f"Unable to open the journal '{self.journal_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+            raise click.Abort()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.journal_file.close()
+        self.journal_file = None
+
+    def record(self, ep_uuid, op_item):
+        line = json.dumps(
+            {"uuid": ep_uuid, "id": op_item.id, "vault_id": op_item.vault_id}
+        )
+        self.journal_file.write(line + "\n")
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
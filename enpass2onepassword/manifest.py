@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+
+import click
+
+from enpass2onepassword.content_hash import content_digests
+from enpass2onepassword.journal import write_atomically
+
+
+def sync_hash(op_item):
+    """
+    Returns a hash of the content of a mapped item, to tell whether an Enpass item changed since the last sync.
+
+    The attachments are not part of it, because they are only uploaded when the item is created.
+    """
+    parts = sorted(content_digests(op_item).elements())
+    return hashlib.blake2b(json.dumps(parts).encode(), digest_size=16).hexdigest()
+
+
+def read_manifest(manifest_path):
+    """
+    Returns the records of the manifest by the Enpass uuid.
+
+    Like in the journal, the last record of an uuid counts, and a line that was only partially written is ignored.
+    """
+    records = {}
+    if not manifest_path or not os.path.exists(manifest_path):
+        return records
+
+    with open(manifest_path, mode="r", encoding="utf-8") as manifest_file:
+        for line in manifest_file:
+            try:
+                record = json.loads(line)
+                ep_uuid = record["uuid"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if record.get("id"):
+                records[ep_uuid] = record
+            else:
+                records.pop(ep_uuid, None)
+
+    return records
+
+
+class Manifest:
+    """
+    Remembers the 1Password item of every Enpass item, together with the hash of its content, across syncs.
+
+    It is written like the journal, with one line per created, updated or archived item,
+    so that an interrupted sync does not lose track of the items that it already wrote.
+    It is compacted to one line per item once the sync is done.
+    Its lines can be read by `read_journal`, too.
+
+    The first manifest starts out with the items of the journal of an earlier migration, if there is one.
+    Their content is not known, so they are updated once by the first sync.
+    """
+
+    def __init__(self, manifest_path, journal_path=None):
+        self.manifest_path = manifest_path
+        self.records = read_manifest(
+            manifest_path if os.path.exists(manifest_path) else journal_path
+        )
+        self.hashes = {}
+        self.manifest_file = None
+
+    def __enter__(self):
+        try:
+            self.manifest_file = open(self.manifest_path, mode="a", encoding="utf-8")
+        except OSError as e:
+            click.echo(
+                f"Unable to open the manifest '{self.manifest_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+            raise click.Abort()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.manifest_file.close()
+        self.manifest_file = None
+        try:
+            write_atomically(
+                self.manifest_path,
+                "".join(json.dumps(record) + "\n" for record in self.records.values()),
+            )
+        except OSError as e:
+            click.echo(
+                f"Unable to compact the manifest '{self.manifest_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+
+    def plan(self, entries):
+        """
+        Sorts the entries into the new ones, the changed ones and the unchanged ones.
+
+        The changed entries are returned with the id of their 1Password item, so that it is updated.
+        The Enpass items that are in the manifest, but not among the entries, were deleted.
+        """
+        new, changed, unchanged = [], [], []
+        for entry in entries:
+            content_hash = sync_hash(entry.op_item)
+            self.hashes[entry.ep_uuid] = content_hash
+
+            record = self.records.get(entry.ep_uuid)
+            if record is None:
+                new.append(entry)
+            elif record.get("hash") != content_hash:
+                changed.append(entry._replace(op_id=record["id"]))
+            else:
+                unchanged.append(entry)
+
+        seen = {entry.ep_uuid for entry in entries}
+        deleted = [
+            record for ep_uuid, record in self.records.items() if ep_uuid not in seen
+        ]
+        return new, changed, unchanged, deleted
+
+    def record(self, ep_uuid, op_item):
+        self.write(
+            {
+                "uuid": ep_uuid,
+                "id": op_item.id,
+                "vault_id": op_item.vault_id,
+                "hash": self.hashes.get(ep_uuid),
+            }
+        )
+
+    def adopt(self, ep_uuid, op_id, vault_id):
+        """Notes an item that already existed in the vault as the 1Password item of an Enpass item."""
+        self.write(
+            {
+                "uuid": ep_uuid,
+                "id": op_id,
+                "vault_id": vault_id,
+                "hash": self.hashes.get(ep_uuid),
+            }
+        )
+
+    def forget(self, ep_uuid):
+        """Notes that the 1Password item of a deleted Enpass item was archived."""
+        self.write({"uuid": ep_uuid, "id": None})
+
+    def write(self, record):
+        self.manifest_file.write(json.dumps(record) + "\n")
+        self.manifest_file.flush()
+        os.fsync(self.manifest_file.fileno())
+        if record["id"]:
+            self.records[record["uuid"]] = record
+        else:
+            self.records.pop(record["uuid"], None)
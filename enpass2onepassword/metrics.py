@@ -0,0 +1,258 @@
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+
+import click
+
+from enpass2onepassword.journal import write_atomically
+
+# the upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS_S = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    900.0,
+    3600.0,
+)
+PROMETHEUS_INTERVAL_S = 15.0
+PREFIX = "enpass2onepassword"
+
+
+class Histogram:
+    """Counts observations in buckets, like a Prometheus histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_S):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+    def quantile(self, q):
+        """Estimates the quantile by the upper bound of the bucket that it falls into."""
+        if self.count == 0:
+            return 0.0
+
+        for bound, total in zip(self.buckets, self.cumulative_counts()):
+            if total >= q * self.count:
+                return min(bound, self.max)
+        return self.max
+
+    def report(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(map(str, self.buckets), self.cumulative_counts())),
+        }
+
+
+class Metrics:
+    """
+    The timings and counters of a migration.
+
+    The phases are the steps of the migration, which are timed as a whole.
+    A phase that is started again while it is running, like the upload of several jobs, is timed only once.
+    The histograms are observed on the hot path, once per request to 1Password.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.outcome = "running"
+        self.phases = {}
+        self.running = set()
+        self.create_latency = Histogram()
+        self.limiter_wait = Histogram()
+        self.retries = Counter()
+        self.items_created = 0
+        self.items_failed = 0
+
+    @contextmanager
+    def phase(self, name):
+        if name in self.running:
+            yield
+            return
+
+        self.running.add(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.running.discard(name)
+            self.record_phase(name, time.perf_counter() - started)
+
+    def record_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def items_per_second(self):
+        upload_s = self.phases.get("upload", 0.0)
+        return self.items_created / upload_s if upload_s else 0.0
+
+    def report(self):
+        return {
+            "started": self.started,
+            "elapsed_s": time.time() - self.started,
+            "outcome": self.outcome,
+            "phases_s": dict(self.phases),
+            "items_created": self.items_created,
+            "items_failed": self.items_failed,
+            "items_per_s": self.items_per_second(),
+            "retries": dict(self.retries),
+            "create_latency_s": self.create_latency.report(),
+            "limiter_wait_s": self.limiter_wait.report(),
+        }
+
+    def prometheus(self):
+        """Renders the metrics in the text format of Prometheus, for the textfile collector of the node exporter."""
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append(f"# HELP {PREFIX}_{name} {description}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{v}"' for key, v in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{PREFIX}_{name}{suffix}{label_text} {value}")
+
+        def histogram(name, description, h):
+            samples = [
+                ("_bucket", {"le": bound}, total)
+                for bound, total in zip(h.buckets, h.cumulative_counts())
+            ]
+            samples += [
+                ("_bucket", {"le": "+Inf"}, h.count),
+                ("_sum", {}, h.sum),
+                ("_count", {}, h.count),
+            ]
+            metric(name, "histogram", description, samples)
+
+        metric(
+            "phase_seconds",
+            "gauge",
+            "The time spent in each phase of the migration.",
+            [("", {"phase": name}, seconds) for name, seconds in self.phases.items()],
+        )
+        metric(
+            "items_created_total",
+            "counter",
+            "The 1Password items that have been created.",
+            [("", {}, self.items_created)],
+        )
+        metric(
+            "items_failed_total",
+            "counter",
+            "The 1Password items that could not be created.",
+            [("", {}, self.items_failed)],
+        )
+        metric(
+            "items_per_second",
+            "gauge",
+            "The items created per second of uploading.",
+            [("", {}, self.items_per_second())],
+        )
+        metric(
+            "retries_total",
+            "counter",
+            "The retried requests, by the reason of the retry.",
+            [("", {"kind": kind}, count) for kind, count in self.retries.items()],
+        )
+        histogram(
+            "create_seconds",
+            "The latency of the requests that create 1Password items.",
+            self.create_latency,
+        )
+        histogram(
+            "limiter_wait_seconds",
+            "The time that a write request waited for the rate limiter.",
+            self.limiter_wait,
+        )
+        metric(
+            "last_update_timestamp_seconds",
+            "gauge",
+            "When these metrics were written.",
+            [("", {}, time.time())],
+        )
+
+        return "\n".join(lines) + "\n"
+
+
+def write_metrics(metrics, json_path=None, prometheus_path=None):
+    try:
+        if json_path:
+            write_atomically(json_path, json.dumps(metrics.report(), indent=2) + "\n")
+        if prometheus_path:
+            write_atomically(prometheus_path, metrics.prometheus())
+    except OSError as e:
+        click.echo(
+            f"Unable to write the metrics: {click.style(e, fg='red')}",
+            err=True,
+        )
+
+
+@asynccontextmanager
+async def exporting(
+    metrics, json_path=None, prometheus_path=None, interval_s=PROMETHEUS_INTERVAL_S
+):
+    """
+    Writes the Prometheus textfile every `interval_s` seconds while the migration runs.
+
+    When it ends, no matter how, the JSON report and the Prometheus textfile are written once more.
+    """
+
+    async def update_periodically():
+        while True:
+            await asyncio.sleep(interval_s)
+            write_metrics(metrics, prometheus_path=prometheus_path)
+
+    task = asyncio.create_task(update_periodically()) if prometheus_path else None
+    try:
+        yield metrics
+        metrics.outcome = "completed"
+    except BaseException:
+        metrics.outcome = "aborted"
+        raise
+    finally:
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        write_metrics(metrics, json_path, prometheus_path)
@@ -1,11 +1,20 @@
-import json
+import asyncio
+import tempfile
 import time
-from contextlib import contextmanager
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack, ExitStack, contextmanager, nullcontext
+from functools import partial
+from itertools import islice
+from multiprocessing import get_context
+from operator import attrgetter
+from typing import NamedTuple, Optional
 
 import click
 from aiostream import stream
 from onepassword import (
     AutofillBehavior,
+    FileCreateParams,
     ItemCategory,
     ItemCreateParams,
     ItemField,
@@ -14,10 +23,23 @@ from onepassword import (
     Website,
 )
 from onepassword.client import Client
-from pyrate_limiter import Duration, InMemoryBucket, Limiter, Rate
+from pyrate_limiter import BucketFullException, LimiterDelayException
 from wakepy.modes import keep
 
 from enpass2onepassword import __version__
+from enpass2onepassword.attachments import AttachmentSpool, map_attachments
+from enpass2onepassword.dead_letters import DeadLetters
+from enpass2onepassword.export_index import IndexBuilder, export_stamp, read_index
+from enpass2onepassword.journal import Journal, read_journal
+from enpass2onepassword.manifest import Manifest
+from enpass2onepassword.metrics import Metrics
+from enpass2onepassword.priority import rank
+from enpass2onepassword.ratelimit import WriteLimiter, estimate_s, format_duration
+from enpass2onepassword.retry import EXPIRED, THROTTLED, is_item_failure, with_retries
+from enpass2onepassword.routing import route, route_folders
+from enpass2onepassword.session import ClientHolder
+from enpass2onepassword.streaming import load_enpass_stream
+from enpass2onepassword.vault_index import VaultIndex
 
 
 async def migrate(
@@ -33,9 +55,543 @@ async def migrate(
     op_rate_limit_h,
     op_rate_limit_d,
     op_client_validity_s,
+    concurrency=1,
+    journal_path=None,
+    resume=False,
+    skip_existing=False,
+    rate_limit_state=None,
+    max_retries=0,
+    map_workers=1,
+    streaming=False,
+    additional_op_sa_tokens=(),
+    vault_map=None,
+    priorities=(),
+    index_path=None,
+    manifest_path=None,
+    archive_deleted=False,
+    dead_letters_path=None,
+    retry_dead_letters=False,
+    client_factory=Client.authenticate,
+    limiter=None,
+    metrics=None,
+    clients=None,
+    planned=None,
 ):
-    client, _ = await get_op_client(op_sa_name, op_sa_token)
-    vaults = await client.vaults.list_all()
+    """
+    Migrates an Enpass export into a 1Password vault.
+
+    `planned` is awaited with the entries that are going to be created, or with None while streaming,
+    right before the upload starts, instead of reporting and confirming them here.
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    manifest = Manifest(manifest_path, journal_path) if manifest_path else None
+
+    async with AsyncExitStack() as stack:
+        # one client per service account, and the first one is used to look at the vault
+        if clients is None:
+            clients = await enter_clients(
+                stack,
+                op_sa_name,
+                [op_sa_token, *additional_op_sa_tokens],
+                op_client_validity_s,
+                client_factory,
+                metrics.create_latency,
+            )
+
+        dead_letters = (
+            stack.enter_context(DeadLetters(dead_letters_path))
+            if dead_letters_path
+            else None
+        )
+        retried = set(dead_letters.pending) if retry_dead_letters else None
+
+        # the attachments are decoded to disk until they are uploaded
+        spool = AttachmentSpool(
+            stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="enpass2onepassword-")
+            )
+        )
+
+        stamp = export_stamp(ep_file) if index_path else None
+        if index_path and not stamp:
+            click.secho(
+                "The Enpass export is not a file, so it cannot be indexed.",
+                fg="yellow",
+                err=True,
+            )
+        export_index = read_index(index_path, stamp) if stamp else None
+
+        # the authentication runs while the beginning of the export is read
+        with metrics.phase("load"):
+            if export_index:
+                ep_folders = export_index.folders
+            else:
+                ep_folders, ep_items = await load_enpass_stream(
+                    ep_file,
+                    spool=spool,
+                    index=IndexBuilder(index_path, stamp) if stamp else None,
+                )
+
+        client = await clients[0].current()
+        metrics.record_phase("auth", clients[0].authentication_s)
+
+        vaults_started = time.perf_counter()
+        vault_ids, op_vault_id = await lookup_vaults(client, op_sa_name, op_vault)
+
+        folder_vault_ids = (
+            route_folders(ep_folders, vault_map, vault_ids) if vault_map else {}
+        )
+        vault_titles = {vault_id: title for title, vault_id in vault_ids.items()}
+        target_vault_ids = list(
+            dict.fromkeys([op_vault_id, *folder_vault_ids.values()])
+        )
+
+        for number, other_clients in enumerate(clients[1:], start=2):
+            other_client = await other_clients.current()
+            other_vaults = await stream.list(await other_client.vaults.list_all())
+            other_vault_ids = {other.id for other in other_vaults}
+            for vault_id in target_vault_ids:
+                if vault_id not in other_vault_ids:
+                    click.echo(
+                        message=f"The 1Password Service Account token number {number} "
+                        + f"does not have access to the vault '{vault_titles[vault_id]}'.",
+                        err=True,
+                    )
+                    raise click.Abort()
+
+        target_name = (
+            f"the vault '{op_vault}'" if len(target_vault_ids) == 1 else "their vaults"
+        )
+
+        vault_indexes = {}
+        non_empty_vault_ids = []
+        for vault_id in target_vault_ids:
+            vault_indexes[vault_id], vault_empty = await index_vault(
+                client, vault_id, skip_existing
+            )
+            if not vault_empty:
+                non_empty_vault_ids.append(vault_id)
+
+        if non_empty_vault_ids and not (
+            ignore_non_empty
+            or resume
+            or skip_existing
+            or (manifest and manifest.records)
+            or retry_dead_letters
+        ):
+            click.echo(
+                message=f"The vault '{vault_titles[non_empty_vault_ids[0]]}' already contains items.",
+                err=True,
+            )
+            if manifest:
+                click.echo(
+                    "The first sync does not know them. Use '--journal' with the journal of the earlier "
+                    "migration, or '--skip-existing' to take the matching items over.",
+                    err=True,
+                )
+            raise click.Abort()
+
+        metrics.record_phase("vaults", time.perf_counter() - vaults_started)
+
+        async def existing_id(entry):
+            if skip_existing and entry.op_item.vault_id in non_empty_vault_ids:
+                return await vault_indexes[entry.op_item.vault_id].find(entry.op_item)
+            return None
+
+        journaled = read_journal(journal_path, target_vault_ids) if resume else {}
+
+        ep_len = 0
+        resumed = 0
+
+        def wanted(number, ep_uuid):
+            nonlocal ep_len, resumed
+            ep_len += 1
+            if number < skip:
+                return False
+            if ep_uuid in journaled:
+                resumed += 1
+                return False
+            if retried is not None:
+                return ep_uuid in retried
+            return True
+
+        # with an index, only the wanted items are read from the export
+        remaining_ep_items = (
+            export_index.items(ep_file, wanted, spool)
+            if export_index
+            else wanted_ep_items(ep_items, wanted)
+        )
+
+        if streaming:
+            existing = 0
+
+            async def new_entries():
+                nonlocal existing
+                async for chunk_entries, errors in map_chunks(
+                    ep_folders,
+                    remaining_ep_items,
+                    op_vault_id,
+                    map_workers,
+                    STREAM_CHUNK_SIZE,
+                    folder_vault_ids,
+                ):
+                    if errors:
+                        report_mapping_errors(errors, dead_letters)
+
+                    for entry in chunk_entries:
+                        if await existing_id(entry):
+                            existing += 1
+                            continue
+                        yield entry
+
+            if planned:
+                await planned(None)
+
+            with (
+                keep_running(not no_wakelock),
+                Journal(journal_path) if journal_path else nullcontext() as journal,
+            ):
+                await upload_to_onepassword(
+                    no_confirm,
+                    op_sa_name,
+                    op_sa_token,
+                    op_rate_limit_d,
+                    op_rate_limit_h,
+                    op_client_validity_s,
+                    silent,
+                    skip,
+                    None,
+                    new_entries(),
+                    concurrency,
+                    journal,
+                    rate_limit_state,
+                    max_retries,
+                    client_factory,
+                    limiter,
+                    clients,
+                    additional_op_sa_tokens,
+                    target_vault_ids,
+                    metrics,
+                    dead_letters=dead_letters,
+                    announce=planned is None,
+                )
+
+            report_skipped(silent, skip, ep_len, resumed, existing, target_name)
+            return
+
+        with metrics.phase("map"):
+            entries = await map_entries(
+                ep_folders,
+                remaining_ep_items,
+                op_vault_id,
+                map_workers,
+                folder_vault_ids,
+                priorities,
+                dead_letters,
+            )
+
+        if skip >= ep_len:
+            if not silent:
+                click.secho(f"Skipping all {ep_len} Enpass entries.", fg="yellow")
+            return
+
+        # the manifest sees all entries, so that none of them is taken for deleted
+        deleted = []
+        changed = []
+        if manifest:
+            entries, changed, unchanged, deleted = manifest.plan(entries)
+            report_sync(silent, entries, changed, unchanged, deleted, archive_deleted)
+            if not archive_deleted:
+                deleted = []
+
+        existing = 0
+        if non_empty_vault_ids and skip_existing:
+            with metrics.phase("existing"):
+                new_entries = []
+                adopted = []
+                for entry in entries:
+                    if op_id := await existing_id(entry):
+                        existing += 1
+                        adopted.append((entry, op_id))
+                    else:
+                        new_entries.append(entry)
+                entries = new_entries
+
+            if manifest and adopted:
+                # the existing items are synced from now on
+                with manifest:
+                    for entry, op_id in adopted:
+                        manifest.adopt(entry.ep_uuid, op_id, entry.op_item.vault_id)
+
+        report_skipped(silent, skip, ep_len, resumed, existing, target_name)
+        entries += changed
+
+        if priorities:
+            # the sort is stable, so the entries of the same priority stay in export order
+            entries.sort(key=attrgetter("priority"))
+
+        if len(entries) == 0 and not deleted:
+            click.secho("No entries to create.", fg="yellow", bold=True)
+            return
+
+        if deleted and limiter is None:
+            # the archiving counts against the same rate limits as the uploads
+            limiter = WriteLimiter(
+                op_rate_limit_h, op_rate_limit_d, op_sa_token, rate_limit_state
+            )
+
+        if planned:
+            await planned(entries)
+
+        with (
+            keep_running(not no_wakelock),
+            manifest
+            or (Journal(journal_path) if journal_path else nullcontext()) as journal,
+        ):
+            if deleted:
+                await archive_items(
+                    clients[0], limiter, manifest, deleted, max_retries, metrics, silent
+                )
+            if len(entries) == 0:
+                return
+
+            await upload_to_onepassword(
+                no_confirm,
+                op_sa_name,
+                op_sa_token,
+                op_rate_limit_d,
+                op_rate_limit_h,
+                op_client_validity_s,
+                silent,
+                skip + resumed,
+                ep_len - skip - resumed,
+                entries,
+                concurrency,
+                journal,
+                rate_limit_state,
+                max_retries,
+                client_factory,
+                limiter,
+                clients,
+                additional_op_sa_tokens,
+                target_vault_ids,
+                metrics,
+                priorities,
+                dead_letters,
+                announce=planned is None,
+            )
+
+
+class Job(NamedTuple):
+    """An Enpass export and the 1Password vault that it is migrated to."""
+
+    ep_file: object
+    op_vault: str
+    journal_path: Optional[str] = None
+
+
+async def migrate_jobs(
+    jobs,
+    op_sa_name,
+    op_sa_token,
+    no_wakelock,
+    op_rate_limit_h,
+    op_rate_limit_d,
+    op_client_validity_s,
+    additional_op_sa_tokens=(),
+    rate_limit_state=None,
+    client_factory=Client.authenticate,
+    limiter=None,
+    metrics=None,
+    no_confirm=False,
+    silent=False,
+    **options,
+):
+    """
+    Migrates several Enpass exports at the same time, each into its own vault.
+
+    All of them share the clients of the service accounts and the limiter,
+    so that together they stay within the rate limits of the account, and they take turns with their writes.
+    Their uploads start together, once the entries of all of them are known and have been confirmed once.
+    The `options` are passed on to `migrate`.
+    """
+    if limiter is None:
+        limiter = WriteLimiter(
+            op_rate_limit_h, op_rate_limit_d, op_sa_token, rate_limit_state
+        )
+    if metrics is None:
+        metrics = Metrics()
+    limiters = [limiter, *map(limiter.shard, additional_op_sa_tokens)]
+
+    plans = {}
+    all_planned = asyncio.Event()
+    confirmed = False
+    # the uploads of the jobs overlap, so they are timed together from the confirmation on
+    upload_phase = ExitStack()
+
+    async def planned(number, entries):
+        nonlocal confirmed
+        plans[number] = entries
+        if len(plans) == len(jobs):
+            try:
+                uploads = {n: e for n, e in plans.items() if e is None or len(e) > 0}
+                if uploads and not silent:
+                    report_jobs(jobs, uploads, limiters, options.get("priorities", ()))
+                if uploads and not no_confirm:
+                    confirm()
+                confirmed = True
+                upload_phase.enter_context(metrics.phase("upload"))
+            finally:
+                all_planned.set()
+
+        await all_planned.wait()
+        if not confirmed:
+            raise click.Abort()
+
+    async def run_job(number, job):
+        await migrate(
+            job.ep_file,
+            op_sa_name,
+            op_sa_token,
+            job.op_vault,
+            no_confirm=True,
+            silent=silent,
+            no_wakelock=True,
+            op_rate_limit_h=op_rate_limit_h,
+            op_rate_limit_d=op_rate_limit_d,
+            op_client_validity_s=op_client_validity_s,
+            journal_path=job.journal_path,
+            rate_limit_state=rate_limit_state,
+            additional_op_sa_tokens=additional_op_sa_tokens,
+            client_factory=client_factory,
+            limiter=limiter,
+            metrics=metrics,
+            clients=clients,
+            planned=partial(planned, number),
+            **options,
+        )
+        if number not in plans:
+            # a job that has nothing to upload does not hold up the others
+            await planned(number, [])
+
+    async with AsyncExitStack() as stack:
+        clients = await enter_clients(
+            stack,
+            op_sa_name,
+            [op_sa_token, *additional_op_sa_tokens],
+            op_client_validity_s,
+            client_factory,
+            metrics.create_latency,
+        )
+        stack.enter_context(keep_running(not no_wakelock))
+
+        with upload_phase:
+            await run_workers(run_job(number, job) for number, job in enumerate(jobs))
+
+
+def report_jobs(jobs, plans, limiters, priorities):
+    """Tells what every job is going to create, and how long all of them take together."""
+    click.echo(
+        f"{click.style(len(plans), fg='green')} Enpass exports are migrated at the same time:"
+    )
+    for number, entries in sorted(plans.items()):
+        job = jobs[number]
+        name = getattr(job.ep_file, "name", f"number {number + 1}")
+        created = (
+            "converted while it is read"
+            if entries is None
+            else f"{click.style(len(entries), fg='green')} 1Password entries are created"
+        )
+        click.echo(f"- '{name}' into the vault '{job.op_vault}': {created}")
+
+    entries = [entry for job_entries in plans.values() for entry in job_entries or ()]
+    if entries:
+        report_schedule(limiters, entries, priorities)
+
+
+def confirm():
+    click.echo("Type 'y' to continue: ", nl=False)
+    c = click.getchar()
+    click.echo()
+    if c != "y":
+        raise click.Abort()
+
+
+async def enter_clients(
+    stack, op_sa_name, op_sa_tokens, op_client_validity_s, client_factory, latency
+):
+    """Sets up one client per service account, which is closed together with the `stack`."""
+    return [
+        await stack.enter_async_context(
+            ClientHolder(
+                partial(get_op_client, op_sa_name, token, client_factory),
+                op_client_validity_s,
+                latency,
+            )
+        )
+        for token in op_sa_tokens
+    ]
+
+
+def report_sync(silent, new, changed, unchanged, deleted, archive_deleted):
+    if silent:
+        return
+
+    click.echo(
+        f"Since the last sync, {click.style(len(new), fg='green')} Enpass entries are new, "
+        f"{click.style(len(changed), fg='green')} changed and {len(unchanged)} are unchanged."
+    )
+    if deleted:
+        action = (
+            "are archived"
+            if archive_deleted
+            else "are kept, use '--archive-deleted' to archive them"
+        )
+        click.echo(
+            f"{click.style(len(deleted), fg='green')} Enpass entries were deleted, "
+            f"and their 1Password entries {action}."
+        )
+
+
+async def archive_items(
+    clients, limiter, manifest, records, max_retries, metrics, silent
+):
+    """Archives the 1Password items of the Enpass items that were deleted since the last sync."""
+    for record in records:
+        client = None
+
+        async def archive():
+            nonlocal client
+            with metrics.limiter_wait.time():
+                await limiter.acquire()
+            client = await clients.current()
+            await client.items.archive(record["vault_id"], record["id"])
+
+        async def on_retry(e, kind, delay):
+            metrics.retries[kind] += 1
+            if kind == THROTTLED:
+                limiter.slow_down(delay)
+            elif kind == EXPIRED:
+                await clients.renew(client)
+
+        try:
+            await with_retries(archive, max_retries, on_retry)
+        except Exception as e:
+            click.echo(
+                f"Error archiving the 1Password entry {record['id']}: {e}", err=True
+            )
+            raise click.Abort()
+        manifest.forget(record["uuid"])
+
+    if not silent:
+        click.echo(f"Archived {len(records)} 1Password entries.")
+
+
+async def lookup_vaults(client, op_sa_name, op_vault):
+    """Returns the ids of the vaults that the service account can access by their title, and the id of `op_vault`."""
+    vaults = await stream.list(await client.vaults.list_all())
 
     if not vaults:
         click.echo(
@@ -44,103 +600,318 @@ async def migrate(
         )
         raise click.Abort()
 
-    vault = None
-    async for vault in vaults:
-        if vault.title == op_vault:
-            vault = vault
-            break
+    # the ids of the vaults are looked up once, by their title
+    vault_ids = {}
+    for vault in vaults:
+        vault_ids.setdefault(vault.title, vault.id)
 
-    if not vault:
+    op_vault_id = vault_ids.get(op_vault)
+    if not op_vault_id:
         click.echo(
             message=f"The vault '{op_vault}' does not exist or "
             + f"the 1Password Service Account '{op_sa_name}' does not have access.",
             err=True,
         )
         raise click.Abort()
-    op_vault_id = vault.id
 
-    # item = await client.items.get(vault_id=op_vault_id, item_id='uuid')
-    # breakpoint()
+    return vault_ids, op_vault_id
 
-    op_items_async_iter = await client.items.list_all(vault.id)
-    op_items = await stream.list(op_items_async_iter)
-    if op_items and not ignore_non_empty:
-        click.echo(message=f"The vault '{op_vault}' already contains items.", err=True)
-        raise click.Abort()
 
-    ep_folders, ep_items = await load_enpass_json(ep_file)
+async def wanted_ep_items(ep_items, wanted):
+    """Yields the number and the Enpass item of every item that is `wanted`."""
+    number = 0
+    async for ep_item in ep_items:
+        if wanted(number, ep_item.get("uuid")):
+            yield number, ep_item
+        number += 1
 
-    ep_len = len(ep_items)
-    if skip >= ep_len:
-        if not silent:
-            click.secho(f"Skipping all {ep_len} Enpass entries.", fg="yellow")
-        return
-    elif skip > 0:
-        click.echo(
-            f"Skipping {click.style(skip, fg='green')} entries of {ep_len} in total."
-        )
-        ep_items = ep_items[skip:]
 
-    op_items = await map_items(ep_folders, ep_items, op_vault_id)
+async def index_vault(client, vault_id, skip_existing):
+    """
+    Returns the index of the items in the vault and whether the vault is empty.
 
-    if len(op_items) == 0:
-        click.secho("No entries to create.", fg="yellow", bold=True)
-        return
+    The index is only filled with `skip_existing`, otherwise only the first item is listed.
+    """
+    op_overviews = await client.items.list_all(vault_id)
+    vault_index = VaultIndex(client, vault_id)
+    if skip_existing:
+        await vault_index.add_all(op_overviews)
+        return vault_index, len(vault_index) == 0
 
-    with keep_running(not no_wakelock):
-        await upload_to_onepassword(
-            no_confirm,
-            op_sa_name,
-            op_sa_token,
-            op_rate_limit_d,
-            op_rate_limit_h,
-            op_client_validity_s,
-            silent,
-            skip,
-            ep_items,
-            op_items,
-        )
+    async for _ in op_overviews:
+        return vault_index, False
+    return vault_index, True
 
 
-async def load_enpass_json(ep_file):
-    enpass = json.load(ep_file)
-    if not enpass:
-        click.echo(message="Unable to load the given Enpass export.", err=True)
-        raise click.Abort()
+def report_skipped(silent, skip, ep_len, resumed, existing, target_name):
+    if skip > 0:
+        click.echo(
+            f"Skipping {click.style(skip, fg='green')} entries of {ep_len} in total."
+        )
 
-    return enpass["folders"], enpass["items"]
+    if resumed > 0 and not silent:
+        click.echo(
+            f"Resuming after {click.style(resumed, fg='green')} entries "
+            f"that were already created according to the journal."
+        )
+
+    if existing > 0 and not silent:
+        click.echo(
+            f"Skipping {click.style(existing, fg='green')} entries "
+            f"that already exist in {target_name}."
+        )
 
 
 @contextmanager
 def keep_running(enabled):
     if not enabled:
         yield
+        return
 
     with keep.running():
         yield
 
 
-async def map_items(ep_folders, ep_items, op_vault_id):
+class Entry(NamedTuple):
+    number: int
+    """The position of the item in the Enpass export."""
+    ep_uuid: str
+    op_item: ItemCreateParams
+    priority: int = 0
+    """The position of the first priority that the item matches. Lower ones are created first."""
+    attachments: tuple = ()
+    """The files of the item. They are only read right before the item is created."""
+    op_id: Optional[str] = None
+    """The 1Password item to update with the content of the Enpass item, instead of creating a new one."""
+
+    def writes(self):
+        """Every attachment is uploaded with a write request of its own."""
+        if self.op_id:
+            # the attachments of an item are not updated
+            return 1
+        return 1 + len(self.attachments)
+
+    def with_files(self):
+        if not self.attachments:
+            return self.op_item
+
+        files = [
+            FileCreateParams(
+                name=attachment.name,
+                content=attachment.read(),
+                section_id=ATTACHMENTS_SECTION_ID,
+                field_id=f"attachment{number}",
+            )
+            for number, attachment in enumerate(self.attachments, start=1)
+        ]
+        return self.op_item.model_copy(update={"files": files})
+
+
+async def map_items(ep_folders, ep_items, op_vault_id, map_workers=1):
+    numbered_ep_items = (
+        stream.enumerate(ep_items)
+        if hasattr(ep_items, "__aiter__")
+        else enumerate(ep_items)
+    )
+    entries = await map_entries(ep_folders, numbered_ep_items, op_vault_id, map_workers)
+    return [entry.op_item for entry in entries]
+
+
+async def map_entries(
+    ep_folders,
+    numbered_ep_items,
+    op_vault_id,
+    map_workers=1,
+    folder_vault_ids=None,
+    priorities=(),
+    dead_letters=None,
+):
+    """
+    Maps the numbered Enpass items to 1Password items, skipping the trashed and archived ones.
+
+    The items go to the vault of their folder in `folder_vault_ids`, or else to the vault `op_vault_id`.
+    With more than one `map_workers`, chunks of the items are mapped in a pool of processes.
+    Either way, the entries keep the order of the Enpass export,
+    and all items that cannot be mapped are reported together before the migration is aborted,
+    unless they are set aside in the `dead_letters`.
+    """
+    entries = []
+    errors = []
+    async for chunk_entries, chunk_errors in map_chunks(
+        ep_folders,
+        numbered_ep_items,
+        op_vault_id,
+        map_workers,
+        folder_vault_ids=folder_vault_ids,
+        priorities=priorities,
+    ):
+        entries.extend(chunk_entries)
+        errors.extend(chunk_errors)
+
+    if errors:
+        report_mapping_errors(errors, dead_letters)
+
+    return entries
+
+
+async def map_chunks(
+    ep_folders,
+    numbered_ep_items,
+    op_vault_id,
+    map_workers=1,
+    size=None,
+    folder_vault_ids=None,
+    priorities=(),
+):
+    """Yields the entries and the mapping errors of one chunk of Enpass items after the other."""
     folders_mapping = {}
     for folder in ep_folders:
         folders_mapping[folder["uuid"]] = folder["title"]
 
-    op_items = []
-    for ep_item in ep_items:
+    chunks = chunked(numbered_ep_items, size or MAP_CHUNK_SIZE)
+    if map_workers <= 1:
+        async for chunk in chunks:
+            yield map_chunk(
+                folders_mapping, op_vault_id, chunk, folder_vault_ids, priorities
+            )
+        return
+
+    loop = asyncio.get_running_loop()
+    # The workers are spawned instead of forked,
+    # because the threads of this process, like those of the readers, must not be copied into them.
+    pool = ProcessPoolExecutor(map_workers, mp_context=get_context("spawn"))
+    pending = deque()
+    try:
+        async for chunk in chunks:
+            pending.append(
+                loop.run_in_executor(
+                    pool,
+                    map_chunk,
+                    folders_mapping,
+                    op_vault_id,
+                    chunk,
+                    folder_vault_ids,
+                    priorities,
+                )
+            )
+            # only keep a few chunks per worker in flight, to bound the memory
+            if len(pending) >= 2 * map_workers:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        # waiting for the workers would block the event loop, should the migration be aborted
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def report_mapping_errors(errors, dead_letters=None):
+    if dead_letters is not None:
+        for error in errors:
+            click.secho(f"Setting aside: {error}", fg="yellow", err=True)
+            dead_letters.put(
+                error.number, error.ep_uuid, error.title, "map", error.message
+            )
+        return
+
+    for error in errors:
+        click.echo(error, err=True)
+    click.echo(
+        f"{len(errors)} Enpass entries could not be mapped to 1Password entries.",
+        err=True,
+    )
+    raise click.Abort()
+
+
+MAP_CHUNK_SIZE = 256
+
+ATTACHMENTS_SECTION_ID = "attachments"
+
+# in streaming mode, smaller chunks let the first upload start sooner
+STREAM_CHUNK_SIZE = 16
+STREAM_QUEUE_SIZE = 64
+
+
+async def chunked(numbered_ep_items, size):
+    if not hasattr(numbered_ep_items, "__aiter__"):
+        iterator = iter(numbered_ep_items)
+        while chunk := list(islice(iterator, size)):
+            yield chunk
+        return
+
+    chunk = []
+    async for numbered_ep_item in numbered_ep_items:
+        chunk.append(numbered_ep_item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def map_chunk(
+    folders_mapping,
+    op_vault_id,
+    numbered_ep_items,
+    folder_vault_ids=None,
+    priorities=(),
+):
+    """Maps a chunk of numbered Enpass items. Runs in the worker processes of `map_entries`."""
+    entries = []
+    errors = []
+    for number, ep_item in numbered_ep_items:
         if ep_item.get("trashed", 0) != 0:
             continue
         if ep_item.get("archived", 0) != 0:
             continue
 
-        op_item = await map_item(ep_item, folders_mapping, op_vault_id)
-        op_items.append(op_item)
+        try:
+            vault_id = (
+                route(ep_item, folder_vault_ids, op_vault_id)
+                if folder_vault_ids
+                else op_vault_id
+            )
+            op_item = map_item(ep_item, folders_mapping, vault_id)
+        except MappingError as e:
+            errors.append(
+                MappingFailure(
+                    number, ep_item.get("uuid"), ep_item.get("title"), str(e)
+                )
+            )
+            continue
+
+        priority = rank(priorities, ep_item, op_item) if priorities else 0
+        entries.append(
+            Entry(
+                number,
+                ep_item.get("uuid"),
+                op_item,
+                priority,
+                map_attachments(ep_item),
+            )
+        )
+
+    return entries, errors
+
 
-    return op_items
+class MappingError(Exception):
+    """An Enpass item that cannot be mapped to a 1Password item."""
 
 
-async def get_op_client(op_sa_name, op_sa_token):
+class MappingFailure(NamedTuple):
+    number: int
+    ep_uuid: str
+    title: str
+    message: str
+
+    def __str__(self):
+        return self.message
+
+
+async def get_op_client(op_sa_name, op_sa_token, client_factory=Client.authenticate):
     try:
-        client = await Client.authenticate(
+        client = await client_factory(
             auth=op_sa_token,
             integration_name=op_sa_name,
             integration_version=f"v{__version__}",
@@ -165,119 +936,417 @@ async def upload_to_onepassword(
     op_client_validity_s,
     silent,
     skip,
-    ep_items,
-    op_items,
+    ep_total,
+    entries,
+    concurrency=1,
+    journal=None,
+    rate_limit_state=None,
+    max_retries=0,
+    client_factory=Client.authenticate,
+    limiter=None,
+    clients=None,
+    additional_op_sa_tokens=(),
+    vault_ids=None,
+    metrics=None,
+    priorities=(),
+    dead_letters=None,
+    announce=True,
 ):
-    hourly_rate = Rate(op_rate_limit_h, Duration.HOUR)
-    daily_rate = Rate(op_rate_limit_d, Duration.DAY)
-    bucket = InMemoryBucket([hourly_rate, daily_rate])
-    limiter = Limiter(bucket, max_delay=3_900_000)  # 1h 5min
+    """
+    Creates the entries in 1Password.
+
+    Unless `announce` is False, because several jobs do it together,
+    it first reports what it is going to create and asks for a confirmation.
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    if limiter is None:
+        limiter = WriteLimiter(
+            op_rate_limit_h, op_rate_limit_d, op_sa_token, rate_limit_state
+        )
+    limiters = [limiter]
+    for additional_op_sa_token in additional_op_sa_tokens:
+        limiters.append(limiter.shard(additional_op_sa_token))
 
-    ep_total = len(ep_items)
-    op_total = len(op_items)
+    streaming = hasattr(entries, "__aiter__")
+    op_total = None if streaming else len(entries)
 
-    if not silent:
-        entries = " remaining" if skip > 0 else ""
+    if not silent and announce and streaming:
         click.echo(
-            f"{click.style(ep_total, fg='green')}{entries} Enpass entries have been analyzed."
-        )
-        login_total = len(
-            [item for item in op_items if item.category == ItemCategory.LOGIN]
-        )
-        pw_total = len(
-            [item for item in op_items if item.category == ItemCategory.PASSWORD]
+            "The Enpass entries are converted and created while the export is read."
         )
+    elif not silent and announce:
+        report_plan(skip, ep_total, entries, limiters, priorities)
+
+    if announce and not no_confirm:
+        confirm()
+
+    created = Counter()
+    failed = 0
+    coroutines = []
+    started = time.monotonic()
+
+    def eta_s(remaining):
+        """The rate limits or else the pace so far, whichever is slower, tell how long the rest takes."""
+        elapsed_s = time.monotonic() - started
+        pace_s = remaining * elapsed_s / created.total() if created else 0.0
+        return max(estimate_s(limiters, remaining), pace_s)
+
+    if streaming:
+        # The entries are read, mapped and created at the same time,
+        # and the bounded queues keep the reading from running ahead of the uploads.
+        # Every vault has a queue of its own.
+        lane_queues = {
+            vault_id: asyncio.Queue(STREAM_QUEUE_SIZE)
+            for vault_id in vault_ids or [None]
+        }
+        default_queue = next(iter(lane_queues.values()))
+        queued = 0
+
+        async def feed():
+            nonlocal queued
+            async for entry in entries:
+                lane_queue = lane_queues.get(entry.op_item.vault_id, default_queue)
+                await lane_queue.put((queued, entry))
+                queued += 1
+            for lane_queue in lane_queues.values():
+                await lane_queue.put(None)
+
+        def progress(i):
+            return f"{i} of {queued} read so far"
+
+        coroutines.append(feed())
+        lane_takes = [queue_taker(lane_queue) for lane_queue in lane_queues.values()]
+    else:
+        # The workers of a lane draw from the same iterator, so entries are started in export order.
+        # Every vault is a lane, unless the priorities order the entries across all vaults.
+        lanes = {}
+        for pending in enumerate(entries):
+            lane = None if priorities else pending[1].op_item.vault_id
+            lanes.setdefault(lane, []).append(pending)
+
+        def progress(i):
+            remaining_s = format_duration(eta_s(op_total - i))
+            return f"{i} of {op_total}, about {remaining_s} to go"
+
+        lane_takes = [iterator_taker(iter(lane)) for lane in lanes.values()]
+
+    async def worker(clients, limiter, take, hourly_reserved):
+        nonlocal failed
+        while (pending := await take()) is not None:
+            i, entry = pending
+            if not silent and i % 10 == 0:
+                if i > 0:
+                    click.echo()
+                click.echo(f"Creating entry {entry.number} ({progress(i)}) ", nl=False)
+
+            reserved = hourly_reserved
+            client = None
+
+            async def create():
+                nonlocal reserved, client
+                for _ in range(entry.writes()):
+                    with metrics.limiter_wait.time():
+                        await limiter.acquire(reserved)
+                    reserved = False
+                client = await clients.current()
+                if entry.op_id:
+                    with metrics.create_latency.time():
+                        return await update_item(client, entry)
+
+                op_item = await asyncio.to_thread(entry.with_files)
+                with metrics.create_latency.time():
+                    return await client.items.create(op_item)
+
+            async def on_retry(e, kind, delay):
+                metrics.retries[kind] += 1
+                if kind == THROTTLED:
+                    limiter.slow_down(delay)
+                elif kind == EXPIRED:
+                    await clients.renew(client)
+                if not silent:
+                    reason = {
+                        THROTTLED: "1Password asked to slow down",
+                        EXPIRED: "its session expired",
+                    }.get(kind, "it failed temporarily")
+                    click.echo()
+                    click.echo(
+                        f"Retrying entry {entry.number} in {delay:.0f}s, because {reason}: {e}",
+                        err=True,
+                    )
+
+            try:
+                op_item = await with_retries(create, max_retries, on_retry)
+                if journal:
+                    journal.record(entry.ep_uuid, op_item)
+                if dead_letters:
+                    dead_letters.resolve(entry.ep_uuid)
+                created[entry.op_item.category] += 1
+                metrics.items_created += 1
+                for attachment in entry.attachments:
+                    attachment.discard()
+                if not silent:
+                    click.echo(".", nl=False)
+            except click.Abort:
+                raise
+            except (BucketFullException, LimiterDelayException):
+                click.echo()
+                click.echo(
+                    "The daily rate limit of 1Password has been used up. "
+                    "Use '--resume' to continue the import tomorrow.",
+                    err=True,
+                )
+                raise click.Abort()
+            except Exception as e:
+                metrics.items_failed += 1
+                failed += 1
+                click.echo(f"Error creating entry {entry.number}: {e}", err=True)
+                if dead_letters is None or not is_item_failure(e):
+                    raise click.Abort()
+                dead_letters.put(
+                    entry.number, entry.ep_uuid, entry.op_item.title, "upload", str(e)
+                )
+
+    async with AsyncExitStack() as stack:
+        stack.enter_context(metrics.phase("upload"))
+        if clients is None:
+            clients = await enter_clients(
+                stack,
+                op_sa_name,
+                [op_sa_token, *additional_op_sa_tokens],
+                op_client_validity_s,
+                client_factory,
+                metrics.create_latency,
+            )
+
+        def lane_workers(take):
+            if len(limiters) == 1:
+                return [
+                    worker(clients[0], limiter, take, False) for _ in range(concurrency)
+                ]
+
+            shard_queues = [asyncio.Queue(concurrency) for _ in limiters]
+
+            def reserve():
+                # prefer the service account with the least work queued
+                shards = sorted(
+                    zip(limiters, shard_queues), key=lambda shard: shard[1].qsize()
+                )
+                for shard_limiter, shard_queue in shards:
+                    if shard_limiter.try_reserve():
+                        return shard_queue
+
+            async def dispatch():
+                # Every entry goes to a service account that has room left in its hourly rate,
+                # instead of waiting for one that has run out while the others could create it.
+                while (pending := await take()) is not None:
+                    while (shard_queue := reserve()) is None:
+                        # none has room, so wait for the first whose window frees up
+                        await asyncio.sleep(
+                            min(limiter.reserve_in_s() for limiter in limiters)
+                        )
+                    await shard_queue.put(pending)
+                for shard_queue in shard_queues:
+                    await shard_queue.put(None)
+
+            coroutines.append(dispatch())
+            return [
+                worker(shard_clients, shard_limiter, queue_taker(shard_queue), True)
+                for shard_clients, shard_limiter, shard_queue in zip(
+                    clients, limiters, shard_queues
+                )
+                for _ in range(concurrency)
+            ]
+
+        # every vault is a lane of its own, and all of them share the limiters
+        workers = [
+            lane_worker for take in lane_takes for lane_worker in lane_workers(take)
+        ]
+        await run_workers(workers + coroutines)
+
+    if not silent and streaming:
+        click.echo()
         click.echo(
-            f"{click.style(op_total, fg='green')}{entries} 1Password entries will be created."
+            f"{click.style('Done.', fg='green')} Migrated {created.total()} entries, "
+            f"{click.style(created[ItemCategory.LOGIN], fg='cyan')} of them as Logins "
+            f"and {click.style(created[ItemCategory.PASSWORD], fg='cyan')} as Passwords."
         )
+    elif not silent:
+        click.echo()
+        skipped = f" Skipped {skip} entries." if skip > 0 else ""
+        set_aside = f" Set {failed} entries aside." if failed > 0 else ""
         click.echo(
-            f"""
+            f"{click.style('Done.', fg='green')} Migrated {op_total - failed} entries.{skipped}{set_aside}"
+        )
+
+
+async def update_item(client, entry):
+    """Replaces the content of the 1Password item of a changed Enpass item. Its category and files stay as they are."""
+    params = entry.op_item
+    op_item = await client.items.get(params.vault_id, entry.op_id)
+
+    sections = list(params.sections or [])
+    if op_item.files and ATTACHMENTS_SECTION_ID not in {s.id for s in sections}:
+        sections.append(ItemSection(id=ATTACHMENTS_SECTION_ID, title="Attachments"))
+
+    return await client.items.put(
+        op_item.model_copy(
+            update={
+                "title": params.title,
+                "fields": params.fields or [],
+                "sections": sections,
+                "notes": params.notes or "",
+                "tags": params.tags or [],
+                "websites": params.websites or [],
+            }
+        )
+    )
+
+
+def report_plan(skip, ep_total, entries, limiters, priorities):
+    """Tells how many entries are going to be created, as what, and how long that takes."""
+    remaining = " remaining" if skip > 0 else ""
+    click.echo(
+        f"{click.style(ep_total, fg='green')}{remaining} Enpass entries have been analyzed."
+    )
+    login_total = len([e for e in entries if e.op_item.category == ItemCategory.LOGIN])
+    pw_total = len([e for e in entries if e.op_item.category == ItemCategory.PASSWORD])
+    click.echo(
+        f"{click.style(len(entries), fg='green')}{remaining} 1Password entries will be created."
+    )
+    click.echo(
+        f"""
 Of these, {click.style(login_total, fg='cyan')} entries are created as Logins
 and {click.style(pw_total, fg='cyan')} entries are created as Passwords.
-For the remaining {click.style(op_total - login_total - pw_total, fg='cyan')} entries, the category is inferred.
+For the remaining {click.style(len(entries) - login_total - pw_total, fg='cyan')} entries, the category is inferred.
 """
+    )
+    report_schedule(limiters, entries, priorities)
+
+
+def report_schedule(limiters, entries, priorities):
+    """Tells how long the rate limits take to let all entries, and the entries of every priority, through."""
+
+    def done(writes):
+        seconds = estimate_s(limiters, writes)
+        if seconds < 1:
+            return "done without waiting for the rate limits"
+        return f"done in about {click.style(format_duration(seconds), fg='cyan')}"
+
+    attachments = sum(len(entry.attachments) for entry in entries)
+    if attachments:
+        click.echo(
+            f"The entries have {click.style(attachments, fg='cyan')} attachments, "
+            "and every one of them counts as a write request of its own."
         )
 
-    if not no_confirm:
-        click.echo("Type 'y' to continue: ", nl=False)
-        c = click.getchar()
-        click.echo()
-        if c != "y":
-            raise click.Abort()
+    if priorities:
+        per_priority = Counter()
+        writes_per_priority = Counter()
+        for entry in entries:
+            per_priority[entry.priority] += 1
+            writes_per_priority[entry.priority] += entry.writes()
+        writes = 0
+        for level, priority in enumerate(priorities):
+            writes += writes_per_priority[level]
+            click.echo(
+                f"The {click.style(per_priority[level], fg='cyan')} entries with the priority '{priority}' "
+                f"are {done(writes)}."
+            )
 
-    (client, client_created) = await get_op_client(op_sa_name, op_sa_token)
-    for i, op_item in enumerate(op_items):
-        try:
-            # noinspection PyAsyncCall
-            limiter.try_acquire("onepassword-write")
+    click.echo(f"All entries are {done(sum(entry.writes() for entry in entries))}.")
+    click.echo()
 
-            client_age_seconds = time.time() - client_created
-            if client_age_seconds > op_client_validity_s:
-                (client, client_created) = await get_op_client(op_sa_name, op_sa_token)
 
-            if not silent and i % 10 == 0:
-                if i > 0:
-                    click.echo()
-                click.echo(f"Creating entry {skip + i} ({i} of {op_total}) ", nl=False)
+def iterator_taker(iterator):
+    async def take():
+        return next(iterator, None)
 
-            await client.items.create(op_item)
-            click.echo(".", nl=False)
-        except Exception as e:
-            click.echo(f"Error creating entry {skip + i}: {e}", err=True)
-            raise click.Abort()
+    return take
 
-    if not silent:
-        click.echo()
-        skipped = f" Skipped {skip} entries." if skip > 0 else ""
-        click.echo(
-            f"{click.style('Done.', fg='green')} Migrated {op_total} entries.{skipped}"
-        )
 
+def queue_taker(queue):
+    """Takes the entries from the queue, until the end of the queue, which is None, is reached."""
 
-def map_sections(item):
-    default_sections = [ItemSection(id="", title="")]
-    fields = item.get("fields", None)
-    if not fields:
-        return default_sections
+    async def take():
+        pending = await queue.get()
+        if pending is None:
+            # leave the end for the other workers, too
+            queue.put_nowait(None)
+        return pending
 
-    return default_sections + [
-        ItemSection(id=str(field["uid"]), title=field["label"])
-        for field in fields
-        if field["type"] == "section"
-    ]
+    return take
+
+
+async def run_workers(coroutines):
+    workers = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
 
 
-async def map_item(ep_item, folders_mapping, op_vault_id):
+def map_item(ep_item, folders_mapping, op_vault_id):
     category = map_category(ep_item)
+    ep_fields = ep_item.get("fields", None) or ()
+
+    with_websites = category == ItemCategory.PASSWORD or category == ItemCategory.LOGIN
     autofill_behavior = (
         AutofillBehavior.ANYWHEREONWEBSITE
         if ep_item["auto_submit"] != 0
         else AutofillBehavior.NEVER
     )
 
-    if category == ItemCategory.PASSWORD or category == ItemCategory.LOGIN:
-        websites = [
-            Website(
-                url=field["value"],
-                label=field["label"],
-                autofill_behavior=autofill_behavior,
-            )
-            for field in ep_item["fields"]
-            if field["type"] == "url"
-        ] + [
-            Website(
-                url=field["value"],
-                label=field["label"],
-                autofill_behavior=AutofillBehavior.ANYWHEREONWEBSITE,
-            )
-            for field in ep_item["fields"]
-            if field["type"] == ".Android#"
-        ]
-    else:
-        websites = None
+    # A single scan over the Enpass fields collects the sections and websites,
+    # and the fields that can become 1Password fields.
+    sections = [ItemSection(id="", title="")]
+    url_websites = []
+    android_websites = []
+    has_username = False
+    has_password = False
+    candidates = []
+    for field in ep_fields:
+        role = field_roles.get(field["type"], ROLE_OTHER)
+        value = field["value"]
+
+        if role == ROLE_SECTION:
+            sections.append(ItemSection(id=str(field["uid"]), title=field["label"]))
+        elif role == ROLE_URL:
+            if with_websites:
+                url_websites.append(
+                    Website(
+                        url=value,
+                        label=field["label"],
+                        autofill_behavior=autofill_behavior,
+                    )
+                )
+        elif role == ROLE_ANDROID:
+            if with_websites:
+                android_websites.append(
+                    Website(
+                        url=value,
+                        label=field["label"],
+                        autofill_behavior=AutofillBehavior.ANYWHEREONWEBSITE,
+                    )
+                )
+            continue
+        elif role == ROLE_USERNAME:
+            has_username = has_username or value != ""
+        elif role == ROLE_PASSWORD:
+            has_password = has_password or value != ""
 
-    sections = map_sections(ep_item)
-    fields, category = map_fields(ep_item, category)
+        if field["deleted"] == 0 and value != "":
+            candidates.append((role, field))
+
+    fields, category = map_fields(
+        ep_item, category, candidates, has_username, has_password
+    )
+
+    if ep_item.get("attachments"):
+        sections.append(ItemSection(id=ATTACHMENTS_SECTION_ID, title="Attachments"))
 
     op_item = ItemCreateParams(
         title=ep_item["title"],
@@ -289,7 +1358,7 @@ async def map_item(ep_item, folders_mapping, op_vault_id):
         ),
         category=category,
         sections=sections,
-        websites=websites,
+        websites=url_websites + android_websites if with_websites else None,
         fields=fields,
         notes=ep_item.get("note", None),
     )
@@ -297,66 +1366,42 @@ async def map_item(ep_item, folders_mapping, op_vault_id):
     return op_item
 
 
-def map_fields(item, category):
-    fields = item.get("fields", None)
-    if not fields:
-        return [], category
-
-    has_username = any(
-        field["type"] == "username" and field["value"] != "" for field in fields
-    )
-    has_password = any(
-        field["type"] == "password" and field["value"] != "" for field in fields
-    )
-
+def map_fields(item, category, candidates, has_username, has_password):
+    """Maps the fields that are neither deleted nor empty, in the order in which Enpass shows them."""
     main_username_field_added = False
     main_password_field_added = False
 
     current_section_uid = ""
 
     result = []
-    for field in sorted(fields, key=lambda f: f["order"]):
-        if field["deleted"] != 0:
-            continue
-        elif field["value"] == "":
-            continue
-        elif field["type"] == "section":
+    for role, field in sorted(candidates, key=lambda candidate: candidate[1]["order"]):
+        if role == ROLE_SECTION:
             current_section_uid = str(field["uid"])
             continue
-        elif field["type"] == ".Android#":
-            continue
 
         field_id = str(field["uid"])
         section_id = current_section_uid
         title = field["label"].lower()
 
-        if not main_password_field_added and field["type"] == "password":
+        if not main_password_field_added and role == ROLE_PASSWORD:
             # set this password as main password
             section_id = None
             field_id = "password"
             title = "password"
             main_password_field_added = True
-        elif (
-            not has_password
-            and not main_password_field_added
-            and field["type"] == "pin"
-        ):
+        elif not has_password and not main_password_field_added and role == ROLE_PIN:
             # use this pin as main password
             section_id = None
             field_id = "password"
             title = "password"
             main_password_field_added = True
-        elif not main_username_field_added and field["type"] == "username":
+        elif not main_username_field_added and role == ROLE_USERNAME:
             # use pin as password
             section_id = None
             field_id = "username"
             title = "username"
             main_username_field_added = True
-        elif (
-            not has_username
-            and not main_username_field_added
-            and field["type"] == "email"
-        ):
+        elif not has_username and not main_username_field_added and role == ROLE_EMAIL:
             # use email as username
             section_id = None
             field_id = "username"
@@ -372,7 +1417,8 @@ def map_fields(item, category):
                 field_type=(
                     ItemFieldType.CONCEALED
                     if sensitive
-                    else map_field_type(item, field)
+                    else field_type_map.get(field["type"])
+                    or map_field_type(item, field)
                 ),
                 value=field["value"],
                 section_id=section_id,
@@ -381,11 +1427,7 @@ def map_fields(item, category):
 
     if main_username_field_added and category != ItemCategory.LOGIN:
         category = ItemCategory.LOGIN
-    elif (
-        not main_username_field_added
-        and main_password_field_added
-        and ItemCategory != ItemCategory.PASSWORD
-    ):
+    elif not main_username_field_added and main_password_field_added:
         category = ItemCategory.PASSWORD
 
     return result, category
@@ -417,17 +1459,40 @@ field_type_map = {
 }
 
 
+ROLE_OTHER = 0
+ROLE_SECTION = 1
+ROLE_URL = 2
+ROLE_ANDROID = 3
+ROLE_USERNAME = 4
+ROLE_PASSWORD = 5
+ROLE_PIN = 6
+ROLE_EMAIL = 7
+
+# the Enpass field types that map_item treats specially
+field_roles = {
+    field_type: role
+    for field_type, role in {
+        "section": ROLE_SECTION,
+        "url": ROLE_URL,
+        ".Android#": ROLE_ANDROID,
+        "username": ROLE_USERNAME,
+        "password": ROLE_PASSWORD,
+        "pin": ROLE_PIN,
+        "email": ROLE_EMAIL,
+    }.items()
+    if field_type in field_type_map
+}
+
+
 def map_field_type(item, field):
     c = field_type_map.get(field["type"], None)
     if c:
         return c
 
-    click.echo(
+    raise MappingError(
         f"Unexpected field type '{field['type']}' on field '{field['label']}' ({field['uid']}) "
-        + f"on item '{item['title']}' ({item['uuid']})",
-        err=True,
+        + f"on item '{item['title']}' ({item['uuid']})"
     )
-    raise click.Abort()
 
 
 category_map = {
@@ -450,8 +1515,6 @@ def map_category(item):
     if c:
         return c
 
-    click.echo(
-        f"Unexpected category '{item['category']}' on item '{item['title']}' ({item['uuid']})",
-        err=True,
+    raise MappingError(
+        f"Unexpected category '{item['category']}' on item '{item['title']}' ({item['uuid']})"
     )
-    raise click.Abort()
@@ -0,0 +1,375 @@
+import base64
+import json
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+
+import click
+from onepassword import ItemCategory, ItemFieldType
+
+from enpass2onepassword.attachments import AttachmentSpool
+from enpass2onepassword.metrics import Metrics
+from enpass2onepassword.migration import (
+    ATTACHMENTS_SECTION_ID,
+    map_chunks,
+    report_mapping_errors,
+    wanted_ep_items,
+)
+from enpass2onepassword.routing import route_folders
+from enpass2onepassword.streaming import load_enpass_stream
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+async def export_1pux(
+    ep_file,
+    onepux_path,
+    op_vault,
+    silent,
+    skip=0,
+    map_workers=1,
+    vault_map=None,
+    metrics=None,
+):
+    """
+    Writes the Enpass items into a 1Password Unencrypted Export (1PUX) instead of creating them through the API.
+
+    The items are mapped like for the API, and written one by one, so that there is no rate limit
+    and the memory usage does not depend on the size of the export.
+    The 1Password apps import the file in one go.
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    with tempfile.TemporaryDirectory(prefix="enpass2onepassword-") as directory:
+        spool = AttachmentSpool(directory)
+        with metrics.phase("load"):
+            ep_folders, ep_items = await load_enpass_stream(ep_file, spool=spool)
+
+        # offline, the vaults are known by their names only
+        vault_names = list(dict.fromkeys([op_vault, *(vault_map or {}).values()]))
+        folder_vaults = (
+            route_folders(ep_folders, vault_map, {name: name for name in vault_names})
+            if vault_map
+            else {}
+        )
+
+        with metrics.phase("write"), OnePuxWriter(onepux_path, directory) as writer:
+            for vault_name in vault_names:
+                writer.vault(vault_name)
+
+            async for entries, errors in map_chunks(
+                ep_folders,
+                wanted_ep_items(ep_items, lambda number, ep_uuid: number >= skip),
+                op_vault,
+                map_workers,
+                folder_vault_ids=folder_vaults,
+            ):
+                if errors:
+                    report_mapping_errors(errors)
+
+                for entry in entries:
+                    writer.add(entry)
+                    for attachment in entry.attachments:
+                        attachment.discard()
+                    metrics.items_created += 1
+                    if not silent and metrics.items_created % 100 == 0:
+                        click.echo(".", nl=False)
+
+    if not silent:
+        click.echo()
+        skipped = f" Skipped {skip} entries." if skip > 0 else ""
+        click.echo(
+            f"{click.style('Done.', fg='green')} Wrote {metrics.items_created} entries "
+            f"to '{click.style(onepux_path, fg='green')}'.{skipped}"
+        )
+        click.echo(
+            "Import it in the 1Password desktop app with File › Import › 1Password, "
+            "and delete it afterwards, because it contains all secrets unencrypted."
+        )
+
+
+def new_uuid():
+    """Returns a random id in the format of 1Password, 26 lowercase letters and digits."""
+    return base64.b32encode(uuid.uuid4().bytes).decode().rstrip("=").lower()
+
+
+class OnePuxWriter:
+    """
+    Writes a 1PUX file, which is a zip archive with the items in 'export.data' and the attachments in 'files/'.
+
+    A zip archive can only be written one member at a time.
+    So the items of every vault are collected in a file next to the attachments,
+    while the attachments are added to the archive right away,
+    and 'export.data' is put together from those files at the end.
+    The archive only gets its name once it is complete.
+    """
+
+    def __init__(self, onepux_path, directory):
+        self.onepux_path = onepux_path
+        self.temporary_path = f"{onepux_path}.tmp"
+        self.directory = directory
+        self.archive = zipfile.ZipFile(self.temporary_path, "w", zipfile.ZIP_DEFLATED)
+        self.vaults = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is not None:
+                self.archive.close()
+                os.remove(self.temporary_path)
+            else:
+                self.close()
+        finally:
+            # an open file cannot be deleted on Windows, together with its temporary directory
+            for vault_file, _ in self.vaults.values():
+                vault_file.close()
+
+    def vault(self, vault_name):
+        if vault_name not in self.vaults:
+            path = os.path.join(self.directory, f"vault-{len(self.vaults)}.json")
+            self.vaults[vault_name] = [open(path, "w+", encoding="utf-8"), 0]
+        return self.vaults[vault_name]
+
+    def add(self, entry):
+        files = [
+            self.add_file(attachment, number)
+            for number, attachment in enumerate(entry.attachments, start=1)
+        ]
+
+        vault = self.vault(entry.op_item.vault_id)
+        if vault[1] > 0:
+            vault[0].write(",\n")
+        json.dump(onepux_item(entry.op_item, files), vault[0])
+        vault[1] += 1
+
+    def add_file(self, attachment, number):
+        document_id = new_uuid()
+        file_name = attachment.name.replace("/", "_")
+        size = 0
+        with self.archive.open(
+            f"files/{document_id}__{file_name}", "w", force_zip64=True
+        ) as member:
+            if attachment.path is None:
+                content = attachment.read()
+                member.write(content)
+                size = len(content)
+            else:
+                with open(attachment.path, "rb") as attachment_file:
+                    while data := attachment_file.read(COPY_BUFFER_SIZE):
+                        member.write(data)
+                        size += len(data)
+
+        return {
+            "fieldId": f"attachment{number}",
+            "fileName": attachment.name,
+            "documentId": document_id,
+            "decryptedSize": size,
+        }
+
+    def close(self):
+        now = int(time.time())
+        self.archive.writestr(
+            "export.attributes",
+            json.dumps(
+                {
+                    "version": 3,
+                    "description": "1Password Unencrypted Export",
+                    "createdAt": now,
+                }
+            ),
+        )
+
+        account = {
+            "accountName": "Enpass",
+            "name": "Enpass",
+            "avatar": "",
+            "email": "",
+            "uuid": new_uuid(),
+            "domain": "",
+        }
+        with self.archive.open("export.data", "w", force_zip64=True) as member:
+            member.write(
+                f'{{"accounts":[{{"attrs":{json.dumps(account)},"vaults":['.encode()
+            )
+            for number, (vault_name, (vault_file, _)) in enumerate(self.vaults.items()):
+                attrs = {
+                    "uuid": new_uuid(),
+                    "desc": "Imported from Enpass",
+                    "avatar": "",
+                    "name": vault_name,
+                    "type": "U",
+                }
+                separator = "," if number > 0 else ""
+                member.write(
+                    f'{separator}{{"attrs":{json.dumps(attrs)},"items":['.encode()
+                )
+                vault_file.seek(0)
+                while text := vault_file.read(COPY_BUFFER_SIZE):
+                    member.write(text.encode())
+                member.write(b"]}")
+            member.write(b"]}]}")
+
+        self.archive.close()
+        os.replace(self.temporary_path, self.onepux_path)
+
+
+category_uuids = {
+    ItemCategory.LOGIN: "001",
+    ItemCategory.CREDITCARD: "002",
+    ItemCategory.SECURENOTE: "003",
+    ItemCategory.IDENTITY: "004",
+    ItemCategory.PASSWORD: "005",
+    ItemCategory.DOCUMENT: "006",
+    ItemCategory.SOFTWARELICENSE: "100",
+    ItemCategory.BANKACCOUNT: "101",
+    ItemCategory.DATABASE: "102",
+    ItemCategory.DRIVERLICENSE: "103",
+    ItemCategory.OUTDOORLICENSE: "104",
+    ItemCategory.MEMBERSHIP: "105",
+    ItemCategory.PASSPORT: "106",
+    ItemCategory.REWARDS: "107",
+    ItemCategory.SOCIALSECURITYNUMBER: "108",
+    ItemCategory.ROUTER: "109",
+    ItemCategory.SERVER: "110",
+    ItemCategory.EMAIL: "111",
+    ItemCategory.APICREDENTIALS: "112",
+    ItemCategory.MEDICALRECORD: "113",
+    ItemCategory.SSHKEY: "114",
+    ItemCategory.CRYPTOWALLET: "115",
+}
+
+
+def onepux_value(field):
+    if field.field_type == ItemFieldType.CONCEALED:
+        return {"concealed": field.value}
+    if field.field_type == ItemFieldType.EMAIL:
+        return {"email": {"email_address": field.value, "provider": None}}
+    if field.field_type == ItemFieldType.URL:
+        return {"url": field.value}
+    if field.field_type == ItemFieldType.PHONE:
+        return {"phone": field.value}
+    if field.field_type == ItemFieldType.TOTP:
+        return {"totp": field.value}
+    if field.field_type == ItemFieldType.CREDITCARDNUMBER:
+        return {"creditCardNumber": field.value}
+    if field.field_type == ItemFieldType.CREDITCARDTYPE:
+        return {"creditCardType": field.value}
+    return {"string": field.value}
+
+
+def onepux_field(field_id, title, value, index, multiline=False):
+    return {
+        "title": title,
+        "id": field_id,
+        "value": value,
+        "indexAtSource": index,
+        "guarded": False,
+        "multiline": multiline,
+        "dontGenerate": False,
+        "inputTraits": {
+            "keyboard": "default",
+            "correction": "default",
+            "capitalization": "default",
+        },
+    }
+
+
+def onepux_item(op_item, files=()):
+    """Converts the parameters with which an item would be created through the API to an item of a 1PUX file."""
+    sections = {
+        section.id: {"title": section.title, "name": section.id, "fields": []}
+        for section in op_item.sections or []
+    }
+    login_fields = []
+    details = {
+        "loginFields": login_fields,
+        "notesPlain": op_item.notes or "",
+        "sections": [],
+        "passwordHistory": [],
+    }
+    subtitle = ""
+
+    for index, field in enumerate(op_item.fields or []):
+        if field.section_id is None and field.id in ("username", "password"):
+            if field.id == "username":
+                subtitle = field.value
+            if op_item.category == ItemCategory.PASSWORD and field.id == "password":
+                details["password"] = field.value
+                continue
+            login_fields.append(
+                {
+                    "value": field.value,
+                    "id": "",
+                    "name": field.id,
+                    "fieldType": "P" if field.id == "password" else "T",
+                    "designation": field.id,
+                }
+            )
+            continue
+
+        section = sections.setdefault(
+            field.section_id or "",
+            {"title": "", "name": field.section_id or "", "fields": []},
+        )
+        section["fields"].append(
+            onepux_field(
+                field.id,
+                field.title,
+                onepux_value(field),
+                index,
+                multiline="\n" in field.value,
+            )
+        )
+
+    for file in files:
+        section = sections.setdefault(
+            ATTACHMENTS_SECTION_ID,
+            {"title": "Attachments", "name": ATTACHMENTS_SECTION_ID, "fields": []},
+        )
+        section["fields"].append(
+            onepux_field(
+                file["fieldId"],
+                file["fileName"],
+                {
+                    "file": {
+                        "fileName": file["fileName"],
+                        "documentId": file["documentId"],
+                        "decryptedSize": file["decryptedSize"],
+                    }
+                },
+                len(section["fields"]),
+            )
+        )
+
+    details["sections"] = [
+        section for section in sections.values() if section["fields"]
+    ]
+
+    websites = op_item.websites or []
+    now = int(time.time())
+    return {
+        "uuid": new_uuid(),
+        "favIndex": 0,
+        "createdAt": now,
+        "updatedAt": now,
+        "state": "active",
+        "categoryUuid": category_uuids.get(op_item.category, "003"),
+        "details": details,
+        "overview": {
+            "subtitle": subtitle,
+            "title": op_item.title,
+            "url": websites[0].url if websites else "",
+            "urls": [
+                {"label": website.label, "url": website.url} for website in websites
+            ],
+            "tags": op_item.tags or [],
+            "ps": 0,
+            "pbe": 0.0,
+            "pgrng": False,
+        },
+    }
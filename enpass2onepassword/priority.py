@@ -0,0 +1,64 @@
+from typing import NamedTuple, Optional
+
+import click
+
+FAVORITE = "favorite"
+CATEGORY = "category"
+FOLDER = "folder"
+
+# the 1Password categories that the Enpass items are mapped to
+CATEGORIES = (
+    "BANKACCOUNT",
+    "CREDITCARD",
+    "IDENTITY",
+    "LOGIN",
+    "PASSPORT",
+    "PASSWORD",
+    "ROUTER",
+    "SECURENOTE",
+    "SOFTWARELICENSE",
+)
+
+
+class Priority(NamedTuple):
+    """A kind of Enpass item that is created before the others, such as ('category', 'LOGIN')."""
+
+    kind: str
+    value: Optional[str] = None
+
+    def __str__(self):
+        return self.kind if self.value is None else f"{self.kind}:{self.value}"
+
+
+def parse_priority(spec):
+    """Parses 'favorite', 'category:<1Password category>' or 'folder:<Enpass folder name or UUID>'."""
+    kind, _, value = spec.partition(":")
+    kind = kind.strip().lower()
+    value = value.strip()
+
+    if kind == FAVORITE and not value:
+        return Priority(FAVORITE)
+    if kind == CATEGORY and value.upper() in CATEGORIES:
+        return Priority(CATEGORY, value.upper())
+    if kind == FOLDER and value:
+        return Priority(FOLDER, value)
+
+    raise click.BadParameter(
+        f"'{spec}' is neither 'favorite', 'category:<{'|'.join(CATEGORIES)}>' nor 'folder:<name>'"
+    )
+
+
+def rank(priorities, ep_item, op_item):
+    """Returns the position of the first priority that the item matches, or else the number of priorities."""
+    for position, priority in enumerate(priorities):
+        if priority.kind == FAVORITE and ep_item.get("favorite", 0) != 0:
+            return position
+        if priority.kind == CATEGORY and op_item.category.name == priority.value:
+            return position
+        if priority.kind == FOLDER and (
+            priority.value in ep_item.get("folders", ())
+            or priority.value in (op_item.tags or ())
+        ):
+            return position
+
+    return len(priorities)
@@ -0,0 +1,244 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from math import ceil
+from typing import NamedTuple
+
+import click
+from pyrate_limiter import (
+    Duration,
+    InMemoryBucket,
+    Limiter,
+    LimiterDelayException,
+    Rate,
+    SQLiteBucket,
+)
+
+MAX_DELAY_MS = 3_900_000  # 1h 5min
+WRITE = "onepassword-write"
+
+
+def default_state_path():
+    return os.path.join(click.get_app_dir("enpass2onepassword"), "rate-limits.sqlite")
+
+
+def token_claims(op_sa_token):
+    """Decodes the (unsigned) details that 1Password puts into a service account token."""
+    payload = op_sa_token.removeprefix("ops_")
+    try:
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        )
+    except ValueError:
+        return {}
+
+    return claims if isinstance(claims, dict) else {}
+
+
+def state_keys(op_sa_token):
+    """
+    Returns the keys under which the rate limits of the service account and of its account are stored.
+
+    The keys are derived from the service account's e-mail address and the account's sign-in address,
+    so that a new token for the same service account continues with the same rate limits.
+    When the token cannot be decoded, the token itself is used instead.
+    """
+    claims = token_claims(op_sa_token)
+    service_account = claims.get("email") or op_sa_token
+    account = claims.get("signInAddress") or service_account
+
+    def key(value):
+        return hashlib.sha256(value.encode()).hexdigest()[:16]
+
+    return key(service_account), key(account)
+
+
+def create_bucket(rates, state_path, table):
+    if not state_path:
+        return InMemoryBucket(rates)
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        return SQLiteBucket.init_from_file(rates, table=table, db_path=state_path)
+    except Exception as e:
+        click.echo(
+            f"Unable to open the rate limit state '{state_path}': {click.style(e, fg='red')}",
+            err=True,
+        )
+        raise click.Abort()
+
+
+class Quota(NamedTuple):
+    """A rate, the bucket that records the writes against it, and the limiter that waits for room in it."""
+
+    rate: Rate
+    bucket: object
+    limiter: Limiter
+
+
+def create_quota(rate, state_path, table, max_delay):
+    bucket = create_bucket([rate], state_path, table)
+    return Quota(rate, bucket, Limiter(bucket, max_delay=max_delay))
+
+
+class WriteLimiter:
+    """
+    Paces the writes to 1Password.
+
+    The hourly rate applies per service account and the daily rate per account.
+    With a state file, the writes are recorded on disk,
+    so that a restarted migration continues with the remaining quota instead of a full one.
+    """
+
+    def __init__(
+        self,
+        op_rate_limit_h,
+        op_rate_limit_d,
+        op_sa_token,
+        state_path=None,
+        max_delay=MAX_DELAY_MS,
+        daily=None,
+    ):
+        sa_key, account_key = state_keys(op_sa_token)
+
+        if daily is None:
+            daily = create_quota(
+                Rate(op_rate_limit_d, Duration.DAY),
+                state_path,
+                f"daily_{account_key}",
+                max_delay,
+            )
+        self.daily = daily
+        self.hourly = create_quota(
+            Rate(op_rate_limit_h, Duration.HOUR),
+            state_path,
+            f"hourly_{sa_key}",
+            max_delay,
+        )
+        # it does not wait, so that a full hourly rate is noticed right away
+        self.hourly_probe = Limiter(self.hourly.bucket, max_delay=0)
+        self.reservable_at = 0.0
+
+        self.limiters = [self.daily.limiter, self.hourly.limiter]
+        self.op_rate_limit_h = op_rate_limit_h
+        self.op_sa_token = op_sa_token
+        self.state_path = state_path
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        self.waited_s = 0.0
+        self.shards = {}
+        # the writes are granted in the order in which they were asked for,
+        # so that migrations which share the limiter take turns
+        self.turns = asyncio.Lock()
+
+    def shard(self, op_sa_token):
+        """
+        Returns a limiter for another service account of the same account.
+
+        It has an hourly rate of its own, but it shares the daily rate with this limiter.
+        Every service account has one shard, however often it is asked for.
+        """
+        if op_sa_token in self.shards:
+            return self.shards[op_sa_token]
+
+        sign_in_address = token_claims(self.op_sa_token).get("signInAddress")
+        other_sign_in_address = token_claims(op_sa_token).get("signInAddress")
+        if sign_in_address and other_sign_in_address != sign_in_address:
+            click.echo(
+                f"All 1Password Service Account tokens must belong to the account '{sign_in_address}'.",
+                err=True,
+            )
+            raise click.Abort()
+
+        shard = WriteLimiter(
+            self.op_rate_limit_h,
+            None,
+            op_sa_token,
+            self.state_path,
+            self.max_delay,
+            self.daily,
+        )
+        self.shards[op_sa_token] = shard
+        return shard
+
+    def try_reserve(self):
+        """
+        Takes room for a write in the hourly rate, but only if there is room right now.
+
+        Returns whether it did, and otherwise `reserve_in_s` tells when to try again.
+        The daily rate is acquired later, with `acquire(hourly_reserved=True)`.
+        """
+        now = time.monotonic()
+        if self.paused_until > now:
+            return False
+
+        try:
+            return self.hourly_probe.try_acquire(WRITE)
+        except LimiterDelayException as e:
+            self.reservable_at = now + e.actual_delay / 1000
+            return False
+
+    def reserve_in_s(self):
+        """Returns the seconds until the hourly rate has room again, after `try_reserve` found none."""
+        return max(0.0, max(self.paused_until, self.reservable_at) - time.monotonic())
+
+    def slow_down(self, delay_s):
+        """Holds back all writes for a while, because the 1Password server pushed back."""
+        self.paused_until = max(self.paused_until, time.monotonic() + delay_s)
+
+    async def acquire(self, hourly_reserved=False):
+        started = time.monotonic()
+        while (pause_s := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause_s)
+
+        # The limiters sleep synchronously until their bucket has room again.
+        # Waiting in a thread keeps the event loop free for the creates that are already in flight.
+        limiters = self.limiters[:1] if hourly_reserved else self.limiters
+        async with self.turns:
+            for limiter in limiters:
+                await asyncio.to_thread(limiter.try_acquire, WRITE)
+        self.waited_s += time.monotonic() - started
+
+
+def quota_s(quota, writes):
+    """
+    Returns the seconds until the last of `writes` more writes fits into the rate of the quota,
+    when every write goes out as soon as the rate allows.
+
+    Only the writes that are still within the window of the rate are taken into account,
+    and they are assumed to leave it a whole window from now, so the estimate errs on the long side.
+    """
+    # the writes that left the window are dropped first, so that they are not counted
+    quota.bucket.leak(int(time.time() * 1000))
+    overflow = quota.bucket.count() + writes - quota.rate.limit
+    if writes <= 0 or overflow <= 0:
+        return 0.0
+
+    return ceil(overflow / quota.rate.limit) * quota.rate.interval / 1000
+
+
+def estimate_s(write_limiters, writes):
+    """
+    Returns the seconds until `writes` more writes are done according to the hourly and daily rates,
+    when they are spread evenly across the service accounts of the `write_limiters`.
+    """
+    daily_s = quota_s(write_limiters[0].daily, writes)
+    share = ceil(writes / len(write_limiters))
+    hourly_s = max(quota_s(limiter.hourly, share) for limiter in write_limiters)
+    return max(daily_s, hourly_s)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
@@ -0,0 +1,150 @@
+import asyncio
+import random
+import re
+
+from onepassword.errors import RateLimitExceededException
+from pyrate_limiter import BucketFullException, LimiterDelayException
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+EXPIRED = "expired"
+PERMANENT = "permanent"
+
+BASE_DELAY_S = 2.0
+MAX_DELAY_S = 15 * 60.0
+
+# the status code of an HTTP response, like in "server responded with status 503" or "HTTP 429"
+_status_code = re.compile(r"\b(?:status(?: code)?|http)\D{0,3}([1-5]\d\d)\b", re.I)
+# Only the beginning of a message is matched, since its rest can name items or fields.
+_throttled_message = re.compile(r"(rate limit exceeded|too many requests)\b", re.I)
+_expired_message = re.compile(r"(session (has )?expired|unauthenticated)\b", re.I)
+_transient_message = re.compile(
+    r"(error sending request|operation timed out|"
+    r"connection (reset|refused|closed|aborted)|service unavailable)\b",
+    re.I,
+)
+_auth_message = re.compile(
+    r"(invalid service account token|unauthori[sz]ed|forbidden|access denied|permission denied)\b",
+    re.I,
+)
+_retry_after_message = re.compile(
+    r"retry.?after\D{0,3}(\d+(?:\.\d+)?)\s*(ms|milliseconds?|s|seconds?)?", re.I
+)
+
+
+def classify(e):
+    """
+    Tells whether a failed request was throttled, failed temporarily, failed because its session expired
+    or will fail again when it is retried.
+
+    The type of the error and the status code of the response tell first,
+    and only a few messages of the 1Password SDK are recognized otherwise.
+    """
+    if isinstance(e, (BucketFullException, LimiterDelayException)):
+        # the own rate limits of this tool ran out, and no retry gives them back
+        return PERMANENT
+    if isinstance(e, RateLimitExceededException):
+        return THROTTLED
+    if isinstance(e, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return TRANSIENT
+
+    message = str(e)
+    status = status_code(message)
+    if status is not None:
+        return classify_status(status)
+
+    if _throttled_message.match(message):
+        return THROTTLED
+    if _expired_message.match(message):
+        return EXPIRED
+    if _transient_message.match(message):
+        return TRANSIENT
+
+    return PERMANENT
+
+
+def status_code(message):
+    match = _status_code.search(message)
+    return int(match.group(1)) if match else None
+
+
+def classify_status(status):
+    if status == 429:
+        return THROTTLED
+    if status == 401:
+        return EXPIRED
+    if status == 408 or status >= 500:
+        return TRANSIENT
+    return PERMANENT
+
+
+def is_item_failure(e):
+    """
+    Tells whether a request failed because of the item itself, so that the other items can still be created.
+
+    Errors that would fail the other items, too, like a rejected service account or a used up rate limit, are not.
+    """
+    if isinstance(e, (BucketFullException, LimiterDelayException)):
+        return False
+
+    message = str(e)
+    return (
+        classify(e) == PERMANENT
+        and status_code(message) != 403
+        and not _auth_message.match(message)
+    )
+
+
+def retry_hint(e):
+    """Returns the number of seconds after which the server asked to retry, if it did."""
+    retry_after = getattr(e, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+
+    match = _retry_after_message.search(str(e))
+    if not match:
+        return None
+
+    value = float(match.group(1))
+    unit = (match.group(2) or "s").lower()
+    return value / 1000 if unit.startswith("m") else value
+
+
+def backoff(attempt, hint=None, base_delay_s=BASE_DELAY_S, max_delay_s=MAX_DELAY_S):
+    """Exponential backoff with full jitter, but never shorter than what the server asked for."""
+    delay = random.uniform(0, min(max_delay_s, base_delay_s * 2**attempt))
+    if hint is not None:
+        delay = max(delay, hint)
+
+    return delay
+
+
+async def with_retries(operation, max_retries, on_retry=None, sleep=asyncio.sleep):
+    """
+    Runs the operation and retries it when it was throttled, failed temporarily or its session expired.
+
+    An expired session is retried once right away, on top of the `max_retries`,
+    since `on_retry` is expected to authenticate again.
+    `on_retry` is awaited with the error, its classification and the delay before the next attempt.
+    """
+    attempt = 0
+    renewed = False
+    while True:
+        try:
+            return await operation()
+        except Exception as e:
+            kind = classify(e)
+            renew = kind == EXPIRED and not renewed
+            if not renew and (kind == PERMANENT or attempt >= max_retries):
+                raise
+
+            if renew:
+                renewed = True
+                delay = 0.0
+            else:
+                delay = backoff(attempt, retry_hint(e))
+                attempt += 1
+            if on_retry:
+                await on_retry(e, kind, delay)
+
+            await sleep(delay)
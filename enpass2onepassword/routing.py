@@ -0,0 +1,74 @@
+import json
+
+import click
+
+
+def read_vault_map(path):
+    """Reads the file that tells which Enpass folder goes to which 1Password vault."""
+    try:
+        with open(path, encoding="utf-8") as vault_map_file:
+            vault_map = json.load(vault_map_file)
+    except (OSError, ValueError) as e:
+        click.echo(
+            f"Unable to read the vault map '{path}': {click.style(e, fg='red')}",
+            err=True,
+        )
+        raise click.Abort()
+
+    if not isinstance(vault_map, dict) or not all(
+        isinstance(vault, str) for vault in vault_map.values()
+    ):
+        click.echo(
+            f"The vault map '{path}' must be a JSON object "
+            "from Enpass folder names to 1Password vault names.",
+            err=True,
+        )
+        raise click.Abort()
+
+    return vault_map
+
+
+def route_folders(ep_folders, vault_map, vault_ids):
+    """
+    Returns the id of the 1Password vault of every Enpass folder that is in the vault map.
+
+    The folders are looked up in the vault map by their uuid first, and by their title second.
+    `vault_ids` are the ids of the 1Password vaults by their title.
+    """
+    routes = {}
+    for folder in ep_folders:
+        vault = vault_map.get(folder["uuid"], vault_map.get(folder["title"]))
+        if vault is None:
+            continue
+
+        if vault not in vault_ids:
+            click.echo(
+                f"The vault '{vault}' of the Enpass folder '{folder['title']}' does not exist or "
+                "the 1Password Service Account does not have access.",
+                err=True,
+            )
+            raise click.Abort()
+
+        routes[folder["uuid"]] = vault_ids[vault]
+
+    known_folders = {folder["uuid"] for folder in ep_folders} | {
+        folder["title"] for folder in ep_folders
+    }
+    unknown_folders = [folder for folder in vault_map if folder not in known_folders]
+    if unknown_folders:
+        click.secho(
+            f"The Enpass export has no folders named {', '.join(map(repr, unknown_folders))}.",
+            fg="yellow",
+            err=True,
+        )
+
+    return routes
+
+
+def route(ep_item, folder_vault_ids, op_vault_id):
+    """Returns the vault of the first folder of the item that has one, or else the default vault."""
+    for folder_uuid in ep_item.get("folders", ()):
+        if folder_uuid in folder_vault_ids:
+            return folder_vault_ids[folder_uuid]
+
+    return op_vault_id
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+REFRESH_RETRY_S = 30.0
+REQUEST_QUANTILE = 0.99
+
+
+class ClientHolder:
+    """
+    Holds the authenticated 1Password client and replaces it before its session expires.
+
+    The first authentication starts when the holder is entered, and `current` waits for it,
+    so that other work can be done in the meantime.
+    A background task authenticates again ahead of time, so that creating entries never waits for it.
+    Requests that are already running keep the client they started with,
+    and all following requests get the new client.
+    A request that finds its session expired anyway `renew`s the client before it is retried.
+    """
+
+    def __init__(
+        self,
+        authenticate,
+        validity_s,
+        latency=None,
+        clock=time.time,
+        sleep=asyncio.sleep,
+    ):
+        """
+        `authenticate` is awaited for a new client and returns it together with its creation time by the `clock`.
+
+        `latency` is the histogram of the requests, so that the new client is ready before the slowest of them
+        could still be running on the old one.
+        """
+        self.authenticate = authenticate
+        self.validity_s = validity_s
+        self.latency = latency
+        self.clock = clock
+        self.sleep = sleep
+        self.client = None
+        self.created = 0.0
+        self.authentication_s = 0.0
+        self.lock = asyncio.Lock()
+        self.first = None
+        self.task = None
+
+    async def __aenter__(self):
+        self.first = asyncio.create_task(self.refresh())
+        self.task = asyncio.create_task(self.refresh_in_background())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.first.cancel()
+        self.task.cancel()
+        await asyncio.gather(self.first, self.task, return_exceptions=True)
+
+    async def refresh(self):
+        started = time.monotonic()
+        client, created = await self.authenticate()
+        self.client, self.created = client, created
+        self.authentication_s = time.monotonic() - started
+
+    def refresh_at(self):
+        """
+        Ahead of the expiry by twice the time that the last authentication took,
+        or by the time of a slow request, if that is longer, but not too early.
+        """
+        request_s = self.latency.quantile(REQUEST_QUANTILE) if self.latency else 0.0
+        ahead_s = min(max(2 * self.authentication_s, request_s), self.validity_s / 2)
+        return self.created + self.validity_s - ahead_s
+
+    async def refresh_in_background(self):
+        await self.first
+        while True:
+            await self.sleep(max(0.0, self.refresh_at() - self.clock()))
+            try:
+                async with self.lock:
+                    await self.refresh()
+            except Exception:
+                # `current` authenticates itself, should the session expire in the meantime
+                await self.sleep(min(REFRESH_RETRY_S, self.validity_s / 10))
+
+    def expired(self):
+        return self.clock() - self.created > self.validity_s
+
+    async def current(self):
+        """Returns the current client. Only authenticates when the background task fell behind."""
+        await self.first
+        if self.expired():
+            async with self.lock:
+                if self.expired():
+                    await self.refresh()
+
+        return self.client
+
+    async def renew(self, stale):
+        """Authenticates again, because the session of the `stale` client expired, unless that was done already."""
+        async with self.lock:
+            if self.client is stale:
+                await self.refresh()
@@ -0,0 +1,266 @@
+import asyncio
+import codecs
+import json
+import re
+
+import click
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+_string_end_or_escape = re.compile(r'["\\]')
+
+
+class ExportReader:
+    """
+    Reads JSON values one by one from an Enpass export.
+
+    Only the text of the value that is currently decoded is kept in memory,
+    so the memory usage depends on the largest item and not on the size of the export.
+    With an `AttachmentSpool`, the content of the attachments is decoded into files instead,
+    so that not even the largest attachment has to fit into memory.
+    """
+
+    def __init__(self, ep_file, chunk_size=CHUNK_SIZE, spool=None, offsets=False):
+        self.ep_file = ep_file
+        self.chunk_size = chunk_size
+        self.spool = spool
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+        # with `offsets`, the bytes up to `mark` in the buffer are counted in `offset`
+        self.offsets = offsets
+        self.offset = ep_file.tell() if offsets else 0
+        self.mark = 0
+        if offsets and self.offset == 0:
+            # the decoder drops the byte order mark, but it still takes up bytes in the file
+            if ep_file.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+                self.offset = len(codecs.BOM_UTF8)
+            ep_file.seek(0)
+
+    def tell(self):
+        """Returns the byte offset of the current position in a binary export. Requires `offsets`."""
+        mark, pos = self.mark, self.pos
+        self.offset += len(self.buffer[mark:pos].encode())
+        self.mark = pos
+        return self.offset
+
+    def fill(self, size):
+        if self.offsets:
+            self.tell()
+            self.mark = 0
+        consumed, self.pos = self.pos, 0
+        self.buffer = self.buffer[consumed:]
+
+        data = self.ep_file.read(size)
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data, final=not data)
+        if not data:
+            self.eof = True
+
+        self.buffer += data
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of the Enpass export")
+            self.fill(self.chunk_size)
+
+    def expect(self, *chars):
+        c = self.peek()
+        if c not in chars:
+            raise ValueError(
+                f"Expected {' or '.join(repr(c) for c in chars)} but found {c!r}"
+            )
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # a number at the end of the buffer might continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+
+            # read larger and larger chunks, so that big items are not decoded over and over again
+            self.fill(size)
+            size *= 2
+
+    def keys(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",", "}") == "}":
+                return
+
+    def elements(self, element=None):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield element() if element else self.value()
+            if self.expect(",", "]") == "]":
+                return
+
+    def string(self, write):
+        """Passes the text of a JSON string to `write` piece by piece, instead of decoding it as a whole."""
+        self.expect('"')
+        while True:
+            start = self.pos
+            match = _string_end_or_escape.search(self.buffer, start)
+            end = match.start() if match else len(self.buffer)
+            if end > start:
+                write(self.buffer[start:end])
+                self.pos = end
+
+            if match is not None and self.buffer[end] == '"':
+                self.pos = end + 1
+                return
+
+            escape_end = end + (6 if self.buffer.startswith("u", end + 1) else 2)
+            if match is None or escape_end > len(self.buffer):
+                # the string, or its escape sequence, continues in the next chunk
+                if self.eof:
+                    raise ValueError("Unexpected end of the Enpass export")
+                self.fill(self.chunk_size)
+                continue
+
+            write(json.loads(f'"{self.buffer[end:escape_end]}"'))
+            self.pos = escape_end
+
+    def item(self):
+        """Reads an Enpass item and moves the content of its attachments into the spool."""
+        self.peek()
+        try:
+            ep_item, end = _decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            pass
+        else:
+            # most items are small enough to be decoded from the buffer at once
+            self.pos = end
+            if isinstance(ep_item, dict):
+                self.spool.store(ep_item)
+            return ep_item
+
+        if self.peek() != "{":
+            return self.value()
+
+        ep_item = {}
+        for key in self.keys():
+            if key == "attachments" and self.peek() == "[":
+                ep_item[key] = list(self.elements(self.attachment))
+            else:
+                ep_item[key] = self.value()
+        return ep_item
+
+    def attachment(self):
+        if self.peek() != "{":
+            return self.value()
+
+        ep_attachment = {}
+        for key in self.keys():
+            if key == "data" and self.peek() == '"':
+                with self.spool.open() as attachment_file:
+                    self.string(attachment_file.write)
+                ep_attachment["file"] = attachment_file.path
+                ep_attachment["size"] = attachment_file.size
+            else:
+                ep_attachment[key] = self.value()
+        return ep_attachment
+
+
+async def load_enpass_stream(ep_file, chunk_size=CHUNK_SIZE, spool=None, index=None):
+    """
+    Reads the folders of an Enpass export and returns them together with an async iterator over its items.
+
+    The items are decoded one at a time while the iterator is consumed.
+    With a `spool`, the attachments of the items are decoded into files.
+    With an `IndexBuilder`, the offsets of the items are noted, and the index is written once all items are read.
+    """
+    reader = ExportReader(ep_file, chunk_size, spool, offsets=index is not None)
+    keys = reader.keys()
+
+    def read_head():
+        ep_folders = None
+        ep_items = None
+        try:
+            for key in keys:
+                if key == "folders":
+                    ep_folders = reader.value()
+                elif key == "items" and ep_folders is not None:
+                    return ep_folders, None, True
+                elif key == "items":
+                    # Enpass writes the folders first. Should they ever come last,
+                    # the items must be held in memory until the folders are known.
+                    ep_items = reader.value()
+                else:
+                    reader.value()
+        except ValueError as e:
+            raise_load_error(e)
+
+        return ep_folders, ep_items, False
+
+    # in a thread, so that the connection to 1Password can be set up in the meantime
+    ep_folders, ep_items, streaming = await asyncio.to_thread(read_head)
+
+    if ep_folders is None and ep_items is None and not streaming:
+        raise_load_error("It contains neither folders nor items.")
+
+    async def items():
+        if not streaming:
+            for ep_item in ep_items or []:
+                yield ep_item
+            return
+
+        read = reader.item if spool else reader.value
+
+        def indexed_item():
+            reader.peek()
+            offset = reader.tell()
+            ep_item = read()
+            index.add(offset, reader.tell() - offset, ep_item)
+            return ep_item
+
+        try:
+            for ep_item in reader.elements(indexed_item if index else read):
+                yield ep_item
+            for _ in keys:
+                reader.value()
+        except ValueError as e:
+            raise_load_error(e)
+
+        if index:
+            index.write(ep_folders or [])
+
+    return ep_folders or [], items()
+
+
+def raise_load_error(e):
+    click.echo(
+        message=f"Unable to load the given Enpass export: {click.style(e, fg='red')}",
+        err=True,
+    )
+    raise click.Abort()
@@ -0,0 +1,75 @@
+import hashlib
+
+
+def normalize(value):
+    return " ".join((value or "").split()).casefold()
+
+
+def primary_url(websites):
+    if not websites:
+        return ""
+
+    return normalize(websites[0].url).rstrip("/")
+
+
+def username(fields):
+    for field in fields or []:
+        if field.id == "username":
+            return normalize(field.value)
+
+    return ""
+
+
+def fingerprint(title, websites):
+    key = f"{normalize(title)}\0{primary_url(websites)}"
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+
+class VaultIndex:
+    """
+    Fingerprints of the items in a 1Password vault, to recognize Enpass items that already exist.
+
+    An item exists, if the normalized title, primary URL and username match.
+    The item listing does not contain the username, so the existing items are only fetched
+    when their title and primary URL match an Enpass item.
+    """
+
+    def __init__(self, client, vault_id):
+        self.client = client
+        self.vault_id = vault_id
+        self.item_ids = {}
+        self.usernames = {}
+
+    async def add_all(self, op_overviews):
+        async for op_overview in op_overviews:
+            self.add(op_overview)
+
+    def add(self, op_overview):
+        key = fingerprint(op_overview.title, op_overview.websites)
+        self.item_ids.setdefault(key, []).append(op_overview.id)
+
+    def __len__(self):
+        return sum(len(item_ids) for item_ids in self.item_ids.values())
+
+    async def contains(self, op_item):
+        return await self.find(op_item) is not None
+
+    async def find(self, op_item):
+        """Returns the id of an item of the vault that matches the given item, or None."""
+        item_ids = self.item_ids.get(fingerprint(op_item.title, op_item.websites))
+        if not item_ids:
+            return None
+
+        expected_username = username(op_item.fields)
+        for item_id in item_ids:
+            if await self.username(item_id) == expected_username:
+                return item_id
+
+        return None
+
+    async def username(self, item_id):
+        if item_id not in self.usernames:
+            op_item = await self.client.items.get(self.vault_id, item_id)
+            self.usernames[item_id] = username(op_item.fields)
+
+        return self.usernames[item_id]
@@ -0,0 +1,336 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from contextlib import AsyncExitStack
+from functools import partial
+from typing import NamedTuple, Optional
+
+import click
+from aiostream import stream
+from onepassword.client import Client
+
+from enpass2onepassword.attachments import AttachmentSpool
+from enpass2onepassword.content_hash import content_digests, differing_parts
+from enpass2onepassword.journal import read_journal, write_atomically
+from enpass2onepassword.metrics import Metrics
+from enpass2onepassword.migration import (
+    get_op_client,
+    iterator_taker,
+    lookup_vaults,
+    map_chunks,
+    report_mapping_errors,
+    run_workers,
+    wanted_ep_items,
+)
+from enpass2onepassword.retry import with_retries
+from enpass2onepassword.routing import route_folders
+from enpass2onepassword.session import ClientHolder
+from enpass2onepassword.streaming import load_enpass_stream
+from enpass2onepassword.vault_index import fingerprint, username
+
+READ_CONCURRENCY = 16
+
+
+class Digested(NamedTuple):
+    """The content hashes of an Enpass item or of a 1Password item, and what is needed to pair them up."""
+
+    vault_id: str
+    id: str
+    """The uuid of the Enpass item, or the id of the 1Password item."""
+    title: str
+    key: tuple
+    parts: Counter
+
+
+def digested(item_id, op_item, files=()):
+    return Digested(
+        op_item.vault_id,
+        item_id,
+        op_item.title,
+        (
+            op_item.vault_id,
+            fingerprint(op_item.title, op_item.websites),
+            username(op_item.fields),
+        ),
+        content_digests(op_item, files),
+    )
+
+
+def digest_entry(entry):
+    files = [
+        (
+            attachment.name,
+            (
+                os.path.getsize(attachment.path)
+                if attachment.path
+                else len(attachment.read())
+            ),
+        )
+        for attachment in entry.attachments
+    ]
+    return digested(entry.ep_uuid, entry.op_item, files)
+
+
+def digest_item(op_item):
+    files = [(f.attributes.name, f.attributes.size) for f in op_item.files or []]
+    return digested(op_item.id, op_item, files)
+
+
+class Difference(NamedTuple):
+    vault_id: str
+    title: str
+    ep_uuid: Optional[str] = None
+    op_id: Optional[str] = None
+    parts: tuple = ()
+    """The names of the parts whose content differs."""
+
+
+class VerifyReport(NamedTuple):
+    matching: int
+    missing: list
+    """The Enpass items that have no 1Password item."""
+    extra: list
+    """The 1Password items that belong to no Enpass item."""
+    mismatched: list
+    """The pairs of items whose content differs."""
+
+    def ok(self):
+        return not (self.missing or self.extra or self.mismatched)
+
+    def to_json(self, vault_titles):
+        def differences(kind):
+            return [
+                {
+                    "vault": vault_titles.get(d.vault_id, d.vault_id),
+                    "title": d.title,
+                    "enpass_uuid": d.ep_uuid,
+                    "onepassword_id": d.op_id,
+                    **({"parts": list(d.parts)} if kind == "mismatched" else {}),
+                }
+                for d in getattr(self, kind)
+            ]
+
+        return {
+            "matching": self.matching,
+            "missing": differences("missing"),
+            "extra": differences("extra"),
+            "mismatched": differences("mismatched"),
+        }
+
+
+def compare(sources, targets, journaled=None):
+    """
+    Pairs the Enpass items up with the 1Password items and compares their content.
+
+    An Enpass item is paired with the 1Password item that the journal noted for it.
+    Otherwise, it is paired with an item of the same title, first website and username,
+    and preferably with one of the same content.
+    """
+    journaled = journaled or {}
+    remaining = {target.id: target for target in targets}
+    by_key = {}
+    for target in targets:
+        by_key.setdefault(target.key, []).append(target)
+
+    pairs = []
+    unpaired = []
+    for source in sources:
+        target = remaining.pop(journaled.get(source.id), None)
+        if target is None:
+            unpaired.append(source)
+        else:
+            pairs.append((source, target))
+
+    missing = []
+    for source in unpaired:
+        candidates = [t for t in by_key.get(source.key, ()) if t.id in remaining]
+        if not candidates:
+            missing.append(Difference(source.vault_id, source.title, source.id))
+            continue
+
+        target = next((t for t in candidates if t.parts == source.parts), candidates[0])
+        del remaining[target.id]
+        pairs.append((source, target))
+
+    matching = 0
+    mismatched = []
+    for source, target in pairs:
+        if source.parts == target.parts:
+            matching += 1
+        else:
+            mismatched.append(
+                Difference(
+                    target.vault_id,
+                    source.title,
+                    source.id,
+                    target.id,
+                    tuple(differing_parts(source.parts, target.parts)),
+                )
+            )
+
+    extra = [
+        Difference(target.vault_id, target.title, op_id=target.id)
+        for target in remaining.values()
+    ]
+    return VerifyReport(matching, missing, extra, mismatched)
+
+
+async def verify(
+    ep_file,
+    op_sa_name,
+    op_sa_token,
+    op_vault,
+    silent,
+    op_client_validity_s,
+    vault_map=None,
+    journal_path=None,
+    read_concurrency=READ_CONCURRENCY,
+    max_retries=0,
+    map_workers=1,
+    report_path=None,
+    client_factory=Client.authenticate,
+    metrics=None,
+):
+    """
+    Compares the content of the 1Password vaults with the Enpass export, after a migration.
+
+    The Enpass items are mapped like for the migration, and the items of the vaults are read back,
+    with up to `read_concurrency` requests at the same time.
+    Only hashes of the content are kept and compared, and the report names the parts that differ but not their values.
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    async with AsyncExitStack() as stack:
+        clients = await stack.enter_async_context(
+            ClientHolder(
+                partial(get_op_client, op_sa_name, op_sa_token, client_factory),
+                op_client_validity_s,
+            )
+        )
+        spool = AttachmentSpool(
+            stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="enpass2onepassword-")
+            )
+        )
+
+        with metrics.phase("load"):
+            ep_folders, ep_items = await load_enpass_stream(ep_file, spool=spool)
+
+        client = await clients.current()
+        metrics.record_phase("auth", clients.authentication_s)
+
+        vault_ids, op_vault_id = await lookup_vaults(client, op_sa_name, op_vault)
+        folder_vault_ids = (
+            route_folders(ep_folders, vault_map, vault_ids) if vault_map else {}
+        )
+        vault_titles = {vault_id: title for title, vault_id in vault_ids.items()}
+        target_vault_ids = list(
+            dict.fromkeys([op_vault_id, *folder_vault_ids.values()])
+        )
+
+        with metrics.phase("map"):
+            sources = []
+            async for entries, errors in map_chunks(
+                ep_folders,
+                wanted_ep_items(ep_items, lambda number, ep_uuid: True),
+                op_vault_id,
+                map_workers,
+                folder_vault_ids=folder_vault_ids,
+            ):
+                if errors:
+                    report_mapping_errors(errors)
+
+                for entry in entries:
+                    sources.append(digest_entry(entry))
+                    for attachment in entry.attachments:
+                        attachment.discard()
+
+        with metrics.phase("read"):
+            targets = await read_vaults(
+                clients, target_vault_ids, read_concurrency, max_retries, metrics
+            )
+
+    report = compare(sources, targets, read_journal(journal_path, target_vault_ids))
+    print_report(report, vault_titles, silent)
+
+    if report_path:
+        try:
+            write_atomically(
+                report_path,
+                json.dumps(report.to_json(vault_titles), indent=2) + "\n",
+            )
+        except OSError as e:
+            click.echo(
+                f"Unable to write the report '{report_path}': {click.style(e, fg='red')}",
+                err=True,
+            )
+
+    return report
+
+
+async def read_vaults(clients, vault_ids, read_concurrency, max_retries, metrics):
+    """Reads all items of the vaults back, with up to `read_concurrency` requests at the same time."""
+    op_overviews = []
+    for vault_id in vault_ids:
+        client = await clients.current()
+        op_overviews.extend(await stream.list(await client.items.list_all(vault_id)))
+
+    take = iterator_taker(iter(op_overviews))
+    targets = []
+
+    async def on_retry(e, kind, delay):
+        metrics.retries[kind] += 1
+
+    async def worker():
+        while (op_overview := await take()) is not None:
+
+            async def get():
+                client = await clients.current()
+                return await client.items.get(op_overview.vault_id, op_overview.id)
+
+            try:
+                op_item = await with_retries(get, max_retries, on_retry)
+            except Exception as e:
+                click.echo(
+                    f"Error reading the 1Password entry '{op_overview.title}': {e}",
+                    err=True,
+                )
+                raise click.Abort()
+            targets.append(digest_item(op_item))
+
+    await run_workers(worker() for _ in range(read_concurrency))
+    return targets
+
+
+def print_report(report, vault_titles, silent):
+    def describe(difference):
+        vault = vault_titles.get(difference.vault_id, difference.vault_id)
+        return f"'{difference.title}' in the vault '{vault}'"
+
+    for difference in report.missing:
+        click.echo(
+            f"{click.style('Missing', fg='red')}    {describe(difference)} "
+            f"(Enpass {difference.ep_uuid})"
+        )
+    for difference in report.extra:
+        click.echo(
+            f"{click.style('Extra', fg='yellow')}      {describe(difference)} "
+            f"(1Password {difference.op_id})"
+        )
+    for difference in report.mismatched:
+        click.echo(
+            f"{click.style('Different', fg='red')}  {describe(difference)}: "
+            f"{', '.join(difference.parts)}"
+        )
+
+    if not silent:
+        summary = (
+            f"{report.matching} entries match, {len(report.missing)} are missing, "
+            f"{len(report.extra)} are extra and {len(report.mismatched)} differ."
+        )
+        if report.ok():
+            click.echo(f"{click.style('Verified.', fg='green')} {summary}")
+        else:
+            click.echo(f"{click.style('Differences found.', fg='red')} {summary}")
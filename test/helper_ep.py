@@ -1,11 +1,38 @@
+import io
+import json
 from pathlib import Path
 
-from enpass2onepassword.migration import load_enpass_json
+from enpass2onepassword.migration import migrate
 
 
 async def enpass(enpass_file):
+    """Loads an Enpass export of the tests in one go, to compare the streamed reading against."""
     json_path = Path(__file__).parent.joinpath(enpass_file)
     with open(json_path, mode="r", encoding="utf-8") as json_file:
-        ep_folders, ep_items = await load_enpass_json(json_file)
+        export = json.load(json_file)
 
-        return ep_folders, ep_items
+    return export["folders"], export["items"]
+
+
+async def migrate_to(server, export, op_vault="Enpass", **options):
+    """
+    Migrates an Enpass export, given as a file or as its JSON, into a vault of the mock server.
+
+    The `options` of `migrate` default to a silent migration without confirmation or rate limits to wait for.
+    """
+    ep_file = (
+        io.BytesIO(json.dumps(export).encode()) if isinstance(export, dict) else export
+    )
+    options = {
+        "ignore_non_empty": False,
+        "no_confirm": True,
+        "silent": True,
+        "skip": 0,
+        "no_wakelock": True,
+        "op_rate_limit_h": 1000,
+        "op_rate_limit_d": 1000,
+        "op_client_validity_s": 3600,
+        "client_factory": server.authenticate,
+        **options,
+    }
+    await migrate(ep_file, "test", "token", op_vault, **options)
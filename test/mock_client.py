@@ -0,0 +1,228 @@
+import asyncio
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from onepassword import FileAttributes, Item, ItemFile, ItemOverview, VaultOverview
+from onepassword.errors import RateLimitExceededException
+from onepassword.iterator import SDKIterator
+
+
+def rfc3339_now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class MockOnePassword:
+    """
+    An in-process stand-in for the 1Password servers.
+
+    `authenticate` has the same signature as `onepassword.client.Client.authenticate`,
+    so it can be passed to `migrate` as the client factory.
+    The simulated servers can be slow, enforce a write rate limit per token, expire sessions and fail at random,
+    so that the migration can be tested and measured without spending any real quota.
+    """
+
+    def __init__(
+        self,
+        vaults=("Enpass",),
+        latency_s=0.0,
+        latency_jitter_s=0.0,
+        rate_limit=None,
+        rate_limit_window_s=3600.0,
+        session_validity_s=None,
+        error_rate=0.0,
+        seed=None,
+    ):
+        self.vaults = {uuid.uuid4().hex: title for title in vaults}
+        self.items = {vault_id: {} for vault_id in self.vaults}
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.rate_limit = rate_limit
+        self.rate_limit_window_s = rate_limit_window_s
+        self.session_validity_s = session_validity_s
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.writes = {}
+        self.authentications = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.create_latencies = []
+        self.files = {}
+        self.archived = {}
+
+    def vault_id(self, title):
+        return next(vault_id for vault_id, t in self.vaults.items() if t == title)
+
+    def created(self, title="Enpass"):
+        return list(self.items[self.vault_id(title)].values())
+
+    async def authenticate(self, auth, integration_name, integration_version):
+        await self.respond()
+        if not auth:
+            raise Exception("invalid service account token")
+
+        self.authentications += 1
+        return MockClient(self, Session(auth, time.monotonic()))
+
+    async def respond(self):
+        latency_s = self.latency_s + self.random.uniform(0, self.latency_jitter_s)
+        if latency_s > 0:
+            await asyncio.sleep(latency_s)
+
+    async def request(self, session, write=False):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self.respond()
+
+            if (
+                self.session_validity_s is not None
+                and time.monotonic() - session.created > self.session_validity_s
+            ):
+                raise Exception("session expired, authenticate again")
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise ConnectionResetError("connection reset by the mock server")
+            if write:
+                self.throttle(session.token)
+        finally:
+            self.in_flight -= 1
+
+    def throttle(self, token):
+        if self.rate_limit is None:
+            return
+
+        now = time.monotonic()
+        writes = self.writes.setdefault(token, deque())
+        while writes and now - writes[0] > self.rate_limit_window_s:
+            writes.popleft()
+        if len(writes) >= self.rate_limit:
+            raise RateLimitExceededException("rate limit exceeded")
+
+        writes.append(now)
+
+
+class Session(NamedTuple):
+    token: str
+    created: float
+
+
+class MockClient:
+    def __init__(self, server, session):
+        self.vaults = MockVaults(server, session)
+        self.items = MockItems(server, session)
+
+
+class MockVaults:
+    def __init__(self, server, session):
+        self.server = server
+        self.session = session
+
+    async def list_all(self):
+        await self.server.request(self.session)
+        return SDKIterator(
+            [
+                VaultOverview(id=vault_id, title=title)
+                for vault_id, title in self.server.vaults.items()
+            ]
+        )
+
+
+class MockItems:
+    def __init__(self, server, session):
+        self.server = server
+        self.session = session
+
+    def vault(self, vault_id):
+        if vault_id not in self.server.items:
+            raise Exception(f"vault '{vault_id}' not found")
+        return self.server.items[vault_id]
+
+    async def create(self, params):
+        started = time.monotonic()
+        await self.server.request(self.session, write=True)
+
+        # every file is uploaded with a write request of its own
+        files = []
+        for file_params in params.files or []:
+            await self.server.request(self.session, write=True)
+            file_id = uuid.uuid4().hex
+            self.server.files[file_id] = file_params.content
+            files.append(
+                ItemFile(
+                    attributes=FileAttributes(
+                        name=file_params.name,
+                        id=file_id,
+                        size=len(file_params.content),
+                    ),
+                    section_id=file_params.section_id,
+                    field_id=file_params.field_id,
+                )
+            )
+
+        now = rfc3339_now()
+        op_item = Item(
+            id=uuid.uuid4().hex,
+            title=params.title,
+            category=params.category,
+            vault_id=params.vault_id,
+            fields=params.fields or [],
+            sections=params.sections or [],
+            notes=params.notes or "",
+            tags=params.tags or [],
+            websites=params.websites or [],
+            version=1,
+            files=files,
+            created_at=now,
+            updated_at=now,
+        )
+        self.vault(params.vault_id)[op_item.id] = op_item
+        self.server.create_latencies.append(time.monotonic() - started)
+        return op_item
+
+    async def get(self, vault_id, item_id):
+        await self.server.request(self.session)
+        op_item = self.vault(vault_id).get(item_id)
+        if op_item is None:
+            raise Exception(f"item '{item_id}' not found")
+        return op_item
+
+    async def put(self, op_item):
+        await self.server.request(self.session, write=True)
+        vault = self.vault(op_item.vault_id)
+        if op_item.id not in vault:
+            raise Exception(f"item '{op_item.id}' not found")
+
+        op_item = op_item.model_copy(
+            update={"version": op_item.version + 1, "updated_at": rfc3339_now()}
+        )
+        vault[op_item.id] = op_item
+        return op_item
+
+    async def archive(self, vault_id, item_id):
+        await self.server.request(self.session, write=True)
+        op_item = self.vault(vault_id).pop(item_id, None)
+        if op_item is None:
+            raise Exception(f"item '{item_id}' not found")
+        self.server.archived[item_id] = op_item
+
+    async def list_all(self, vault_id):
+        await self.server.request(self.session)
+        return SDKIterator(
+            [
+                ItemOverview(
+                    id=op_item.id,
+                    title=op_item.title,
+                    category=op_item.category,
+                    vault_id=op_item.vault_id,
+                    websites=op_item.websites,
+                    tags=op_item.tags,
+                    created_at=rfc3339_now(),
+                    updated_at=rfc3339_now(),
+                )
+                for op_item in self.vault(vault_id).values()
+            ]
+        )
@@ -0,0 +1,191 @@
+import json
+import random
+import uuid
+
+# The fields of the synthetic items by Enpass category.
+# Together, they use every field type that enpass2onepassword knows.
+category_fields = {
+    "computer": [
+        ("text", "Name"),
+        ("username", "Username"),
+        ("password", "Password"),
+        ("url", "Address"),
+    ],
+    "creditcard": [
+        ("ccName", "Cardholder"),
+        ("ccType", "Type"),
+        ("ccNumber", "Number"),
+        ("ccCvc", "CVC"),
+        ("ccExpiry", "Expiry date"),
+        ("ccValidfrom", "Valid from"),
+        ("ccPin", "PIN"),
+        ("section", "Bank"),
+        ("ccBankname", "Bank name"),
+        ("ccTxnpassword", "Transaction password"),
+        ("phone", "Phone"),
+    ],
+    "finance": [
+        ("text", "Account holder"),
+        ("numeric", "Account number"),
+        ("pin", "PIN"),
+        ("section", "Online banking"),
+        ("username", "Login"),
+        ("password", "Password"),
+        ("url", "Website"),
+    ],
+    "identity": [
+        ("text", "Name"),
+        ("date", "Birthday"),
+        ("email", "E-mail"),
+        ("phone", "Phone"),
+        ("multiline", "Address"),
+    ],
+    "license": [
+        ("text", "Product"),
+        ("text", "License key"),
+        ("email", "Registered e-mail"),
+        ("date", "Purchase date"),
+    ],
+    "login": [
+        ("username", "Username"),
+        ("email", "E-mail"),
+        ("password", "Password"),
+        ("url", "Website"),
+        ("totp", "One-time password"),
+        ("section", "Apps"),
+        (".Android#", "Android app"),
+    ],
+    "misc": [
+        ("text", "Text"),
+        ("multiline", "More text"),
+    ],
+    "note": [],
+    "password": [
+        ("password", "Password"),
+        ("url", "Website"),
+    ],
+    "travel": [
+        ("text", "Passport number"),
+        ("date", "Expiry date"),
+        ("text", "Issuing country"),
+    ],
+    "uncategorized": [
+        ("email", "E-mail"),
+        ("pin", "PIN"),
+        ("url", "Website"),
+    ],
+}
+
+sensitive_field_types = {"password", "pin", "ccCvc", "ccPin", "ccTxnpassword", "totp"}
+
+
+def synthetic_value(rnd, field_type, i):
+    if field_type == "section":
+        return ""
+    if field_type in ("url", ".Android#"):
+        return f"https://site{i}.example.com/login"
+    if field_type in ("email", "username"):
+        return f"user{i}@example.com"
+    if field_type in ("numeric", "ccNumber", "phone"):
+        return str(rnd.randrange(10**11, 10**12))
+    if field_type in ("date", "ccExpiry", "ccValidfrom"):
+        return f"{rnd.randrange(1, 13):02}/{rnd.randrange(2020, 2035)}"
+    if field_type == "totp":
+        return "otpauth://totp/Example?secret=JBSWY3DPEHPK3PXP"
+    if field_type == "multiline":
+        return f"Line 1 of {i}\nLine 2 of {i}"
+    return f"{rnd.getrandbits(64):x}"
+
+
+def synthetic_folders(seed=0, count=5):
+    rnd = random.Random(f"folders-{seed}")
+    return [
+        {
+            "icon": "1008",
+            "parent_uuid": "",
+            "title": f"Folder {i}",
+            "updated_at": 1546437859,
+            "uuid": str(uuid.UUID(int=rnd.getrandbits(128))),
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_items(count, folders, seed=0, hidden_share=0.0):
+    """
+    Generates `count` Enpass items, which cycle through all categories.
+
+    A share of `hidden_share` of them is trashed or archived.
+    Some of the fields are empty or deleted, like in real exports.
+    """
+    rnd = random.Random(seed)
+    categories = sorted(category_fields)
+
+    for i in range(count):
+        category = categories[i % len(categories)]
+        hidden = rnd.random() < hidden_share
+
+        fields = []
+        for order, (field_type, label) in enumerate(category_fields[category]):
+            value = synthetic_value(rnd, field_type, i)
+            if field_type == "section" and rnd.random() < 0.2:
+                value = label
+            elif rnd.random() < 0.05:
+                value = ""
+            fields.append(
+                {
+                    "deleted": 1 if rnd.random() < 0.02 else 0,
+                    "label": label,
+                    "order": order + 1,
+                    "sensitive": 1 if field_type in sensitive_field_types else 0,
+                    "type": field_type,
+                    "uid": 10 + order,
+                    "updated_at": 1668294736,
+                    "value": value,
+                    "value_updated_at": 1668294736,
+                }
+            )
+        rnd.shuffle(fields)
+
+        ep_item = {
+            "archived": 1 if hidden and rnd.random() < 0.5 else 0,
+            "auto_submit": rnd.randrange(2),
+            "category": category,
+            "createdAt": 1668294736,
+            "favorite": 1 if rnd.random() < 0.1 else 0,
+            "note": f"Note of item {i}" if rnd.random() < 0.3 else "",
+            "title": f"{category.capitalize()} {i}",
+            "trashed": 0,
+            "updated_at": 1668294736,
+            "uuid": str(uuid.UUID(int=rnd.getrandbits(128))),
+        }
+        if hidden and not ep_item["archived"]:
+            ep_item["trashed"] = 1
+        if fields:
+            ep_item["fields"] = fields
+        if folders and rnd.random() < 0.5:
+            ep_item["folders"] = [rnd.choice(folders)["uuid"]]
+
+        yield ep_item
+
+
+def synthetic_export(count, seed=0, hidden_share=0.0):
+    """Generates an Enpass export with `count` items that look like real ones."""
+    folders = synthetic_folders(seed)
+    return {
+        "folders": folders,
+        "items": list(synthetic_items(count, folders, seed, hidden_share)),
+    }
+
+
+def write_synthetic_export(ep_file, count, seed=0, hidden_share=0.0):
+    """Writes the same export as `synthetic_export` to a text file, one item at a time."""
+    folders = synthetic_folders(seed)
+    ep_file.write('{"folders": ')
+    json.dump(folders, ep_file)
+    ep_file.write(', "items": [')
+    for i, ep_item in enumerate(synthetic_items(count, folders, seed, hidden_share)):
+        if i > 0:
+            ep_file.write(",\n")
+        json.dump(ep_item, ep_file)
+    ep_file.write("]}\n")
@@ -0,0 +1,100 @@
+import base64
+import io
+import json
+import os
+import re
+import tracemalloc
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import pytest
+
+from enpass2onepassword.attachments import AttachmentSpool, Base64File
+from enpass2onepassword.streaming import load_enpass_stream
+
+CONTENT = bytes(range(256)) * 40
+
+
+def export_with_attachments(*contents):
+    export = synthetic_export(3)
+    export["items"][1]["attachments"] = [
+        {
+            "data": base64.b64encode(content).decode(),
+            "kind": "application/octet-stream",
+            "name": f"file{i}.bin",
+            "order": len(contents) - i,
+        }
+        for i, content in enumerate(contents)
+    ]
+    return export
+
+
+def test_base64_file(tmp_path):
+    text = base64.encodebytes(CONTENT).decode()
+
+    with Base64File(tmp_path / "attachment") as attachment_file:
+        for piece in re.findall(".{1,7}", text, re.DOTALL):
+            attachment_file.write(piece)
+
+    assert attachment_file.size == len(CONTENT)
+    assert (tmp_path / "attachment").read_bytes() == CONTENT
+
+
+@pytest.mark.parametrize("chunk_size", [5, 64 * 1024])
+async def test_read_attachments_into_files(tmp_path, chunk_size):
+    export = export_with_attachments(CONTENT, b"second")
+    # some encoders escape the slashes of the base64 alphabet
+    text = json.dumps(export).replace("/", "\\/")
+
+    _, ep_items = await load_enpass_stream(
+        io.StringIO(text), chunk_size, AttachmentSpool(tmp_path)
+    )
+    ep_item = [ep_item async for ep_item in ep_items][1]
+
+    first, second = ep_item["attachments"]
+    assert "data" not in first
+    assert first["name"] == "file0.bin"
+    assert first["size"] == len(CONTENT)
+    assert open(first["file"], "rb").read() == CONTENT
+    assert open(second["file"], "rb").read() == b"second"
+
+
+async def test_large_attachments_are_not_held_in_memory(tmp_path):
+    content = os.urandom(8 * 1024 * 1024)
+    ep_file = io.BytesIO(json.dumps(export_with_attachments(content)).encode())
+    del content
+
+    tracemalloc.start()
+    try:
+        _, ep_items = await load_enpass_stream(ep_file, spool=AttachmentSpool(tmp_path))
+        ep_item = [ep_item async for ep_item in ep_items][1]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert ep_item["attachments"][0]["size"] == 8 * 1024 * 1024
+    assert peak < 1024 * 1024
+
+
+async def test_migrate_attachments():
+    export = export_with_attachments(CONTENT, b"second")
+    server = MockOnePassword(rate_limit=100)
+
+    await migrate_to(server, export)
+
+    op_item = next(
+        op_item
+        for op_item in server.created()
+        if op_item.title == export["items"][1]["title"]
+    )
+    # Enpass shows the attachments by their order
+    assert [f.attributes.name for f in op_item.files] == ["file1.bin", "file0.bin"]
+    assert [server.files[f.attributes.id] for f in op_item.files] == [
+        b"second",
+        CONTENT,
+    ]
+    assert {f.section_id for f in op_item.files} == {"attachments"}
+    assert "attachments" in [section.id for section in op_item.sections]
+    # one write for the item and one for each of its files
+    assert len(server.writes["token"]) == 3 + 2
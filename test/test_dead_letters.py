@@ -0,0 +1,123 @@
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+
+from enpass2onepassword.dead_letters import read_dead_letters
+
+
+def failing_server(rejected_titles):
+    """A server that rejects the items with the given titles as invalid."""
+    server = MockOnePassword()
+    authenticate = server.authenticate
+
+    async def rejecting_authenticate(**kwargs):
+        client = await authenticate(**kwargs)
+        create = client.items.create
+
+        async def rejecting_create(params):
+            if params.title in rejected_titles:
+                raise Exception("invalid item")
+            return await create(params)
+
+        client.items.create = rejecting_create
+        return client
+
+    server.authenticate = rejecting_authenticate
+    return server
+
+
+async def run(server, export, dead_letters_path, **options):
+    await migrate_to(server, export, dead_letters_path=dead_letters_path, **options)
+
+
+def broken_export():
+    export = synthetic_export(10)
+    export["items"][2]["category"] = "spaceship"
+    return export
+
+
+async def test_failed_entries_are_set_aside(tmp_path, capsys):
+    export = broken_export()
+    rejected = export["items"][5]
+    dead_letters_path = tmp_path / "export.dead"
+    server = failing_server({rejected["title"]})
+
+    await run(server, export, dead_letters_path)
+
+    assert len(server.created()) == 8
+    dead_letters = read_dead_letters(dead_letters_path)
+    assert {
+        ep_uuid: (record["number"], record["stage"])
+        for ep_uuid, record in dead_letters.items()
+    } == {
+        export["items"][2]["uuid"]: (2, "map"),
+        rejected["uuid"]: (5, "upload"),
+    }
+    assert "spaceship" in dead_letters[export["items"][2]["uuid"]]["reason"]
+    assert dead_letters[rejected["uuid"]]["reason"] == "invalid item"
+    assert "2 Enpass entries could not be created" in capsys.readouterr().err
+
+
+async def test_retry_dead_letters(tmp_path):
+    export = broken_export()
+    rejected = export["items"][5]
+    rejected_titles = {rejected["title"]}
+    dead_letters_path = tmp_path / "export.dead"
+    server = failing_server(rejected_titles)
+    await run(server, export, dead_letters_path)
+
+    # the server accepts the item now, but the category is still unknown
+    rejected_titles.clear()
+    await run(server, export, dead_letters_path, retry_dead_letters=True)
+
+    titles = [op_item.title for op_item in server.created()]
+    assert len(titles) == 9
+    assert titles[-1] == rejected["title"]
+    assert list(read_dead_letters(dead_letters_path)) == [export["items"][2]["uuid"]]
+    assert len(dead_letters_path.read_text().splitlines()) == 1
+
+
+async def test_without_dead_letters_the_migration_stops():
+    export = broken_export()
+
+    with pytest.raises(click.Abort):
+        await run(MockOnePassword(), export, None)
+
+
+async def test_used_up_daily_limit_stops_the_migration(tmp_path):
+    export = synthetic_export(10)
+    dead_letters_path = tmp_path / "export.dead"
+    server = MockOnePassword()
+
+    with pytest.raises(click.Abort):
+        await run(server, export, dead_letters_path, op_rate_limit_d=3)
+
+    # the remaining entries are left to '--resume', instead of being set aside
+    assert len(server.created()) == 3
+    assert read_dead_letters(dead_letters_path) == {}
+
+
+async def test_rejected_service_account_stops_the_migration(tmp_path):
+    export = synthetic_export(10)
+    dead_letters_path = tmp_path / "export.dead"
+    server = MockOnePassword()
+    authenticate = server.authenticate
+
+    async def unauthorized_authenticate(**kwargs):
+        client = await authenticate(**kwargs)
+
+        async def unauthorized_create(params):
+            raise Exception("unauthorized: the service account token was revoked")
+
+        client.items.create = unauthorized_create
+        return client
+
+    server.authenticate = unauthorized_authenticate
+
+    with pytest.raises(click.Abort):
+        await run(server, export, dead_letters_path)
+
+    assert read_dead_letters(dead_letters_path) == {}
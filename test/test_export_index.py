@@ -0,0 +1,94 @@
+import codecs
+import json
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import pytest
+from aiostream import stream
+
+from enpass2onepassword import migration
+from enpass2onepassword.export_index import IndexBuilder, export_stamp, read_index
+from enpass2onepassword.streaming import load_enpass_stream
+
+
+def write_export(path, count, bom=False, **changes):
+    export = synthetic_export(count, hidden_share=0.2)
+    export["items"][1]["title"] = "Schlüssel 🔑"
+    export["items"][2].update(changes)
+    text = json.dumps(export, ensure_ascii=False, indent=1)
+    path.write_bytes((codecs.BOM_UTF8 if bom else b"") + text.encode())
+    return export
+
+
+def item_at(data, entry):
+    start, end = entry.offset, entry.offset + entry.length
+    return json.loads(data[start:end])
+
+
+async def run(server, ep_path, index_path, **options):
+    with open(ep_path, "rb") as ep_file:
+        await migrate_to(server, ep_file, index_path=index_path, **options)
+
+
+@pytest.mark.parametrize("bom", [False, True])
+async def test_offsets(tmp_path, bom):
+    ep_path = tmp_path / "export.json"
+    index_path = tmp_path / "export.json.index"
+    export = write_export(ep_path, 20, bom)
+
+    with open(ep_path, "rb") as ep_file:
+        stamp = export_stamp(ep_file)
+        _, ep_items = await load_enpass_stream(
+            ep_file, 7, index=IndexBuilder(index_path, stamp)
+        )
+        await stream.list(ep_items)
+
+    index = read_index(index_path, stamp)
+    data = ep_path.read_bytes()
+    assert index.folders == export["folders"]
+    assert [item_at(data, entry) for entry in index.entries] == export["items"]
+    assert [entry.hidden for entry in index.entries] == [
+        ep_item["trashed"] != 0 or ep_item["archived"] != 0
+        for ep_item in export["items"]
+    ]
+
+
+async def test_resume_from_index(tmp_path, monkeypatch):
+    ep_path = tmp_path / "export.json"
+    index_path = tmp_path / "export.json.index"
+    export = write_export(ep_path, 30)
+    visible = [
+        ep_item["title"]
+        for ep_item in export["items"]
+        if ep_item["trashed"] == 0 and ep_item["archived"] == 0
+    ]
+    server = MockOnePassword()
+
+    await run(server, ep_path, index_path, skip=20)
+    assert index_path.exists()
+
+    # the export is no longer parsed from the beginning
+    monkeypatch.setattr(migration, "load_enpass_stream", None)
+    await run(server, ep_path, index_path, skip=10, ignore_non_empty=True)
+
+    titles = [op_item.title for op_item in server.created()]
+    skipped_10 = [ep_item["title"] for ep_item in export["items"][10:]]
+    skipped_20 = [ep_item["title"] for ep_item in export["items"][20:]]
+    assert titles == [t for t in skipped_20 + skipped_10 if t in visible]
+
+
+async def test_index_of_changed_export(tmp_path, capsys):
+    ep_path = tmp_path / "export.json"
+    index_path = tmp_path / "export.json.index"
+    write_export(ep_path, 5)
+    await run(MockOnePassword(), ep_path, index_path)
+
+    write_export(ep_path, 6, title="Changed")
+    server = MockOnePassword()
+    await run(server, ep_path, index_path)
+
+    assert "belongs to another version" in capsys.readouterr().err
+    assert "Changed" in [op_item.title for op_item in server.created()]
+    with open(ep_path, "rb") as ep_file:
+        assert len(read_index(index_path, export_stamp(ep_file)).entries) == 6
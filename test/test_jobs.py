@@ -0,0 +1,140 @@
+import io
+import json
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+
+from enpass2onepassword.metrics import Metrics
+from enpass2onepassword.migration import Job, migrate_jobs
+from enpass2onepassword.ratelimit import WriteLimiter
+
+
+def export_file(count, seed):
+    return io.BytesIO(json.dumps(synthetic_export(count, seed)).encode())
+
+
+async def run(server, jobs, limiter=None, **options):
+    options.setdefault("no_confirm", True)
+    options.setdefault("silent", True)
+    await migrate_jobs(
+        jobs,
+        "test",
+        "token",
+        True,
+        1000,
+        1000,
+        3600,
+        client_factory=server.authenticate,
+        limiter=limiter,
+        ignore_non_empty=False,
+        skip=0,
+        **options,
+    )
+
+
+async def test_jobs_share_one_client_and_limiter(tmp_path):
+    server = MockOnePassword(vaults=("Private", "Work", "Family"), rate_limit=1000)
+    limiter = WriteLimiter(1000, 1000, "token")
+    jobs = [
+        Job(export_file(12, 1), "Private", tmp_path / "private.journal"),
+        Job(export_file(8, 2), "Work", tmp_path / "work.journal"),
+        Job(export_file(5, 3), "Family"),
+    ]
+
+    await run(server, jobs, limiter)
+
+    assert [len(server.created(vault)) for vault in ("Private", "Work", "Family")] == [
+        12,
+        8,
+        5,
+    ]
+    assert server.authentications == 1
+    assert len(server.writes["token"]) == 25
+    assert len((tmp_path / "work.journal").read_text().splitlines()) == 8
+
+
+async def test_jobs_take_turns():
+    server = MockOnePassword(vaults=("Private", "Work"))
+    created = []
+    create = server.authenticate
+
+    async def authenticate(**kwargs):
+        client = await create(**kwargs)
+        original = client.items.create
+
+        async def recording_create(params):
+            created.append(server.vaults[params.vault_id])
+            return await original(params)
+
+        client.items.create = recording_create
+        return client
+
+    server.authenticate = authenticate
+    jobs = [Job(export_file(20, 1), "Private"), Job(export_file(20, 2), "Work")]
+
+    await run(server, jobs)
+
+    # neither export has to wait until the other one is done
+    assert len(created) == 40
+    assert 8 <= created[:20].count("Work") <= 12
+
+
+async def test_jobs_are_confirmed_together(monkeypatch, capsys):
+    server = MockOnePassword(vaults=("Private", "Work"))
+    confirmations = []
+
+    def getchar():
+        # nothing has been created before the confirmation
+        confirmations.append(len(server.created("Private") + server.created("Work")))
+        return "y"
+
+    monkeypatch.setattr(click, "getchar", getchar)
+    metrics = Metrics()
+    jobs = [Job(export_file(6, 1), "Private"), Job(export_file(4, 2), "Work")]
+
+    await run(server, jobs, metrics=metrics, no_confirm=False, silent=False)
+
+    assert confirmations == [0]
+    out = capsys.readouterr().out
+    assert "2 Enpass exports are migrated at the same time" in out
+    assert "into the vault 'Work': 4 1Password entries are created" in out
+    assert "Enpass entries have been analyzed" not in out
+    assert len(server.created("Private")) == 6
+    assert metrics.items_created == 10
+    assert set(metrics.phases) >= {"upload"}
+
+
+async def test_declined_jobs_create_nothing(monkeypatch):
+    server = MockOnePassword(vaults=("Private", "Work"))
+    monkeypatch.setattr(click, "getchar", lambda: "n")
+    metrics = Metrics()
+    jobs = [Job(export_file(6, 1), "Private"), Job(export_file(4, 2), "Work")]
+
+    with pytest.raises(click.Abort):
+        await run(server, jobs, metrics=metrics, no_confirm=False)
+
+    assert server.created("Private") + server.created("Work") == []
+    # the upload is only timed once it starts
+    assert "upload" not in metrics.phases
+
+
+def test_overlapping_phases_are_timed_once():
+    metrics = Metrics()
+    recorded = []
+    metrics.record_phase = lambda name, seconds: recorded.append(name)
+
+    with metrics.phase("upload"):
+        with metrics.phase("upload"):
+            pass
+    with metrics.phase("upload"):
+        pass
+
+    assert recorded == ["upload", "upload"]
+
+
+def test_shards_are_shared():
+    limiter = WriteLimiter(100, 1000, "token")
+
+    assert limiter.shard("other") is limiter.shard("other")
@@ -0,0 +1,62 @@
+from test.helper_ep import enpass
+from types import SimpleNamespace
+
+from enpass2onepassword.journal import Journal, read_journal, write_atomically
+from enpass2onepassword.migration import map_entries
+
+
+def test_missing_journal(tmp_path):
+    assert read_journal(tmp_path / "export.json.journal") == {}
+
+
+def test_record(tmp_path):
+    journal_path = tmp_path / "export.json.journal"
+
+    with Journal(journal_path) as journal:
+        journal.record("a", SimpleNamespace(id="op-a", vault_id="vault"))
+    with Journal(journal_path) as journal:
+        journal.record("b", SimpleNamespace(id="op-b", vault_id="vault"))
+
+    assert read_journal(journal_path) == {"a": "op-a", "b": "op-b"}
+
+
+def test_interrupted_record(tmp_path):
+    journal_path = tmp_path / "export.json.journal"
+
+    with Journal(journal_path) as journal:
+        journal.record("a", SimpleNamespace(id="op-a", vault_id="vault"))
+    with open(journal_path, mode="a", encoding="utf-8") as journal_file:
+        journal_file.write('{"uuid": "b", "i')
+
+    assert read_journal(journal_path) == {"a": "op-a"}
+
+
+def test_records_of_other_vaults(tmp_path):
+    journal_path = tmp_path / "export.json.journal"
+
+    with Journal(journal_path) as journal:
+        journal.record("a", SimpleNamespace(id="op-a", vault_id="private"))
+        journal.record("b", SimpleNamespace(id="op-b", vault_id="work"))
+
+    assert read_journal(journal_path, ["work"]) == {"b": "op-b"}
+    assert read_journal(journal_path) == {"a": "op-a", "b": "op-b"}
+
+
+def test_write_atomically(tmp_path):
+    path = tmp_path / "export.json.manifest"
+    path.write_text("old\n")
+
+    write_atomically(path, "new\n")
+
+    assert path.read_text() == "new\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["export.json.manifest"]
+
+
+async def test_entries_keep_export_position():
+    ep_folders, ep_items = await enpass("test_note.json")
+
+    entries = await map_entries(ep_folders, enumerate(ep_items), "test")
+
+    assert len(entries) == 1
+    assert entries[0].number == 2
+    assert entries[0].ep_uuid == ep_items[2]["uuid"]
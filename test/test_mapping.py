@@ -0,0 +1,109 @@
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+from onepassword import AutofillBehavior, ItemCategory, ItemFieldType
+
+from enpass2onepassword.migration import map_entries, map_items
+
+
+def field(uid, order, field_type, label, value, sensitive=0, deleted=0):
+    return {
+        "deleted": deleted,
+        "label": label,
+        "order": order,
+        "sensitive": sensitive,
+        "type": field_type,
+        "uid": uid,
+        "value": value,
+    }
+
+
+def login(*fields, category="login"):
+    return {
+        "auto_submit": 1,
+        "category": category,
+        "title": "Example",
+        "uuid": "e0b0e7a8-0000-0000-0000-000000000000",
+        "fields": list(fields),
+    }
+
+
+async def test_fields_in_enpass_order():
+    ep_item = login(
+        field(14, 4, "text", "Note", "in the section"),
+        field(13, 3, "section", "Details", "Details"),
+        field(12, 2, "password", "Password", "secret", sensitive=1),
+        field(11, 1, "username", "Username", "user"),
+        field(15, 5, "text", "Deleted", "gone", deleted=1),
+        field(16, 6, "text", "Empty", ""),
+    )
+
+    (item,) = await map_items([], [ep_item], "test")
+
+    assert [f.id for f in item.fields] == ["username", "password", "14"]
+    assert item.fields[1].field_type == ItemFieldType.CONCEALED
+    assert item.fields[2].title == "note"
+    assert item.fields[2].section_id == "13"
+    assert [s.id for s in item.sections] == ["", "13"]
+
+
+async def test_pin_and_email_stand_in_for_password_and_username():
+    ep_item = login(
+        field(11, 1, "email", "E-mail", "user@example.com"),
+        field(12, 2, "pin", "PIN", "1234", sensitive=1),
+        category="uncategorized",
+    )
+
+    (item,) = await map_items([], [ep_item], "test")
+
+    assert item.category == ItemCategory.LOGIN
+    assert [(f.id, f.section_id) for f in item.fields] == [
+        ("username", None),
+        ("password", None),
+    ]
+
+
+async def test_websites_list_urls_before_apps():
+    ep_item = login(
+        field(11, 1, ".Android#", "App", "android://app"),
+        field(12, 2, "url", "Website", "https://example.com"),
+        field(13, 3, "url", "Old website", "https://old.example.com", deleted=1),
+    )
+
+    (item,) = await map_items([], [ep_item], "test")
+
+    assert [(w.url, w.autofill_behavior) for w in item.websites] == [
+        ("https://example.com", AutofillBehavior.ANYWHEREONWEBSITE),
+        ("https://old.example.com", AutofillBehavior.ANYWHEREONWEBSITE),
+        ("android://app", AutofillBehavior.ANYWHEREONWEBSITE),
+    ]
+    assert [f.title for f in item.fields] == ["website"]
+
+
+async def test_map_workers_keep_the_order():
+    export = synthetic_export(600, seed=1, hidden_share=0.1)
+
+    serial = await map_entries(export["folders"], enumerate(export["items"]), "test")
+    parallel = await map_entries(
+        export["folders"], enumerate(export["items"]), "test", map_workers=2
+    )
+
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("map_workers", [1, 2])
+async def test_mapping_errors_are_reported_together(capsys, map_workers):
+    ep_items = [
+        login(field(11, 1, "username", "Username", "user")),
+        login(category="spaceship"),
+        login(field(11, 1, "hologram", "Hologram", "3D")),
+    ]
+
+    with pytest.raises(click.Abort):
+        await map_items([], ep_items, "test", map_workers)
+
+    errors = capsys.readouterr().err
+    assert "Unexpected category 'spaceship'" in errors
+    assert "Unexpected field type 'hologram'" in errors
+    assert "2 Enpass entries could not be mapped" in errors
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+
+from enpass2onepassword import retry
+from enpass2onepassword.metrics import Histogram, Metrics, exporting
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in [0.05, 0.2, 0.3, 0.4, 20.0]:
+        histogram.observe(value)
+
+    report = histogram.report()
+    assert report["count"] == 5
+    assert report["buckets"] == {"0.1": 1, "1.0": 4, "10.0": 4}
+    assert report["p50"] == 1.0
+    assert report["p99"] == 20.0
+    assert report["max"] == 20.0
+
+
+def test_prometheus():
+    metrics = Metrics()
+    metrics.record_phase("map", 1.5)
+    metrics.create_latency.observe(0.2)
+    metrics.retries[retry.THROTTLED] += 2
+
+    lines = metrics.prometheus().splitlines()
+
+    assert 'enpass2onepassword_phase_seconds{phase="map"} 1.5' in lines
+    assert 'enpass2onepassword_retries_total{kind="throttled"} 2' in lines
+    assert 'enpass2onepassword_create_seconds_bucket{le="0.25"} 1' in lines
+    assert 'enpass2onepassword_create_seconds_bucket{le="+Inf"} 1' in lines
+    assert "# TYPE enpass2onepassword_create_seconds histogram" in lines
+
+
+async def test_migration_metrics(monkeypatch):
+    monkeypatch.setattr(retry, "backoff", lambda attempt, hint: 0.001)
+    server = MockOnePassword(error_rate=0.3, seed=1)
+    metrics = Metrics()
+
+    await migrate_to(
+        server,
+        synthetic_export(10),
+        max_retries=10,
+        metrics=metrics,
+    )
+
+    report = metrics.report()
+    assert set(report["phases_s"]) == {"auth", "load", "vaults", "map", "upload"}
+    assert report["items_created"] == 10
+    assert report["retries"][retry.TRANSIENT] > 0
+    assert (
+        report["create_latency_s"]["count"] == 10 + report["retries"][retry.TRANSIENT]
+    )
+    assert report["limiter_wait_s"]["count"] == report["create_latency_s"]["count"]
+    assert report["items_per_s"] > 0
+
+
+async def test_report_when_aborted(tmp_path):
+    json_path = tmp_path / "metrics.json"
+    prometheus_path = tmp_path / "metrics.prom"
+
+    with pytest.raises(click.Abort):
+        async with exporting(Metrics(), json_path, prometheus_path) as metrics:
+            metrics.items_created = 3
+            raise click.Abort()
+
+    report = json.loads(json_path.read_text())
+    assert report["outcome"] == "aborted"
+    assert report["items_created"] == 3
+    assert "enpass2onepassword_items_created_total 3" in prometheus_path.read_text()
+
+
+async def test_prometheus_updated_periodically(tmp_path):
+    prometheus_path = tmp_path / "metrics.prom"
+
+    async with exporting(Metrics(), prometheus_path=prometheus_path, interval_s=0.01):
+        await asyncio.sleep(0.05)
+        assert prometheus_path.exists()
+
+    assert not (tmp_path / "metrics.prom.tmp").exists()
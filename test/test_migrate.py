@@ -0,0 +1,182 @@
+import io
+import json
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+
+from enpass2onepassword import retry
+from enpass2onepassword.journal import read_journal
+from enpass2onepassword.ratelimit import WriteLimiter
+
+
+def export(count):
+    return io.BytesIO(json.dumps(synthetic_export(count)).encode())
+
+
+async def test_migrate():
+    server = MockOnePassword()
+
+    await migrate_to(server, export(12), concurrency=4)
+
+    titles = [op_item.title for op_item in server.created()]
+    assert sorted(titles) == sorted(
+        ep_item["title"] for ep_item in synthetic_export(12)["items"]
+    )
+    assert server.authentications == 1
+
+
+async def test_unknown_vault():
+    server = MockOnePassword()
+
+    with pytest.raises(click.Abort):
+        await migrate_to(server, export(1), op_vault="Unknown")
+
+
+async def test_non_empty_vault():
+    server = MockOnePassword()
+    await migrate_to(server, export(1))
+
+    with pytest.raises(click.Abort):
+        await migrate_to(server, export(1))
+
+    await migrate_to(server, export(1), ignore_non_empty=True)
+    assert len(server.created()) == 2
+
+
+async def test_skip_existing():
+    server = MockOnePassword()
+    await migrate_to(server, export(5))
+
+    await migrate_to(server, export(8), skip_existing=True)
+
+    assert len(server.created()) == 8
+
+
+async def test_resume(tmp_path):
+    journal_path = tmp_path / "export.json.journal"
+    server = MockOnePassword(rate_limit=3)
+
+    with pytest.raises(click.Abort):
+        await migrate_to(server, export(5), journal_path=journal_path)
+    assert len(read_journal(journal_path)) == 3
+
+    server.rate_limit = None
+    await migrate_to(server, export(5), journal_path=journal_path, resume=True)
+
+    assert len(server.created()) == 5
+    assert len(read_journal(journal_path)) == 5
+
+
+async def test_resume_into_another_vault(tmp_path):
+    journal_path = tmp_path / "export.json.journal"
+    server = MockOnePassword(vaults=("Enpass", "Other"))
+    await migrate_to(server, export(5), journal_path=journal_path)
+
+    await migrate_to(server, export(5), "Other", journal_path=journal_path, resume=True)
+
+    # the journal of the first vault does not count for the other one
+    assert len(server.created("Other")) == 5
+
+
+async def test_retry_transient_errors(monkeypatch):
+    monkeypatch.setattr(retry, "backoff", lambda attempt, hint: 0.001)
+    server = MockOnePassword(error_rate=0.3, seed=1)
+
+    await migrate_to(server, export(10), max_retries=10)
+
+    assert len(server.created()) == 10
+
+
+async def test_reauthenticate_expired_session():
+    server = MockOnePassword(latency_s=0.01, session_validity_s=0.05)
+
+    await migrate_to(server, export(10), op_client_validity_s=0.04)
+
+    assert len(server.created()) == 10
+    assert server.authentications > 2
+
+
+async def test_retry_after_the_session_expired_early():
+    # the server ends the sessions long before the client expects it
+    server = MockOnePassword(latency_s=0.01, session_validity_s=0.05)
+
+    await migrate_to(server, export(10))
+
+    assert len(server.created()) == 10
+    assert server.authentications > 1
+
+
+async def test_streaming():
+    server = MockOnePassword()
+    ep_file = export(1000)
+    read_at_first_write = []
+
+    async def request(session_created, write=False):
+        if write and not read_at_first_write:
+            read_at_first_write.append(ep_file.tell())
+        await MockOnePassword.request(server, session_created, write)
+
+    server.request = request
+
+    await migrate_to(server, ep_file, streaming=True, concurrency=4, skip=10)
+
+    assert len(server.created()) == 990
+    assert read_at_first_write[0] < len(ep_file.getvalue())
+
+
+async def test_streaming_skip_existing():
+    server = MockOnePassword()
+    await migrate_to(server, export(5), streaming=True)
+
+    await migrate_to(server, export(8), streaming=True, skip_existing=True)
+
+    assert [item.title for item in server.created()] == [
+        item["title"] for item in synthetic_export(8)["items"]
+    ]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_additional_tokens(streaming):
+    server = MockOnePassword(rate_limit=5)
+
+    await migrate_to(
+        server,
+        export(15),
+        concurrency=2,
+        streaming=streaming,
+        additional_op_sa_tokens=("token2", "token3"),
+        limiter=WriteLimiter(5, 1000, "token"),
+    )
+
+    assert len(server.created()) == 15
+    assert {token: len(writes) for token, writes in server.writes.items()} == {
+        "token": 5,
+        "token2": 5,
+        "token3": 5,
+    }
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_vault_map(streaming):
+    server = MockOnePassword(vaults=("Enpass", "Work"))
+    ep_export = synthetic_export(40)
+    work_folder = ep_export["folders"][1]
+
+    await migrate_to(
+        server,
+        io.BytesIO(json.dumps(ep_export).encode()),
+        streaming=streaming,
+        vault_map={work_folder["title"]: "Work"},
+    )
+
+    work_titles = [
+        ep_item["title"]
+        for ep_item in ep_export["items"]
+        if work_folder["uuid"] in ep_item.get("folders", [])
+    ]
+    assert work_titles
+    assert [op_item.title for op_item in server.created("Work")] == work_titles
+    assert len(server.created("Enpass")) == 40 - len(work_titles)
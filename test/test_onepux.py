@@ -0,0 +1,150 @@
+import base64
+import io
+import json
+import zipfile
+from test.synthetic import synthetic_export
+
+import pytest
+from click.testing import CliRunner
+
+from enpass2onepassword.__main__ import main
+from enpass2onepassword.onepux import OnePuxWriter, export_1pux
+
+CONTENT = bytes(range(256)) * 40
+
+
+def read_1pux(path):
+    with zipfile.ZipFile(path) as archive:
+        attributes = json.loads(archive.read("export.attributes"))
+        data = json.loads(archive.read("export.data"))
+        files = {
+            name: archive.read(name)
+            for name in archive.namelist()
+            if name.startswith("files/")
+        }
+    return attributes, data["accounts"][0]["vaults"], files
+
+
+async def run(export, path, **kwargs):
+    await export_1pux(
+        io.BytesIO(json.dumps(export).encode()),
+        str(path),
+        "Enpass",
+        True,
+        **kwargs,
+    )
+
+
+async def test_export_items(tmp_path):
+    export = synthetic_export(30, hidden_share=0.2)
+    path = tmp_path / "export.1pux"
+
+    await run(export, path)
+
+    attributes, vaults, files = read_1pux(path)
+    assert attributes["version"] == 3
+    assert [vault["attrs"]["name"] for vault in vaults] == ["Enpass"]
+    assert files == {}
+    assert not (tmp_path / "export.1pux.tmp").exists()
+
+    visible = [
+        ep_item
+        for ep_item in export["items"]
+        if ep_item["trashed"] == 0 and ep_item["archived"] == 0
+    ]
+    items = vaults[0]["items"]
+    assert [item["overview"]["title"] for item in items] == [
+        ep_item["title"] for ep_item in visible
+    ]
+    assert len({item["uuid"] for item in items}) == len(items)
+
+    login = next(item for item in items if item["categoryUuid"] == "001")
+    assert {field["designation"] for field in login["details"]["loginFields"]} == {
+        "username",
+        "password",
+    }
+    assert login["overview"]["subtitle"] == next(
+        field["value"]
+        for field in login["details"]["loginFields"]
+        if field["designation"] == "username"
+    )
+
+
+async def test_export_attachments(tmp_path):
+    export = synthetic_export(3)
+    export["items"][1]["attachments"] = [
+        {"data": base64.b64encode(CONTENT).decode(), "name": "big.bin", "order": 2},
+        {"data": base64.b64encode(b"small").decode(), "name": "small.txt", "order": 1},
+    ]
+    path = tmp_path / "export.1pux"
+
+    await run(export, path)
+
+    _, vaults, files = read_1pux(path)
+    item = next(
+        item
+        for item in vaults[0]["items"]
+        if item["overview"]["title"] == export["items"][1]["title"]
+    )
+    section = next(
+        section
+        for section in item["details"]["sections"]
+        if section["name"] == "attachments"
+    )
+    documents = [field["value"]["file"] for field in section["fields"]]
+    assert [document["fileName"] for document in documents] == ["small.txt", "big.bin"]
+    assert [document["decryptedSize"] for document in documents] == [5, len(CONTENT)]
+    assert [
+        files[f"files/{document['documentId']}__{document['fileName']}"]
+        for document in documents
+    ] == [b"small", CONTENT]
+
+
+async def test_export_with_vault_map_and_skip(tmp_path):
+    export = synthetic_export(40)
+    work = export["folders"][0]
+    path = tmp_path / "export.1pux"
+
+    await run(export, path, skip=10, vault_map={work["title"]: "Work"})
+
+    _, vaults, _ = read_1pux(path)
+    assert [vault["attrs"]["name"] for vault in vaults] == ["Enpass", "Work"]
+    work_titles = [
+        ep_item["title"]
+        for ep_item in export["items"][10:]
+        if work["uuid"] in ep_item.get("folders", [])
+    ]
+    assert work_titles
+    assert [item["overview"]["title"] for item in vaults[1]["items"]] == work_titles
+    assert len(vaults[0]["items"]) + len(work_titles) == 30
+
+
+def test_failed_export_closes_the_vault_files(tmp_path):
+    onepux_path = tmp_path / "export.1pux"
+
+    with pytest.raises(ValueError):
+        with OnePuxWriter(str(onepux_path), str(tmp_path)) as writer:
+            vault_file, _ = writer.vault("Enpass")
+            raise ValueError("the export failed")
+
+    assert vault_file.closed
+    assert not onepux_path.exists()
+    assert not (tmp_path / "export.1pux.tmp").exists()
+
+
+def test_cli_does_not_ask_for_the_service_account(tmp_path):
+    ep_path = tmp_path / "export.json"
+    ep_path.write_text(json.dumps(synthetic_export(5)))
+    path = tmp_path / "export.1pux"
+
+    result = CliRunner().invoke(
+        main,
+        ["--1pux", str(path), "--vault", "Private", "--silent", str(ep_path)],
+        env={"OP_SERVICE_ACCOUNT_TOKEN": None, "OP_SERVICE_ACCOUNT_NAME": None},
+        input="",
+    )
+
+    assert result.exit_code == 0, result.output
+    _, vaults, _ = read_1pux(path)
+    assert [vault["attrs"]["name"] for vault in vaults] == ["Private"]
+    assert len(vaults[0]["items"]) == 5
@@ -0,0 +1,88 @@
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+from onepassword import ItemCategory
+
+from enpass2onepassword.migration import category_map
+from enpass2onepassword.priority import CATEGORIES, Priority, parse_priority
+
+
+def test_parse_priority():
+    assert parse_priority("favorite") == Priority("favorite")
+    assert parse_priority("category:login") == Priority("category", "LOGIN")
+    assert parse_priority("folder:Work: Shared") == Priority("folder", "Work: Shared")
+    assert str(parse_priority("category:login")) == "category:LOGIN"
+
+    for spec in ["", "favorite:yes", "category:spaceship", "folder:", "tag:x"]:
+        with pytest.raises(click.BadParameter):
+            parse_priority(spec)
+
+
+def test_categories_of_the_mapping():
+    assert set(CATEGORIES) == {category.name for category in category_map.values()}
+
+
+async def test_migrate_by_priority():
+    export = synthetic_export(60)
+    folder = export["folders"][0]
+    server = MockOnePassword()
+
+    await migrate_to(
+        server,
+        export,
+        priorities=(Priority("folder", folder["title"]), Priority("category", "LOGIN")),
+    )
+
+    ranks = [
+        (
+            0
+            if folder["title"] in (item.tags or ())
+            else 1 if item.category == ItemCategory.LOGIN else 2
+        )
+        for item in server.created()
+    ]
+    assert ranks == sorted(ranks)
+    assert ranks[0] == 0 and ranks[-1] == 2
+
+
+async def test_priorities_across_vaults():
+    export = synthetic_export(60)
+    first_folder, work_folder = export["folders"][:2]
+    first_titles = {
+        ep_item["title"]
+        for ep_item in export["items"]
+        if first_folder["uuid"] in ep_item.get("folders", [])
+    }
+    server = MockOnePassword(vaults=("Enpass", "Work"), latency_s=0.001)
+    titles = []
+    authenticate = server.authenticate
+
+    async def recording_authenticate(**kwargs):
+        client = await authenticate(**kwargs)
+        create = client.items.create
+
+        async def recording_create(params):
+            titles.append(params.title)
+            return await create(params)
+
+        client.items.create = recording_create
+        return client
+
+    server.authenticate = recording_authenticate
+
+    await migrate_to(
+        server,
+        export,
+        concurrency=2,
+        vault_map={work_folder["title"]: "Work"},
+        priorities=(Priority("folder", first_folder["title"]),),
+    )
+
+    # the entries of the Work vault wait for the prioritized entries of the other vault
+    ranks = [0 if title in first_titles else 1 for title in titles]
+    assert len(ranks) == 60
+    assert ranks == sorted(ranks)
+    assert 0 < len(first_titles) and server.created("Work")
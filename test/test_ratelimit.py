@@ -0,0 +1,139 @@
+import base64
+import json
+
+import click
+import pytest
+from pyrate_limiter import LimiterDelayException
+
+from enpass2onepassword.ratelimit import (
+    WriteLimiter,
+    estimate_s,
+    format_duration,
+    state_keys,
+)
+
+
+def token(email, sign_in_address):
+    claims = {"email": email, "signInAddress": sign_in_address}
+    return "ops_" + base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+
+
+def test_state_keys():
+    sa_key, account_key = state_keys(token("sa1@example.com", "team.example.com"))
+    other_sa_key, other_account_key = state_keys(
+        token("sa2@example.com", "team.example.com")
+    )
+
+    assert sa_key != other_sa_key
+    assert account_key == other_account_key
+
+
+def test_state_keys_of_opaque_token():
+    sa_key, account_key = state_keys("not-a-service-account-token")
+
+    assert sa_key == account_key
+
+
+async def test_in_memory():
+    limiter = WriteLimiter(2, 10, "token", max_delay=0)
+    await limiter.acquire()
+    await limiter.acquire()
+
+    with pytest.raises(LimiterDelayException):
+        await limiter.acquire()
+
+    await WriteLimiter(2, 10, "token", max_delay=0).acquire()
+
+
+async def test_state_survives_restart(tmp_path):
+    state_path = str(tmp_path / "rate-limits.sqlite")
+
+    limiter = WriteLimiter(2, 10, "token", state_path, max_delay=0)
+    await limiter.acquire()
+    await limiter.acquire()
+
+    restarted_limiter = WriteLimiter(2, 10, "token", state_path, max_delay=0)
+    with pytest.raises(LimiterDelayException):
+        await restarted_limiter.acquire()
+
+    await WriteLimiter(2, 10, "other-token", state_path, max_delay=0).acquire()
+
+
+async def test_daily_rate_is_shared_by_the_account(tmp_path):
+    state_path = str(tmp_path / "rate-limits.sqlite")
+    sa1 = token("sa1@example.com", "team.example.com")
+    sa2 = token("sa2@example.com", "team.example.com")
+
+    await WriteLimiter(5, 2, sa1, state_path, max_delay=0).acquire()
+    await WriteLimiter(5, 2, sa2, state_path, max_delay=0).acquire()
+
+    with pytest.raises(LimiterDelayException):
+        await WriteLimiter(5, 2, sa2, state_path, max_delay=0).acquire()
+
+
+async def test_shards_share_the_daily_rate():
+    sa1 = token("sa1@example.com", "team.example.com")
+    sa2 = token("sa2@example.com", "team.example.com")
+    sa3 = token("sa3@example.com", "team.example.com")
+    limiter = WriteLimiter(1, 2, sa1, max_delay=0)
+    shard = limiter.shard(sa2)
+
+    assert limiter.try_reserve()
+    assert not limiter.try_reserve()
+    await limiter.acquire(hourly_reserved=True)
+    await shard.acquire()
+
+    with pytest.raises(LimiterDelayException):
+        await limiter.shard(sa3).acquire()
+
+
+def test_reserve_again_when_the_hourly_rate_frees_up():
+    limiter = WriteLimiter(1, 2, "token")
+
+    assert limiter.reserve_in_s() == 0
+    assert limiter.try_reserve()
+    assert not limiter.try_reserve()
+    assert limiter.reserve_in_s() == pytest.approx(3600, abs=1)
+
+    limiter.slow_down(7200)
+    assert limiter.reserve_in_s() == pytest.approx(7200, abs=1)
+
+
+def test_shards_belong_to_the_same_account():
+    limiter = WriteLimiter(1, 2, token("sa1@example.com", "team.example.com"))
+
+    with pytest.raises(click.Abort):
+        limiter.shard(token("sa2@example.com", "other.example.com"))
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+async def test_estimate(tmp_path, persistent):
+    state_path = str(tmp_path / "rate-limits.sqlite") if persistent else None
+    limiter = WriteLimiter(3, 5, "token", state_path)
+
+    assert estimate_s([limiter], 3) == 0
+    assert estimate_s([limiter], 4) == pytest.approx(3600, abs=1)
+
+    await limiter.acquire()
+    await limiter.acquire()
+
+    assert estimate_s([limiter], 1) == 0
+    # the third write after those two waits for the first of them to leave the hour
+    assert estimate_s([limiter], 2) == pytest.approx(3600, abs=1)
+    # the daily rate only has room for three more writes today
+    assert estimate_s([limiter], 4) == pytest.approx(86400, abs=1)
+
+
+def test_estimate_of_shards():
+    limiter = WriteLimiter(2, 100, token("sa1@example.com", "team.example.com"))
+    shards = [limiter, limiter.shard(token("sa2@example.com", "team.example.com"))]
+
+    assert estimate_s(shards, 4) == 0
+    assert estimate_s(shards, 5) == pytest.approx(3600, abs=1)
+
+
+def test_format_duration():
+    assert format_duration(12.5) == "12s"
+    assert format_duration(125) == "2m 5s"
+    assert format_duration(3 * 3600 + 120) == "3h 2m"
+    assert format_duration(86400 + 3600) == "1d 1h"
@@ -0,0 +1,141 @@
+import time
+
+import pytest
+from onepassword.errors import RateLimitExceededException
+from pyrate_limiter import (
+    BucketFullException,
+    Duration,
+    LimiterDelayException,
+    Rate,
+    RateItem,
+)
+
+from enpass2onepassword.ratelimit import WriteLimiter
+from enpass2onepassword.retry import (
+    EXPIRED,
+    PERMANENT,
+    THROTTLED,
+    TRANSIENT,
+    backoff,
+    classify,
+    is_item_failure,
+    retry_hint,
+    with_retries,
+)
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (RateLimitExceededException("rate limit exceeded"), THROTTLED),
+        (Exception("HTTP 429 Too Many Requests"), THROTTLED),
+        (ConnectionResetError(), TRANSIENT),
+        (Exception("error sending request: operation timed out"), TRANSIENT),
+        (Exception("server responded with status 503"), TRANSIENT),
+        (Exception("session expired, authenticate again"), EXPIRED),
+        (Exception("unexpected http status: 401 Unauthorized"), EXPIRED),
+        (Exception("unexpected http status: 403 Forbidden"), PERMANENT),
+        (Exception("invalid item: title must not be empty"), PERMANENT),
+        # the names of items and fields are not taken for the reason
+        (Exception("invalid item 'Network connection timed out'"), PERMANENT),
+        (Exception("invalid field 'Rate limit exceeded' of 'VPN'"), PERMANENT),
+        (
+            LimiterDelayException(
+                RateItem("write", 0), Rate(3, Duration.DAY), 5000, 1000
+            ),
+            PERMANENT,
+        ),
+        (BucketFullException(RateItem("write", 0), Rate(3, Duration.DAY)), PERMANENT),
+    ],
+)
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+def test_is_item_failure():
+    assert is_item_failure(Exception("invalid field 'session token' of 'Server'"))
+    assert not is_item_failure(Exception("invalid service account token"))
+    assert not is_item_failure(Exception("unexpected http status: 403 Forbidden"))
+    assert not is_item_failure(TimeoutError())
+
+
+def test_retry_hint():
+    assert retry_hint(Exception("Too many requests, retry after 30 seconds")) == 30
+    assert retry_hint(Exception("Retry-After: 1500ms")) == 1.5
+    assert retry_hint(Exception("rate limit exceeded")) is None
+
+
+def test_backoff():
+    for attempt in range(10):
+        assert 0 <= backoff(attempt, base_delay_s=1, max_delay_s=8) <= 8
+    assert backoff(0, hint=60, base_delay_s=1) == 60
+
+
+class Operation:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "created"
+
+
+async def no_sleep(delay):
+    pass
+
+
+async def test_retry_until_success():
+    operation = Operation(RateLimitExceededException("slow down"), TimeoutError())
+    retries = []
+
+    async def on_retry(e, kind, delay):
+        retries.append(kind)
+
+    assert await with_retries(operation, 5, on_retry, sleep=no_sleep) == "created"
+    assert operation.calls == 3
+    assert retries == [THROTTLED, TRANSIENT]
+
+
+async def test_no_retry_of_permanent_errors():
+    operation = Operation(ValueError("invalid"))
+
+    with pytest.raises(ValueError):
+        await with_retries(operation, 5, sleep=no_sleep)
+    assert operation.calls == 1
+
+
+async def test_give_up_after_max_retries():
+    operation = Operation(*[TimeoutError()] * 3)
+
+    with pytest.raises(TimeoutError):
+        await with_retries(operation, 2, sleep=no_sleep)
+    assert operation.calls == 3
+
+
+async def test_renew_an_expired_session_once():
+    expired = Exception("session expired, authenticate again")
+    retries = []
+
+    async def on_retry(e, kind, delay):
+        retries.append((kind, delay))
+
+    assert await with_retries(Operation(expired), 0, on_retry, no_sleep) == "created"
+    assert retries == [(EXPIRED, 0.0)]
+
+    operation = Operation(expired, expired)
+    with pytest.raises(Exception, match="session expired"):
+        await with_retries(operation, 0, sleep=no_sleep)
+    assert operation.calls == 2
+
+
+async def test_slow_down():
+    limiter = WriteLimiter(10, 10, "token")
+    limiter.slow_down(0.05)
+
+    started = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - started >= 0.05
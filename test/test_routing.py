@@ -0,0 +1,43 @@
+import json
+
+import click
+import pytest
+
+from enpass2onepassword.routing import read_vault_map, route, route_folders
+
+ep_folders = [
+    {"uuid": "f-1", "title": "Work"},
+    {"uuid": "f-2", "title": "Family"},
+    {"uuid": "f-3", "title": "Misc"},
+]
+vault_ids = {"Enpass": "v-enpass", "Company": "v-company", "Shared": "v-shared"}
+
+
+def test_route_folders_by_title_or_uuid():
+    routes = route_folders(ep_folders, {"Work": "Company", "f-2": "Shared"}, vault_ids)
+
+    assert routes == {"f-1": "v-company", "f-2": "v-shared"}
+
+
+def test_route_folders_to_unknown_vault():
+    with pytest.raises(click.Abort):
+        route_folders(ep_folders, {"Work": "Unknown"}, vault_ids)
+
+
+def test_route():
+    routes = {"f-2": "v-shared"}
+
+    assert route({"folders": ["f-3", "f-2"]}, routes, "v-enpass") == "v-shared"
+    assert route({"folders": ["f-3"]}, routes, "v-enpass") == "v-enpass"
+    assert route({}, routes, "v-enpass") == "v-enpass"
+
+
+def test_read_vault_map(tmp_path):
+    path = tmp_path / "vaults.json"
+    path.write_text(json.dumps({"Work": "Company"}))
+
+    assert read_vault_map(path) == {"Work": "Company"}
+
+    path.write_text(json.dumps(["Work", "Company"]))
+    with pytest.raises(click.Abort):
+        read_vault_map(path)
@@ -0,0 +1,141 @@
+import asyncio
+from test.mock_client import MockOnePassword
+
+from enpass2onepassword.metrics import Histogram
+from enpass2onepassword.session import ClientHolder
+
+
+class Clock:
+    """A clock that only moves when the test advances it, and whose sleeps wait for that."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.moved = asyncio.Condition()
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        until = self.now + seconds
+        async with self.moved:
+            await self.moved.wait_for(lambda: self.now >= until)
+
+    async def advance(self, seconds):
+        async with self.moved:
+            self.now += seconds
+            self.moved.notify_all()
+
+
+class Authentications:
+    """Authenticates at the mock server and lets the test wait for every authentication."""
+
+    def __init__(self, server, clock):
+        self.server = server
+        self.clock = clock
+        self.done = asyncio.Queue()
+        self.release = None
+
+    async def __call__(self):
+        if self.release:
+            await self.release.wait()
+        client = await self.server.authenticate("token", "test", "v0")
+        self.done.put_nowait(client)
+        return client, self.clock.time()
+
+    async def next(self):
+        return await asyncio.wait_for(self.done.get(), 5)
+
+
+def holder(authentications, validity_s, latency=None):
+    clock = authentications.clock
+    return ClientHolder(authentications, validity_s, latency, clock.time, clock.sleep)
+
+
+async def test_refresh_ahead_of_expiry():
+    server = MockOnePassword()
+    authentications = Authentications(server, Clock())
+
+    async with holder(authentications, 60) as clients:
+        first = await clients.current()
+        await authentications.next()
+
+        await authentications.clock.advance(60)
+        await authentications.next()
+
+        # the background task has already replaced the expired client, so nothing waits here
+        second = await clients.current()
+
+    assert second is not first
+    assert server.authentications == 2
+
+
+async def test_in_flight_requests_keep_their_client():
+    server = MockOnePassword()
+    authentications = Authentications(server, Clock())
+
+    async with holder(authentications, 60) as clients:
+        client = await clients.current()
+        await authentications.next()
+        request = asyncio.create_task(client.vaults.list_all())
+
+        await authentications.clock.advance(60)
+        await authentications.next()
+
+        assert await clients.current() is not client
+        await request
+
+
+async def test_authenticate_when_refresh_fell_behind():
+    server = MockOnePassword()
+    authentications = Authentications(server, Clock())
+
+    async with holder(authentications, 60) as clients:
+        await clients.current()
+        clients.created -= 120
+
+        client = await clients.current()
+
+    assert server.authentications == 2
+    assert client is clients.client
+
+
+async def test_authenticate_in_the_background():
+    server = MockOnePassword()
+    authentications = Authentications(server, Clock())
+    authentications.release = asyncio.Event()
+
+    async with holder(authentications, 60) as clients:
+        # entering does not wait for the authentication, which has started nonetheless
+        assert server.authentications == 0
+        authentications.release.set()
+        await authentications.next()
+
+        await clients.current()
+
+    assert server.authentications == 1
+
+
+async def test_refresh_ahead_of_slow_requests():
+    latency = Histogram()
+    latency.observe(2.0)
+    clients = holder(Authentications(MockOnePassword(), Clock()), 60, latency)
+    clients.created = 1000.0
+    clients.authentication_s = 0.1
+
+    assert clients.refresh_at() == 1000.0 + 60 - 2.0
+
+    clients.validity_s = 2.0
+    assert clients.refresh_at() == 1000.0 + 2.0 - 1.0
+
+
+async def test_renew_once_after_expiry():
+    server = MockOnePassword()
+
+    async with holder(Authentications(server, Clock()), 60) as clients:
+        stale = await clients.current()
+
+        await asyncio.gather(clients.renew(stale), clients.renew(stale))
+
+        assert await clients.current() is not stale
+
+    assert server.authentications == 2
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+from benchmarks.benchmark import measure_startup
+
+
+def test_help_does_not_import_heavy_dependencies():
+    result = measure_startup()
+
+    assert result["heavy_modules"] == set()
+
+
+def test_usage_errors_do_not_import_heavy_dependencies(tmp_path):
+    ep_path = tmp_path / "export.json"
+    ep_path.write_text("{}")
+    script = f"""
+import sys
+from click.testing import CliRunner
+from enpass2onepassword.__main__ import main
+
+result = CliRunner().invoke(
+    main,
+    ["--sa", "test", "--token", "token", "--vault", "Enpass", "--archive-deleted", {str(ep_path)!r}],
+)
+print(result.exit_code, sorted(name for name in sys.modules if name.startswith("pyrate_limiter")))
+"""
+
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.split() == ["2", "[]"]
@@ -0,0 +1,67 @@
+import io
+import json
+from pathlib import Path
+from test.helper_ep import enpass
+
+import click
+import pytest
+from aiostream import stream
+
+from enpass2onepassword.streaming import load_enpass_stream
+
+
+def export_bytes(enpass_file):
+    return Path(__file__).parent.joinpath(enpass_file).read_bytes()
+
+
+@pytest.mark.parametrize("enpass_file", ["test_email.json", "test_note.json"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+async def test_same_as_json_load(enpass_file, chunk_size):
+    ep_folders, ep_items = await enpass(enpass_file)
+
+    streamed_folders, streamed_items = await load_enpass_stream(
+        io.BytesIO(export_bytes(enpass_file)), chunk_size
+    )
+
+    assert streamed_folders == ep_folders
+    assert await stream.list(streamed_items) == ep_items
+
+
+async def test_text_file():
+    ep_folders, ep_items = await enpass("test_note.json")
+
+    json_path = Path(__file__).parent.joinpath("test_note.json")
+    with open(json_path, mode="r", encoding="utf-8") as json_file:
+        streamed_folders, streamed_items = await load_enpass_stream(json_file)
+
+        assert streamed_folders == ep_folders
+        assert await stream.list(streamed_items) == ep_items
+
+
+async def test_items_before_folders():
+    export = {"items": [{"uuid": "a", "number": 12345}], "folders": [{"uuid": "f"}]}
+
+    ep_folders, ep_items = await load_enpass_stream(
+        io.BytesIO(json.dumps(export).encode()), 3
+    )
+
+    assert ep_folders == export["folders"]
+    assert await stream.list(ep_items) == export["items"]
+
+
+async def test_items_are_read_lazily():
+    export = b'{"folders": [], "items": [{"uuid": "a"}, {"uuid": "b"}, broken'
+
+    ep_folders, ep_items = await load_enpass_stream(io.BytesIO(export), 4)
+    ep_items_iter = aiter(ep_items)
+
+    assert await anext(ep_items_iter) == {"uuid": "a"}
+    assert await anext(ep_items_iter) == {"uuid": "b"}
+    with pytest.raises(click.Abort):
+        await anext(ep_items_iter)
+
+
+@pytest.mark.parametrize("export", [b"", b"{}", b"[]", b'{"folders": [}'])
+async def test_invalid_export(export):
+    with pytest.raises(click.Abort):
+        await load_enpass_stream(io.BytesIO(export))
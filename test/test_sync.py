@@ -0,0 +1,141 @@
+import copy
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+import click
+import pytest
+
+from enpass2onepassword.journal import read_journal
+from enpass2onepassword.manifest import read_manifest
+
+
+async def sync(server, export, manifest_path, **options):
+    await migrate_to(server, export, manifest_path=manifest_path, **options)
+
+
+def writes(server):
+    return len(server.writes.get("token", ()))
+
+
+async def test_sync_only_writes_the_changes(tmp_path):
+    manifest_path = tmp_path / "sync.manifest"
+    export = synthetic_export(20)
+    server = MockOnePassword(rate_limit=1000)
+
+    await sync(server, export, manifest_path)
+    assert writes(server) == 20
+    first = read_manifest(manifest_path)
+    assert len(first) == 20
+
+    newer = copy.deepcopy(export)
+    newer["items"][0]["title"] = "Changed"
+    newer["items"][1]["trashed"] = 1
+    deleted = newer["items"].pop(2)
+    newer["items"].append(synthetic_export(21)["items"][20])
+    newer["items"][-1]["uuid"] = "new-uuid"
+
+    await sync(server, newer, manifest_path, archive_deleted=True)
+
+    # one update, two archives and one create
+    assert writes(server) == 20 + 4
+    titles = {op_item.title for op_item in server.created()}
+    assert "Changed" in titles
+    assert export["items"][0]["title"] not in titles
+    assert len(server.created()) == 20 - 2 + 1
+    assert set(server.archived) == {
+        first[export["items"][1]["uuid"]]["id"],
+        first[deleted["uuid"]]["id"],
+    }
+
+    second = read_manifest(manifest_path)
+    assert (
+        second[export["items"][0]["uuid"]]["id"]
+        == first[export["items"][0]["uuid"]]["id"]
+    )
+    assert deleted["uuid"] not in second
+    # compacted to one line per entry, and still readable as a journal
+    assert len(manifest_path.read_text().splitlines()) == len(second) == 19
+    assert read_journal(manifest_path) == {
+        ep_uuid: record["id"] for ep_uuid, record in second.items()
+    }
+
+    await sync(server, newer, manifest_path, archive_deleted=True)
+    assert writes(server) == 24
+
+
+async def test_sync_keeps_deleted_entries_by_default(tmp_path):
+    manifest_path = tmp_path / "sync.manifest"
+    export = synthetic_export(5)
+    server = MockOnePassword()
+    await sync(server, export, manifest_path)
+
+    export["items"].pop()
+    await sync(server, export, manifest_path)
+
+    assert len(server.created()) == 5
+    assert server.archived == {}
+    assert len(read_manifest(manifest_path)) == 5
+
+
+async def test_sync_with_skip_existing(tmp_path):
+    manifest_path = tmp_path / "sync.manifest"
+    export = synthetic_export(10)
+    server = MockOnePassword(rate_limit=1000)
+    await sync(server, export, manifest_path)
+
+    export["items"][0]["note"] = "Changed note"
+    await sync(server, export, manifest_path, archive_deleted=True, skip_existing=True)
+
+    # the synced entries exist in the vault, but they are neither deleted nor new
+    assert server.archived == {}
+    assert len(server.created()) == 10
+    assert writes(server) == 10 + 1
+    assert "Changed note" in [op_item.notes for op_item in server.created()]
+
+
+async def test_migrate_then_sync(tmp_path):
+    journal_path = tmp_path / "export.json.journal"
+    manifest_path = tmp_path / "sync.manifest"
+    export = synthetic_export(10)
+    server = MockOnePassword(rate_limit=1000)
+    await migrate_to(server, export, journal_path=journal_path)
+
+    await sync(server, export, manifest_path, journal_path=journal_path)
+
+    # the items of the journal are updated once, instead of being created again
+    assert len(server.created()) == 10
+    assert writes(server) == 10 + 10
+    assert read_manifest(manifest_path).keys() == read_journal(journal_path).keys()
+
+    await sync(server, export, manifest_path, journal_path=journal_path)
+    assert writes(server) == 20
+
+
+async def test_first_sync_into_a_migrated_vault_without_journal(tmp_path):
+    export = synthetic_export(10)
+    server = MockOnePassword()
+    await migrate_to(server, export)
+
+    with pytest.raises(click.Abort):
+        await sync(server, export, tmp_path / "sync.manifest")
+
+    assert len(server.created()) == 10
+
+
+async def test_first_sync_takes_existing_items_over(tmp_path):
+    manifest_path = tmp_path / "sync.manifest"
+    export = synthetic_export(10)
+    server = MockOnePassword(rate_limit=1000)
+    await migrate_to(server, export)
+
+    await sync(server, export, manifest_path, skip_existing=True)
+    assert len(server.created()) == 10
+    assert len(read_manifest(manifest_path)) == 10
+
+    export["items"][0]["note"] = "Changed note"
+    await sync(server, export, manifest_path)
+
+    assert len(server.created()) == 10
+    assert writes(server) == 10 + 1
+    assert "Changed note" in [op_item.notes for op_item in server.created()]
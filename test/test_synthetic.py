@@ -0,0 +1,47 @@
+import io
+import json
+from test.synthetic import synthetic_export, write_synthetic_export
+
+from enpass2onepassword.migration import category_map, field_type_map, map_items
+
+
+def test_covers_all_categories_and_field_types():
+    export = synthetic_export(100)
+
+    categories = {ep_item["category"] for ep_item in export["items"]}
+    field_types = {
+        field["type"]
+        for ep_item in export["items"]
+        for field in ep_item.get("fields", [])
+    }
+
+    assert categories == set(category_map)
+    assert field_types == set(field_type_map)
+
+
+def test_deterministic():
+    assert synthetic_export(20, seed=1) == synthetic_export(20, seed=1)
+    assert synthetic_export(20, seed=1) != synthetic_export(20, seed=2)
+
+
+def test_write():
+    ep_file = io.StringIO()
+    write_synthetic_export(ep_file, 50, hidden_share=0.2)
+
+    assert json.loads(ep_file.getvalue()) == synthetic_export(50, hidden_share=0.2)
+
+
+async def test_map():
+    export = synthetic_export(200, hidden_share=0.2)
+    visible = [
+        ep_item
+        for ep_item in export["items"]
+        if not ep_item["trashed"] and not ep_item["archived"]
+    ]
+
+    op_items = await map_items(export["folders"], export["items"], "test")
+
+    assert 0 < len(visible) < 200
+    assert [op_item.title for op_item in op_items] == [
+        ep_item["title"] for ep_item in visible
+    ]
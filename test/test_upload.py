@@ -0,0 +1,50 @@
+from test.helper_ep import enpass
+from test.mock_client import MockOnePassword
+
+from enpass2onepassword.migration import map_entries, upload_to_onepassword
+
+
+async def upload(server, entries, concurrency):
+    await upload_to_onepassword(
+        True,
+        "test",
+        "token",
+        1000,
+        1000,
+        3600,
+        True,
+        0,
+        len(entries),
+        entries,
+        concurrency,
+        client_factory=server.authenticate,
+    )
+
+
+async def entries(server, count):
+    ep_folders, ep_items = await enpass("test_email.json")
+    return await map_entries(
+        ep_folders, enumerate(ep_items * count), server.vault_id("Enpass")
+    )
+
+
+async def test_upload_sequential():
+    server = MockOnePassword(latency_s=0.01)
+    ep_entries = await entries(server, 5)
+
+    await upload(server, ep_entries, 1)
+
+    assert [op_item.title for op_item in server.created()] == [
+        entry.op_item.title for entry in ep_entries
+    ]
+    assert server.max_in_flight == 1
+
+
+async def test_upload_concurrent():
+    server = MockOnePassword(latency_s=0.01)
+    ep_entries = await entries(server, 5)
+
+    await upload(server, ep_entries, 3)
+
+    assert len(server.created()) == len(ep_entries)
+    assert server.max_in_flight == 3
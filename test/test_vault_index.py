@@ -0,0 +1,83 @@
+from test.helper_ep import enpass
+from types import SimpleNamespace
+
+from onepassword import ItemField, ItemFieldType, Website
+from onepassword.iterator import SDKIterator
+
+from enpass2onepassword.migration import map_items
+from enpass2onepassword.vault_index import VaultIndex
+
+
+class Items:
+    def __init__(self, op_items):
+        self.op_items = {op_item.id: op_item for op_item in op_items}
+        self.fetched = []
+
+    async def get(self, vault_id, item_id):
+        self.fetched.append(item_id)
+        return self.op_items[item_id]
+
+
+def op_item(item_id, title, url, username):
+    return SimpleNamespace(
+        id=item_id,
+        title=title,
+        websites=[
+            Website(url=url, label="website", autofill_behavior="AnywhereOnWebsite")
+        ],
+        fields=[
+            ItemField(
+                id="username",
+                title="username",
+                field_type=ItemFieldType.TEXT,
+                value=username,
+            )
+        ],
+    )
+
+
+async def vault_index(*op_items):
+    items = Items(op_items)
+    index = VaultIndex(SimpleNamespace(items=items), "vault")
+    await index.add_all(SDKIterator(list(op_items)))
+    return index, items
+
+
+async def test_existing_item():
+    ep_folders, ep_items = await enpass("test_email.json")
+    (item,) = await map_items(ep_folders, ep_items, "vault")
+    url = item.websites[0].url
+    username = next(f.value for f in item.fields if f.id == "username")
+
+    index, items = await vault_index(
+        op_item("a", f"  {item.title.upper()} ", url + "/", username),
+        op_item("b", "Another Title", url, username),
+    )
+
+    assert len(index) == 2
+    assert await index.contains(item)
+    assert items.fetched == ["a"]
+
+
+async def test_other_username():
+    ep_folders, ep_items = await enpass("test_email.json")
+    (item,) = await map_items(ep_folders, ep_items, "vault")
+
+    index, items = await vault_index(
+        op_item("a", item.title, item.websites[0].url, "someone-else"),
+    )
+
+    assert not await index.contains(item)
+    assert not await index.contains(item)
+    assert items.fetched == ["a"]
+
+
+async def test_empty_vault():
+    ep_folders, ep_items = await enpass("test_email.json")
+    (item,) = await map_items(ep_folders, ep_items, "vault")
+
+    index, items = await vault_index()
+
+    assert len(index) == 0
+    assert not await index.contains(item)
+    assert items.fetched == []
@@ -0,0 +1,105 @@
+import base64
+import io
+import json
+from test.helper_ep import migrate_to
+from test.mock_client import MockOnePassword
+from test.synthetic import synthetic_export
+
+from onepassword import ItemField, ItemFieldType
+
+from enpass2onepassword.verify import verify
+
+
+async def run_verify(server, export, **kwargs):
+    return await verify(
+        io.BytesIO(json.dumps(export).encode()),
+        "test",
+        "token",
+        "Enpass",
+        True,
+        3600,
+        client_factory=server.authenticate,
+        **kwargs,
+    )
+
+
+def export_with_attachment():
+    export = synthetic_export(40, hidden_share=0.1)
+    export["items"][3]["attachments"] = [
+        {"data": base64.b64encode(b"content").decode(), "name": "a.txt", "order": 1}
+    ]
+    return export
+
+
+async def test_verify_migrated_vault(tmp_path):
+    export = export_with_attachment()
+    server = MockOnePassword(latency_s=0.001)
+    await migrate_to(server, export)
+
+    report_path = tmp_path / "report.json"
+    report = await run_verify(
+        server, export, read_concurrency=4, report_path=str(report_path)
+    )
+
+    assert report.ok()
+    assert report.matching == len(server.created())
+    assert server.max_in_flight <= 4
+    assert json.loads(report_path.read_text())["matching"] == report.matching
+
+
+async def test_verify_reports_differences(capsys):
+    export = export_with_attachment()
+    server = MockOnePassword()
+    await migrate_to(server, export)
+
+    vault = server.items[server.vault_id("Enpass")]
+    op_items = list(vault.values())
+    del vault[op_items[0].id]
+    changed = op_items[1]
+    changed.fields = [
+        ItemField(
+            id=field.id,
+            title=field.title,
+            section_id=field.section_id,
+            field_type=field.field_type,
+            value=(
+                "changed"
+                if field.field_type == ItemFieldType.CONCEALED
+                else field.value
+            ),
+        )
+        for field in changed.fields
+    ]
+    changed.tags = ["new tag"]
+    extra = op_items[2].model_copy(update={"id": "extra-id", "title": "Extra"})
+    vault[extra.id] = extra
+
+    report = await run_verify(server, export)
+
+    assert not report.ok()
+    assert [d.title for d in report.missing] == [op_items[0].title]
+    assert [(d.title, d.op_id) for d in report.extra] == [("Extra", "extra-id")]
+    assert [d.op_id for d in report.mismatched] == [changed.id]
+    concealed = {
+        f"field '{field.title}'"
+        for field in changed.fields
+        if field.field_type == ItemFieldType.CONCEALED
+    }
+    assert set(report.mismatched[0].parts) == concealed | {"tags"}
+    # the report names the parts, but never their values
+    assert "changed" not in capsys.readouterr().out
+
+
+async def test_verify_pairs_by_journal(tmp_path):
+    export = synthetic_export(10)
+    journal_path = tmp_path / "export.journal"
+    server = MockOnePassword()
+    await migrate_to(server, export, journal_path=journal_path)
+
+    op_item = server.created()[0]
+    op_item.title = "Renamed"
+
+    report = await run_verify(server, export, journal_path=journal_path)
+
+    assert report.missing == [] and report.extra == []
+    assert [(d.op_id, d.parts) for d in report.mismatched] == [(op_item.id, ("title",))]